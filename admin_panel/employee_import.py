@@ -0,0 +1,229 @@
+import logging
+from datetime import timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from authentication.models import CustomUser
+
+from .models import EmployeeImportJob
+
+logger = logging.getLogger("app")
+
+REQUIRED_COLUMNS = ['FirstName', 'LastName', 'PhoneNumber', 'Email']
+
+# Rows inserted per INSERT statement
+IMPORT_BATCH_SIZE = 500
+
+# Values per IN (...) lookup, stays under SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 5000
+
+
+def missing_columns(df):
+    return list(set(REQUIRED_COLUMNS) - set(df.columns))
+
+
+def existing_values(field, values):
+    """
+    The subset of ``values`` already taken by a user, in one IN query per chunk.
+    """
+    values = list(set(values))
+    existing = set()
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+        existing.update(CustomUser.objects.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+    return existing
+
+
+def _insert(users):
+    """
+    Inserts ``(row, email, user)`` tuples with one bulk INSERT. If the batch
+    fails, rows are retried one at a time so a bad row only fails itself.
+    Returns ``(row, message)`` for the rows that failed.
+    """
+    try:
+        with transaction.atomic():
+            CustomUser.objects.bulk_create([user for _, _, user in users])
+        return []
+    except Exception:
+        pass
+
+    failures = []
+    for row, email, user in users:
+        try:
+            with transaction.atomic():
+                user.save(force_insert=True)
+        except Exception as e:
+            user.pk = None
+            failures.append((row, f"Row {row}: Failed to add user '{email}' due to error: {str(e)}"))
+    return failures
+
+
+def import_employees(df, company_id=None, role_id=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Creates a user per CSV row, skipping rows whose email or phone number
+    is already taken, by an existing user or an earlier row of the file.
+
+    Values are normalized column-wise the way the model fields store them,
+    taken emails and phone numbers are looked up with IN queries, and the
+    new users are inserted in batches inside one transaction. Returns
+    ``(success_count, failures)`` with one message per failed row, in row
+    order.
+    """
+    emails = df['Email'].tolist()
+    phone_numbers = df['PhoneNumber'].tolist()
+    first_names = df['FirstName'].tolist()
+    last_names = df['LastName'].tolist()
+
+    # CharField stores str(value), e.g. 9876543210 read as an int
+    email_keys = df['Email'].astype(str).tolist()
+    phone_keys = df['PhoneNumber'].astype(str).tolist()
+
+    taken_emails = existing_values('email', email_keys)
+    taken_phones = existing_values('phone_number', phone_keys)
+
+    failures = {}
+    pending = []
+    for position, index in enumerate(df.index):
+        row = index + 1
+        email = emails[position]
+        phone_number = phone_numbers[position]
+
+        if email_keys[position] in taken_emails:
+            failures[row] = f"Row {row}: Email '{email}' already exists."
+            continue
+
+        if phone_keys[position] in taken_phones:
+            failures[row] = f"Row {row}: Phone number '{phone_number}' already exists."
+            continue
+
+        taken_emails.add(email_keys[position])
+        taken_phones.add(phone_keys[position])
+        pending.append((row, email, CustomUser(
+            email=email, phone_number=phone_number, first_name=first_names[position], last_name=last_names[position],
+            company_id=company_id, role_id=role_id, is_staff=False,
+        )))
+
+    try:
+        with transaction.atomic():
+            for start in range(0, len(pending), batch_size):
+                failures.update(_insert(pending[start:start + batch_size]))
+    except IntegrityError as e:
+        # Foreign keys are checked on commit, an unknown company or role fails every row
+        failures.update(
+            (row, f"Row {row}: Failed to add user '{email}' due to error: {str(e)}") for row, email, _ in pending
+        )
+
+    success_count = len(df.index) - len(failures)
+    logger.info(f"employee import: {success_count} created, {len(failures)} failed")
+    return success_count, [failures[row] for row in sorted(failures)]
+
+
+def claim_job():
+    """
+    Marks the oldest due job as running and returns it, or None. Jobs left
+    running by a worker that died are due again once their lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            EmployeeImportJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=EmployeeImportJob.PENDING) | Q(status=EmployeeImportJob.RUNNING), lease_until__lte=now)
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = EmployeeImportJob.RUNNING
+        job.attempts += 1
+        job.lease_until = now + timedelta(seconds=settings.EMPLOYEE_IMPORT_LEASE)
+        job.started_at = job.started_at or now
+        job.save(update_fields=['status', 'attempts', 'lease_until', 'started_at', 'modified_at'])
+    return job
+
+
+def read_chunks(job, chunk_rows):
+    """
+    Yields the job's CSV as DataFrames of ``chunk_rows`` rows, indexed by
+    row position in the file, starting after the rows already committed.
+    Values are read as the strings in the file, so every chunk is typed
+    the same way.
+    """
+    with job.file.open('rb') as file:
+        reader = pd.read_csv(file, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+        start = 0
+        for chunk in reader:
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            start += len(chunk)
+            if start <= job.rows_processed:
+                continue
+            yield chunk[chunk.index >= job.rows_processed]
+
+
+def _finish(job, status, error=''):
+    job.status = status
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'modified_at'])
+
+
+def run_job(job, chunk_rows=None):
+    """
+    Imports a claimed job chunk by chunk. Each chunk's users and the job's
+    progress are committed together, so nothing is imported twice when the
+    job is resumed.
+    """
+    chunk_rows = chunk_rows or settings.EMPLOYEE_IMPORT_CHUNK_ROWS
+    try:
+        for chunk in read_chunks(job, chunk_rows):
+            missing = missing_columns(chunk)
+            if missing:
+                _finish(job, EmployeeImportJob.FAILED, f'Missing required columns: {missing}')
+                return
+
+            with transaction.atomic():
+                success_count, failures = import_employees(chunk, company_id=job.company_id, role_id=job.role_id)
+                job.rows_processed = int(chunk.index[-1]) + 1
+                job.success_count += success_count
+                job.failure_count += len(failures)
+                job.failures = (job.failures + failures)[:settings.EMPLOYEE_IMPORT_MAX_FAILURES]
+                job.lease_until = timezone.now() + timedelta(seconds=settings.EMPLOYEE_IMPORT_LEASE)
+                job.save(update_fields=[
+                    'rows_processed', 'success_count', 'failure_count', 'failures', 'lease_until', 'modified_at',
+                ])
+    except pd.errors.EmptyDataError:
+        _finish(job, EmployeeImportJob.FAILED, 'Empty file provided')
+        return
+    except Exception as e:
+        logger.error(f"employee import {job.id} failed at row {job.rows_processed}: {str(e)}")
+        if job.attempts >= settings.EMPLOYEE_IMPORT_MAX_ATTEMPTS:
+            _finish(job, EmployeeImportJob.FAILED, str(e))
+        else:
+            # Picked up again from the last committed chunk
+            job.status = EmployeeImportJob.PENDING
+            job.error = str(e)
+            job.lease_until = timezone.now() + timedelta(seconds=settings.EMPLOYEE_IMPORT_RETRY_DELAY * job.attempts)
+            job.save(update_fields=['status', 'error', 'lease_until', 'modified_at'])
+        return
+
+    _finish(job, EmployeeImportJob.COMPLETED)
+    logger.info(f"employee import {job.id} completed: {job.success_count} created, {job.failure_count} failed")
+
+
+def job_status(job):
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'file_name': job.file.name.rsplit('/', 1)[-1],
+        'rows_processed': job.rows_processed,
+        'success_count': job.success_count,
+        'failure_count': job.failure_count,
+        'failures': job.failures,
+        'error': job.error,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from admin_panel.employee_import import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Imports uploaded employee CSVs in the background, resuming jobs whose worker stopped mid-file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-rows', type=int, default=None,
+                            help="Rows committed per transaction, defaults to EMPLOYEE_IMPORT_CHUNK_ROWS.")
+        parser.add_argument('--poll-interval', type=float, default=2,
+                            help="Seconds to sleep when no job is due.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once no jobs are due instead of polling.")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            job = claim_job()
+            if job is not None:
+                run_job(job, options['chunk_rows'])
+                total += 1
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {total} employee import jobs."))
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
     
@@ -66,4 +68,49 @@ class Company(models.Model):
     modified_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class EmployeeImportJob(models.Model):
+    """
+    A CSV of employees imported in the background by `manage.py process_employee_imports`.
+    Rows are committed a chunk at a time together with ``rows_processed``,
+    so a job picked up again after a crash resumes from its last chunk.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    file = models.FileField(upload_to='employee_imports/', max_length=4096)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='employee_imports', null=True, blank=True)
+    role = models.ForeignKey('authentication.CustomRole', on_delete=models.SET_NULL, related_name='employee_imports', null=True, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name='employee_imports', null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    rows_processed = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    # Same messages as the bulk upload response, capped at EMPLOYEE_IMPORT_MAX_FAILURES
+    failures = models.JSONField(default=list)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a running job's worker is presumed dead and the job can be claimed again
+    lease_until = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'lease_until'], name='employee_import_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.file.name} ({self.status})"
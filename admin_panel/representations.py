@@ -0,0 +1,75 @@
+from authentication.models import CustomUser
+from spatiumvms.utils.representations import ValuesRepresentation, column
+from vms.representations import VisitorRepresentation
+
+
+class CompanyVisitorRepresentation(VisitorRepresentation):
+    """
+    Fast list output of CompanyVisitorSerializer, which also shows the raw foreign keys.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        position = [name for name, _ in fields].index('purpose_of_visit_name')
+        fields.insert(position, ('purpose_of_visit_id', column('purpose_of_visit_id')))
+        fields += [
+            ('company_id', column('company_id')),
+            ('user_id', column('user_id')),
+        ]
+        return fields
+
+
+class UserRepresentation(ValuesRepresentation):
+    """
+    Fast list output of UserSerializer. Group and permission ids of a whole
+    page are loaded with one query each.
+    """
+
+    columns = (
+        'id', 'phone_number', 'password', 'role_id', 'company_id', 'facility_id', 'zone_id', 'last_login',
+        'is_superuser', 'email', 'first_name', 'last_name', 'is_archive', 'is_staff', 'profile_picture',
+        'created_at', 'modified_at',
+    )
+
+    def prefetch(self, rows):
+        user_ids = [row['id'] for row in rows]
+        self.groups = {}
+        self.permissions = {}
+
+        group_links = CustomUser.groups.through.objects.filter(customuser_id__in=user_ids).order_by('id')
+        for user_id, group_id in group_links.values_list('customuser_id', 'group_id'):
+            self.groups.setdefault(user_id, []).append(group_id)
+
+        # Same order as Permission.Meta.ordering, which user.user_permissions.all() follows
+        permission_links = CustomUser.user_permissions.through.objects.filter(customuser_id__in=user_ids).order_by(
+            'permission__content_type__app_label', 'permission__content_type__model', 'permission__codename',
+        )
+        for user_id, permission_id in permission_links.values_list('customuser_id', 'permission_id'):
+            self.permissions.setdefault(user_id, []).append(permission_id)
+
+    def get_fields(self):
+        return [
+            ('id', column('id')),
+            ('phone_number', column('phone_number')),
+            ('password', column('password')),
+            ('role_id', column('role_id')),
+            ('company_id', column('company_id')),
+            ('facility_id', column('facility_id')),
+            ('zone_id', column('zone_id')),
+            ('last_login', self.datetime_column('last_login')),
+            ('is_superuser', column('is_superuser')),
+            ('email', column('email')),
+            ('first_name', column('first_name')),
+            ('last_name', column('last_name')),
+            ('is_archive', column('is_archive')),
+            ('is_staff', column('is_staff')),
+            ('profile_picture', self.file_column('profile_picture')),
+            ('created_at', self.datetime_column('created_at')),
+            ('modified_at', self.datetime_column('modified_at')),
+            ('role', column('role_id')),
+            ('company', column('company_id')),
+            ('facility', column('facility_id')),
+            ('zone', column('zone_id')),
+            ('groups', lambda row: self.groups.get(row['id'], [])),
+            ('user_permissions', lambda row: self.permissions.get(row['id'], [])),
+        ]
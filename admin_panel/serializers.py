@@ -110,13 +110,14 @@ class CompanyVisitorSerializer(serializers.ModelSerializer):
     company_name = serializers.CharField(source='company.name', read_only=True)
     user_name = serializers.SerializerMethodField()
     purpose_of_visit_name = serializers.CharField(source='purpose_of_visit.name', read_only=True)
+    image_thumbnail = serializers.ImageField(read_only=True)
 
     def get_user_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}" if obj.user else None
 
     class Meta:
         model = Visitor
-        fields = ['id', 'email', 'phone_number', 'name', 'company_name', 'from_company', 'user_name', 'purpose_of_visit_id', 'purpose_of_visit_name', 'image', 'created_at', 'modified_at', 'company_id', 'user_id']
+        fields = ['id', 'email', 'phone_number', 'name', 'company_name', 'from_company', 'user_name', 'purpose_of_visit_id', 'purpose_of_visit_name', 'image', 'image_thumbnail', 'created_at', 'modified_at', 'company_id', 'user_id']
 
 class CompanySerializer(serializers.ModelSerializer):
 
@@ -1,3 +1,150 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from authentication.models import CustomUser
+from vms.models import Visitor
+
+from . import employee_import
+from .models import Company, EmployeeImportJob, Facility, PurposeOfVisit
+from .representations import CompanyVisitorRepresentation, UserRepresentation
+from .serializers import CompanyVisitorSerializer, UserSerializer
 
 # Create your tests here.
+
+
+def render_both(serializer_class, representation_class, queryset):
+    request = Request(APIRequestFactory().get('/api/v1/admin/'))
+    expected = JSONRenderer().render(serializer_class(queryset, many=True, context={'request': request}).data)
+    representation = representation_class(request)
+    actual = JSONRenderer().render(representation.represent(representation.values(queryset)))
+    return actual, expected
+
+
+class ListRepresentationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        facility = Facility.objects.create(name='Facility')
+        company = Company.objects.create(name='Company', facility=facility, spoc_email='spoc@example.com', spoc_phone_number='9000000001')
+        purpose = PurposeOfVisit.objects.create(name='Meeting')
+        user = CustomUser.objects.create(email='host@example.com', phone_number='9000000000', first_name='Host',
+                                         company=company, facility=facility, profile_picture='profile_pictures/host.png')
+        user.groups.add(Group.objects.create(name='Hosts'))
+        user.user_permissions.add(*Permission.objects.order_by('-id')[:3])
+        CustomUser.objects.create(email='other@example.com', phone_number='9000000002')
+
+        Visitor.objects.create(name='Visitor', email='a@example.com', phone_number='9100000000', company=company, user=user,
+                               purpose_of_visit=purpose, image='visitors/a.jpg')
+        Visitor.objects.create(name='Walk in', email='b@example.com', phone_number='9100000001')
+
+    def test_company_visitor_matches_serializer_json(self):
+        actual, expected = render_both(CompanyVisitorSerializer, CompanyVisitorRepresentation, Visitor.objects.order_by('pk'))
+        self.assertEqual(actual, expected)
+
+    def test_user_matches_serializer_json(self):
+        actual, expected = render_both(UserSerializer, UserRepresentation, CustomUser.objects.order_by('pk'))
+        self.assertEqual(actual, expected)
+
+
+class BulkEmployeeUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Company', spoc_email='spoc@example.com', spoc_phone_number='9000000001')
+        cls.admin = CustomUser.objects.create(email='admin@example.com', phone_number='9000000000', is_superuser=True)
+
+    def upload(self, rows):
+        csv = 'FirstName,LastName,PhoneNumber,Email\n' + ''.join(f'{row}\n' for row in rows)
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/api/v1/admin/bulk-employee-upload/', {
+                'file': SimpleUploadedFile('employees.csv', csv.encode()), 'company_id': self.company.id,
+            }, format='multipart')
+        return response, queries
+
+    def test_failure_report_and_query_count(self):
+        response, queries = self.upload([
+            'Asha,Rao,9100000000,asha@example.com',
+            'Taken,Email,9100000001,admin@example.com',
+            'Taken,Phone,9000000000,new@example.com',
+            'Again,Email,9100000002,asha@example.com',
+            'Again,Phone,9100000000,other@example.com',
+            'Ravi,Iyer,9100000003,ravi@example.com',
+        ])
+        self.assertEqual(response.data, {
+            'message': 'Bulk upload completed.',
+            'success_count': 2,
+            'failure_count': 4,
+            'failures': [
+                "Row 2: Email 'admin@example.com' already exists.",
+                "Row 3: Phone number '9000000000' already exists.",
+                "Row 4: Email 'asha@example.com' already exists.",
+                "Row 5: Phone number '9100000000' already exists.",
+            ],
+        })
+        users = CustomUser.objects.filter(company=self.company).order_by('email')
+        self.assertEqual([(user.email, user.phone_number, user.is_staff) for user in users], [
+            ('asha@example.com', '9100000000', False), ('ravi@example.com', '9100000003', False),
+        ])
+
+        # Two lookups and one insert, plus the transaction savepoints, however many rows
+        _, more_queries = self.upload([f'User,{i},{9200000000 + i},user{i}@example.com' for i in range(50)])
+        self.assertEqual(len(more_queries), len(queries))
+
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EMPLOYEE_IMPORT_CHUNK_ROWS=2)
+class EmployeeImportJobTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def test_import_resumes_after_last_committed_chunk(self):
+        admin = CustomUser.objects.create(email='admin@example.com', phone_number='9000000000', is_superuser=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        csv = 'FirstName,LastName,PhoneNumber,Email\n' + ''.join(f'User,{i},{9100000000 + i},user{i}@example.com\n' for i in range(5))
+        response = client.post('/api/v1/admin/employee-import/', {
+            'file': SimpleUploadedFile('employees.csv', (csv + 'Again,User,9199999999,user1@example.com\n').encode()),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 202)
+
+        # The worker dies while importing the second chunk
+        import_employees = employee_import.import_employees
+        calls = []
+
+        def crash_on_second_chunk(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('worker killed')
+            return import_employees(*args, **kwargs)
+
+        job = employee_import.claim_job()
+        with mock.patch.object(employee_import, 'import_employees', crash_on_second_chunk):
+            employee_import.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_processed, job.success_count), (EmployeeImportJob.PENDING, 2, 2))
+
+        EmployeeImportJob.objects.filter(pk=job.pk).update(lease_until=timezone.now())
+        employee_import.run_job(employee_import.claim_job())
+
+        response = client.get(f'/api/v1/admin/employee-import/{job.id}/')
+        self.assertEqual(response.data['status'], EmployeeImportJob.COMPLETED)
+        self.assertEqual((response.data['rows_processed'], response.data['success_count']), (6, 5))
+        self.assertEqual(response.data['failures'], ["Row 6: Email 'user1@example.com' already exists."])
+        self.assertEqual(CustomUser.objects.filter(email__startswith='user').count(), 5)
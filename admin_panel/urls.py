@@ -12,6 +12,7 @@ from .views import (
     PurposeOfVisitView,
     EmployeesView,
     BulkEmployeeUploadView,
+    EmployeeImportJobView,
     CompanyVisitorView
 )
 
@@ -28,4 +29,5 @@ router.register("role", RoleView, basename="role")
 router.register("user", UsersView, basename="user")
 router.register("employee", EmployeesView, basename="employee")
 router.register("purpose-of-visit", PurposeOfVisitView, basename="purpose-of-visit")
-router.register("bulk-employee-upload", BulkEmployeeUploadView, basename="bulk-employee-upload")
\ No newline at end of file
+router.register("bulk-employee-upload", BulkEmployeeUploadView, basename="bulk-employee-upload")
+router.register("employee-import", EmployeeImportJobView, basename="employee-import")
\ No newline at end of file
@@ -8,9 +8,12 @@ import os
 import pandas as pd
 
 from authentication.models import CustomRole, CustomUser
+from spatiumvms.utils.representations import ValuesListMixin
 from vms.models import Visitor
 
-from .models import Company, PurposeOfVisit, State, City, Facility, Zone
+from . import employee_import
+from .models import Company, PurposeOfVisit, State, City, Facility, Zone, EmployeeImportJob
+from .representations import CompanyVisitorRepresentation, UserRepresentation
 from .serializers import CompanySerializer, CompanyVisitorSerializer, PurposeOfVisitSerializer, RoleSerializer, StateSerializer, CitySerializer, FacilitySerializer, UserSerializer, ZoneSerializer
 # Create your views here.
 
@@ -266,13 +269,14 @@ class CompanyView(viewsets.ModelViewSet):
         instance.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class CompanyUserView(viewsets.ModelViewSet):
+class CompanyUserView(ValuesListMixin, viewsets.ModelViewSet):
 
     view_permissions = {
         'list': {'admin': True,'front_desk': True}
     }
     
     serializer_class=UserSerializer
+    list_representation = UserRepresentation
     pagination_class = CustomPagination
 
     def get_queryset(self):
@@ -280,13 +284,14 @@ class CompanyUserView(viewsets.ModelViewSet):
         company_id = self.request.query_params.get('company_id')
         return CustomUser.objects.filter(is_archive=False, company_id=company_id).order_by('pk')
     
-class CompanyVisitorView(viewsets.ModelViewSet):
+class CompanyVisitorView(ValuesListMixin, viewsets.ModelViewSet):
 
     view_permissions = {
         'list': {'spoc': True}
     }
     
     serializer_class=CompanyVisitorSerializer
+    list_representation = CompanyVisitorRepresentation
     pagination_class = CustomPagination
 
     def get_queryset(self):
@@ -295,7 +300,7 @@ class CompanyVisitorView(viewsets.ModelViewSet):
         return Visitor.objects.filter(company_id=company_id).order_by('pk')
     
 
-class EmployeesView(viewsets.ModelViewSet):
+class EmployeesView(ValuesListMixin, viewsets.ModelViewSet):
 
     view_permissions = {
         'list': {'admin': True,'spoc': True},
@@ -306,6 +311,7 @@ class EmployeesView(viewsets.ModelViewSet):
     }
     
     serializer_class=UserSerializer
+    list_representation = UserRepresentation
     pagination_class = CustomPagination
 
     def get_queryset(self):
@@ -335,7 +341,7 @@ class EmployeesView(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     
-class UsersView(viewsets.ModelViewSet):
+class UsersView(ValuesListMixin, viewsets.ModelViewSet):
 
     view_permissions = {
         'create': {'admin': True},
@@ -347,6 +353,7 @@ class UsersView(viewsets.ModelViewSet):
 
     queryset = CustomUser.objects.filter(is_archive = False).order_by('pk')
     serializer_class=UserSerializer
+    list_representation = UserRepresentation
     filter_backends = [SearchFilter]
     search_fields = ['first_name','last_name','email']
     pagination_class = CustomPagination
@@ -433,40 +440,13 @@ class BulkEmployeeUploadView(viewsets.ViewSet):
             df = pd.read_csv(file)
 
             # Validate column names
-            required_columns = ['FirstName', 'LastName', 'PhoneNumber', 'Email']
-            missing_columns = set(required_columns) - set(df.columns)
+            missing_columns = employee_import.missing_columns(df)
             if missing_columns:
-                return Response({'error': f'Missing required columns: {list(missing_columns)}'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Track success and failure counts
-            success_count = 0
-            failure_count = 0
-            failure_reasons = []
-
-            for index, row in df.iterrows():
-                first_name = row['FirstName']
-                last_name = row['LastName']
-                phone_number = row['PhoneNumber']
-                email = row['Email']
-
-                # Check if user with email or phone number already exists
-                if CustomUser.objects.filter(email=email).exists():
-                    failure_count += 1
-                    failure_reasons.append(f"Row {index+1}: Email '{email}' already exists.")
-                    continue
-
-                if CustomUser.objects.filter(phone_number=phone_number).exists():
-                    failure_count += 1
-                    failure_reasons.append(f"Row {index+1}: Phone number '{phone_number}' already exists.")
-                    continue
-
-                # Create new user
-                try:
-                    CustomUser.objects.create(email=email, phone_number=phone_number, first_name=first_name, last_name=last_name, company_id=company_id, role_id=role_id,is_staff=False)
-                    success_count += 1
-                except Exception as e:
-                    failure_count += 1
-                    failure_reasons.append(f"Row {index+1}: Failed to add user '{email}' due to error: {str(e)}")
+                return Response({'error': f'Missing required columns: {missing_columns}'}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Duplicates are checked set-wise and users inserted in batches, failures are still reported per row
+            success_count, failure_reasons = employee_import.import_employees(df, company_id=company_id, role_id=role_id)
+            failure_count = len(failure_reasons)
 
             response_data = {
                 "message": "Bulk upload completed.",
@@ -480,4 +460,59 @@ class BulkEmployeeUploadView(viewsets.ViewSet):
         except pd.errors.EmptyDataError:
             return Response({'error': 'Empty file provided'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            return Response({'error': f'An error occurred: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({'error': f'An error occurred: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class EmployeeImportJobView(viewsets.ViewSet):
+
+    view_permissions = {
+        'create': {'admin': True, 'spoc': True},
+        'list': {'admin': True, 'spoc': True},
+        'retrieve': {'admin': True, 'spoc': True},
+    }
+
+    def get_queryset(self):
+        queryset = EmployeeImportJob.objects.all()
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset.order_by('-created_at', '-id')
+
+    def create(self, request, *args, **kwargs):
+        file = request.FILES.get('file')
+        role_id = request.data.get('role_id') or None
+        company_id = request.data.get('company_id') or None
+
+        if not file:
+            return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if os.path.splitext(file.name)[1].lower() != '.csv':
+            return Response({'error': 'Invalid file format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if company_id is not None and not Company.objects.filter(id=company_id if str(company_id).isdigit() else None).exists():
+            return Response({'error': 'Company is not found.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if role_id is not None and not CustomRole.objects.filter(id=role_id if str(role_id).isdigit() else None).exists():
+            return Response({'error': 'Role is not found.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the header is read here, the rows are imported by the worker
+        try:
+            header = pd.read_csv(file, nrows=0)
+        except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError):
+            return Response({'error': 'Empty file provided'}, status=status.HTTP_400_BAD_REQUEST)
+        missing_columns = employee_import.missing_columns(header)
+        if missing_columns:
+            return Response({'error': f'Missing required columns: {missing_columns}'}, status=status.HTTP_400_BAD_REQUEST)
+        file.seek(0)
+
+        job = EmployeeImportJob.objects.create(file=file, company_id=company_id, role_id=role_id, created_by=request.user)
+        return Response({'job_id': job.id, 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+
+    def list(self, request, *args, **kwargs):
+        jobs = self.get_queryset()[:50]
+        return Response([employee_import.job_status(job) for job in jobs])
+
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        job = self.get_queryset().filter(pk=pk if str(pk).isdigit() else None).first()
+        if job is None:
+            return Response({'error': 'Import job is not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(employee_import.job_status(job))
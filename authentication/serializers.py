@@ -14,7 +14,7 @@ from .models import CustomUser
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from spatiumvms.utils.email_templates import render_email
 from spatiumvms.utils.brevo_utils import send_brevo_email
 
 from spatiumvms.constants import (
@@ -50,7 +50,7 @@ class VerifyEmailSerializer(serializers.Serializer):
 
         subject = OTP_VERIFICATION.get("subject", "")
 
-        html_body = render_to_string('Otp.html', {'otp': otp, 'logo': EMAIL_LOGO})
+        html_body = render_email('Otp.html', {'otp': otp, 'logo': EMAIL_LOGO})
         to_emails = [email]
         
         success, message = send_brevo_email(subject, html_body, to_emails)
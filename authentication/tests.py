@@ -1,3 +1,92 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import CustomUser
+from .token_blacklist.blacklist import AccessTokenBlacklist, BloomFilter
+from .token_blacklist.models import BlacklistedAccessToken, OutstandingAccessToken
+from .token_blacklist.token_utils import CustomAccessToken
 
 # Create your tests here.
+
+
+class AccessTokenBlacklistTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(email='user@example.com', phone_number='9000000000')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 50)
+
+    def test_unknown_tokens_skip_the_database_and_blacklistings_are_picked_up(self):
+        blacklist = AccessTokenBlacklist(ttl=60, rebuild_interval=3600)
+        token = CustomAccessToken.for_user(self.user)
+        other = CustomAccessToken.for_user(self.user)
+
+        self.assertFalse(blacklist.is_blacklisted(token['jti']))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(blacklist.is_blacklisted(token['jti']))
+        self.assertEqual(len(queries), 0)
+
+        # Blacklisted by another worker: seen on the next refresh
+        BlacklistedAccessToken.objects.create(token=OutstandingAccessToken.objects.get(jti=other['jti']))
+        self.assertFalse(blacklist.is_blacklisted(other['jti']))
+        blacklist.refresh()
+        self.assertTrue(blacklist.is_blacklisted(other['jti']))
+
+        # Blacklisted by this worker: seen at once
+        blacklist.add(token['jti'])
+        self.assertTrue(blacklist.is_blacklisted(token['jti']))
+
+    def test_blacklisting_by_another_process_applies_once_the_ttl_elapses(self):
+        blacklist = AccessTokenBlacklist(ttl=0.2, rebuild_interval=3600)
+        token = CustomAccessToken.for_user(self.user)
+        self.assertFalse(blacklist.is_blacklisted(token['jti']))
+
+        # Another process only shares the database with this one
+        BlacklistedAccessToken.objects.create(token=OutstandingAccessToken.objects.get(jti=token['jti']))
+        self.assertFalse(blacklist.is_blacklisted(token['jti']))
+
+        time.sleep(0.3)
+        self.assertTrue(blacklist.is_blacklisted(token['jti']))
+
+    def test_token_added_during_a_rebuild_stays_blacklisted(self):
+        blacklist = AccessTokenBlacklist(ttl=60, rebuild_interval=3600)
+        blacklist.rebuild()
+        token = CustomAccessToken.for_user(self.user)
+        rows = blacklist._rows
+
+        def rows_with_logout(*args, **kwargs):
+            # Logged out on this worker after the rebuild read the table
+            result = list(rows(*args, **kwargs))
+            blacklist.add(token['jti'])
+            return result
+
+        with mock.patch.object(blacklist, '_rows', rows_with_logout):
+            blacklist.rebuild()
+        self.assertIn(token['jti'], blacklist._bloom)
+        self.assertEqual(blacklist._pending_adds, [])
+        self.assertTrue(blacklist.is_blacklisted(token['jti']))
+
+    def test_logged_out_token_is_rejected(self):
+        token = CustomAccessToken.for_user(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertNotEqual(client.get('/api/v1/vms/vms-dashboard/').status_code, 401)
+
+        token.blacklist_on_logout()
+        self.assertEqual(client.get('/api/v1/vms/vms-dashboard/').status_code, 401)
@@ -0,0 +1,166 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import BlacklistedAccessToken
+
+BLACKLIST_CACHE_PREFIX = 'auth:blacklisted'
+
+# Rows re-read below the last id seen on each refresh, for blacklistings
+# committed after a higher id was already visible
+REFRESH_ID_OVERLAP = 100
+
+# No blacklisting matters for longer than a token can live
+ACCESS_TOKEN_LIFETIME = int(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds())
+
+
+class BloomFilter:
+    """
+    Fixed-size set of strings that can answer "maybe present" for items
+    never added, at ``error_rate`` for ``capacity`` items, but never misses
+    an item that was added.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        # Double hashing, two 64 bit halves give all k positions
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class AccessTokenBlacklist:
+    """
+    Per-process bloom filter of blacklisted access token JTIs in front of
+    the BlacklistedAccessToken table.
+
+    A token the filter has never seen is accepted without any I/O, which is
+    every request of a logged-in user. Filter hits, blacklisted or a rare
+    false positive, are confirmed through Django's cache and then the
+    database.
+
+    The filter reads blacklistings newer than the last row it saw at most
+    every ``ttl`` seconds. Logouts on this worker apply immediately and on
+    other workers within ``ttl``, whatever the cache backend: a worker only
+    looks in the cache once its own filter has the token. Every
+    ``rebuild_interval`` seconds the filter is rebuilt from unexpired tokens
+    only, so it doesn't fill up.
+    """
+
+    def __init__(self, ttl, rebuild_interval):
+        self.ttl = ttl
+        self.rebuild_interval = rebuild_interval
+        self._bloom = None
+        self._last_id = 0
+        self._refreshed_at = None
+        self._built_at = None
+        # JTIs added by this process while a rebuild reads the table, one list per rebuild
+        self._pending_adds = []
+        self._lock = threading.Lock()
+
+    def _rows(self, after_id=0):
+        return (
+            BlacklistedAccessToken.objects.filter(id__gt=after_id, token__expires_at__gt=timezone.now())
+            .order_by('id')
+            .values_list('id', 'token__jti')
+        )
+
+    def rebuild(self):
+        added = []
+        with self._lock:
+            self._pending_adds.append(added)
+        try:
+            rows = list(self._rows())
+            bloom = BloomFilter(max(settings.ACCESS_TOKEN_BLACKLIST_CAPACITY, 2 * len(rows)))
+            for _, jti in rows:
+                bloom.add(jti)
+        except BaseException:
+            with self._lock:
+                self._pending_adds.remove(added)
+            raise
+        now = time.monotonic()
+        with self._lock:
+            self._pending_adds.remove(added)
+            # Added after the rows were read, possibly before their own row was committed
+            for jti in added:
+                bloom.add(jti)
+            self._bloom = bloom
+            self._last_id = rows[-1][0] if rows else 0
+            self._refreshed_at = self._built_at = now
+
+    def refresh(self):
+        bloom = self._bloom
+        if (
+            bloom is None
+            or bloom.count > bloom.capacity
+            or time.monotonic() - self._built_at > self.rebuild_interval
+        ):
+            self.rebuild()
+            return
+
+        rows = list(self._rows(max(self._last_id - REFRESH_ID_OVERLAP, 0)))
+        with self._lock:
+            for _, jti in rows:
+                if jti not in bloom:
+                    bloom.add(jti)
+            if rows:
+                self._last_id = max(self._last_id, rows[-1][0])
+            self._refreshed_at = time.monotonic()
+
+    def is_blacklisted(self, jti):
+        refreshed_at = self._refreshed_at
+        if refreshed_at is None or time.monotonic() - refreshed_at > self.ttl:
+            self.refresh()
+
+        if jti not in self._bloom:
+            return False
+
+        key = f"{BLACKLIST_CACHE_PREFIX}:{jti}"
+        blacklisted = cache.get(key)
+        if blacklisted is None:
+            blacklisted = BlacklistedAccessToken.objects.filter(token__jti=jti).exists()
+            # A false positive may be blacklisted later, so only remember "no" until the next refresh
+            cache.set(key, blacklisted, ACCESS_TOKEN_LIFETIME if blacklisted else self.ttl)
+        return blacklisted
+
+    def add(self, jti, expires_at=None):
+        """
+        Records a blacklisting made by this process in its filter and in the
+        cache. With the default LocMemCache the cache entry is only seen by
+        this process, other workers read the row on their next refresh.
+        """
+        timeout = ACCESS_TOKEN_LIFETIME
+        if expires_at is not None:
+            timeout = max(int((expires_at - timezone.now()).total_seconds()), 1)
+        cache.set(f"{BLACKLIST_CACHE_PREFIX}:{jti}", True, timeout)
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+            for added in self._pending_adds:
+                added.append(jti)
+
+
+access_token_blacklist = AccessTokenBlacklist(
+    settings.ACCESS_TOKEN_BLACKLIST_TTL, settings.ACCESS_TOKEN_BLACKLIST_REBUILD_INTERVAL,
+)
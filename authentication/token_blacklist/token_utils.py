@@ -5,6 +5,7 @@ from rest_framework_simplejwt.exceptions import InvalidToken
 from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from rest_framework_simplejwt.utils import datetime_from_epoch
 
+from .blacklist import access_token_blacklist
 from .models import BlacklistedAccessToken, OutstandingAccessToken
 
 
@@ -47,7 +48,9 @@ class CustomAccessToken(AccessToken):
             },
         )
 
-        return BlacklistedAccessToken.objects.get_or_create(token=token)
+        blacklisted = BlacklistedAccessToken.objects.get_or_create(token=token)
+        access_token_blacklist.add(jti, token.expires_at)
+        return blacklisted
 
     def create_outstanding_access_tokens(self):
         access_token = str(self)
@@ -71,7 +74,8 @@ class CustomAccessToken(AccessToken):
 
     def check_blacklist(self):
         jti = self.payload[settings.SIMPLE_JWT.get("JTI_CLAIM", "jti")]
-        if BlacklistedAccessToken.objects.filter(token__jti=jti).exists():
+        # Served from the in-process bloom filter, unknown tokens never reach the database
+        if access_token_blacklist.is_blacklisted(jti):
             raise InvalidToken("Token is blacklisted")
 
 
@@ -119,6 +123,7 @@ class CustomRefreshToken(RefreshToken):
             
             for token in outstanding_tokens:
                 BlacklistedAccessToken.objects.get_or_create(token=token)
+                access_token_blacklist.add(token.jti, token.expires_at)
 
             return True
         except Exception:
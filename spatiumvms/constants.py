@@ -15,6 +15,10 @@ DOWNLOAD_ID = {
     "subject" : "Download Identity Card",
 }
 
+VISITOR_INVITE = {
+    "subject" : "Your Visit to {}",
+}
+
 INVALID_EMAIL_FORMAT_ERROR = "Invalid email format."
 
 EMPTY_NAME_ERROR = "Name field cannot be empty."
\ No newline at end of file
@@ -0,0 +1,28 @@
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+
+# One year, the longest max-age caches reliably honour
+IMMUTABLE_MAX_AGE = 31536000
+
+
+class ImmutableMediaCacheMiddleware:
+    """
+    Marks content-hashed media files as immutable, so browsers and proxies
+    keep them for a year without revalidating. Their URL changes whenever
+    their content does. This only covers media served by Django itself; the
+    web server in front of MEDIA_ROOT should send the same header for
+    IMMUTABLE_MEDIA_PATTERNS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        prefix = re.escape('/' + settings.MEDIA_URL.lstrip('/'))
+        self.patterns = [re.compile(prefix + pattern) for pattern in settings.IMMUTABLE_MEDIA_PATTERNS]
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.status_code == 200 and any(pattern.match(request.path) for pattern in self.patterns):
+            patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+        return response
@@ -84,6 +84,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'spatiumvms.middleware.ImmutableMediaCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'spatiumvms.urls'
@@ -124,7 +125,7 @@ REST_FRAMEWORK = {
 
 WSGI_APPLICATION = 'spatiumvms.wsgi.application'
 
-ASGI_APPLICATION = 'jioevents.asgi.application'
+ASGI_APPLICATION = 'spatiumvms.asgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -140,6 +141,15 @@ DATABASES = {
     }
 }
 
+# Use a shared backend (e.g. django.core.cache.backends.redis.RedisCache) so
+# cache invalidation reaches every worker, the default is per process.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        'LOCATION': os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -182,6 +192,69 @@ STATIC_ROOT = Path.joinpath(BASE_DIR, "staticfiles")
 MEDIA_URL = "media/"
 MEDIA_ROOT = Path.joinpath(BASE_DIR, "mediafiles")
 
+# Media paths (relative to MEDIA_URL) whose names embed a content hash, served with immutable caching
+IMMUTABLE_MEDIA_PATTERNS = [
+    r"qrcodes/qrcode_\d+_[0-9a-f]{16}\.(png|svg)$",
+]
+
+# Rendered identity cards, served straight from disk on repeat downloads
+IDENTITY_CARD_CACHE_DIR = Path.joinpath(MEDIA_ROOT, "identity_cards")
+IDENTITY_CARD_CACHE_MAX_BYTES = int(os.environ.get("IDENTITY_CARD_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Brand logo embedded in identity cards, read once per worker from a local copy of the brand PNG.
+# Until one is configured badges use a placeholder and the missing logo is logged.
+# IDENTITY_CARD_LOGO_URL is an opt-in fallback, fetched only when the file is missing
+IDENTITY_CARD_LOGO_PATH = os.environ.get("IDENTITY_CARD_LOGO_PATH", "")
+IDENTITY_CARD_LOGO_URL = os.environ.get("IDENTITY_CARD_LOGO_URL", "")
+
+# SVG to PNG conversion runs in a process pool per web worker, renders past the queue depth get a 503
+IDENTITY_CARD_RENDER_WORKERS = int(os.environ.get("IDENTITY_CARD_RENDER_WORKERS", 1))
+IDENTITY_CARD_RENDER_QUEUE_DEPTH = int(os.environ.get("IDENTITY_CARD_RENDER_QUEUE_DEPTH", 4))
+IDENTITY_CARD_RENDER_TIMEOUT = float(os.environ.get("IDENTITY_CARD_RENDER_TIMEOUT", 10))
+IDENTITY_CARD_RENDER_RETRY_AFTER = int(os.environ.get("IDENTITY_CARD_RENDER_RETRY_AFTER", 5))
+
+# Multi-visitor PDF export
+IDENTITY_CARD_BATCH_MAX_SIZE = int(os.environ.get("IDENTITY_CARD_BATCH_MAX_SIZE", 200))
+IDENTITY_CARD_BATCH_TIMEOUT = float(os.environ.get("IDENTITY_CARD_BATCH_TIMEOUT", 20))
+# Rough seconds one render takes on a pool process. A batch renders at most as many uncached badges as
+# the pool gets through in IDENTITY_CARD_BATCH_TIMEOUT, stores them and answers 503 for the client to retry
+IDENTITY_CARD_RENDER_SECONDS = float(os.environ.get("IDENTITY_CARD_RENDER_SECONDS", 0.5))
+
+# Seconds a worker may keep using its list of revoked visitor passes before reloading it
+VISITOR_PASS_REVOCATION_TTL = float(os.environ.get("VISITOR_PASS_REVOCATION_TTL", 15))
+
+# Seconds a facility's visitor analytics are cached, new check-ins invalidate them sooner
+VISITOR_ANALYTICS_CACHE_TTL = int(os.environ.get("VISITOR_ANALYTICS_CACHE_TTL", 60))
+
+# Live dashboard streams. Check-ins on other workers are found by polling every
+# VMS_EVENTS_POLL_INTERVAL seconds while a facility is watched, 0 turns polling off
+VMS_EVENTS_POLL_INTERVAL = float(os.environ.get("VMS_EVENTS_POLL_INTERVAL", 2))
+VMS_EVENTS_HEARTBEAT = float(os.environ.get("VMS_EVENTS_HEARTBEAT", 15))
+# Streams are closed after this many seconds and the browser reconnects with Last-Event-ID
+VMS_EVENTS_STREAM_MAX_AGE = float(os.environ.get("VMS_EVENTS_STREAM_MAX_AGE", 600))
+# EventSource can't send an Authorization header, browsers open streams with a signed
+# ?token= from visitor-events-token that is only accepted for this many seconds
+VMS_EVENTS_TOKEN_MAX_AGE = int(os.environ.get("VMS_EVENTS_TOKEN_MAX_AGE", 60))
+
+# Guests per pre-registration request, and rows returned by the desk lookup
+VISITOR_PRE_REGISTRATION_MAX_ROWS = int(os.environ.get("VISITOR_PRE_REGISTRATION_MAX_ROWS", 2000))
+VISITOR_PRE_REGISTRATION_LOOKUP_LIMIT = int(os.environ.get("VISITOR_PRE_REGISTRATION_LOOKUP_LIMIT", 50))
+
+# Employee CSVs uploaded to employee-import are imported by `manage.py process_employee_imports`
+EMPLOYEE_IMPORT_CHUNK_ROWS = int(os.environ.get("EMPLOYEE_IMPORT_CHUNK_ROWS", 2000))
+# Seconds a running import may go without committing a chunk before another worker resumes it
+EMPLOYEE_IMPORT_LEASE = float(os.environ.get("EMPLOYEE_IMPORT_LEASE", 300))
+EMPLOYEE_IMPORT_MAX_ATTEMPTS = int(os.environ.get("EMPLOYEE_IMPORT_MAX_ATTEMPTS", 3))
+EMPLOYEE_IMPORT_RETRY_DELAY = float(os.environ.get("EMPLOYEE_IMPORT_RETRY_DELAY", 30))
+EMPLOYEE_IMPORT_MAX_FAILURES = int(os.environ.get("EMPLOYEE_IMPORT_MAX_FAILURES", 10000))
+
+# Visitor notification emails are queued in the outbox and sent by `manage.py send_outbox_emails`
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+EMAIL_OUTBOX_BACKOFF_BASE = float(os.environ.get("EMAIL_OUTBOX_BACKOFF_BASE", 30))
+EMAIL_OUTBOX_BACKOFF_MAX = float(os.environ.get("EMAIL_OUTBOX_BACKOFF_MAX", 3600))
+# Seconds a claimed message may stay in sending before another worker picks it up again
+EMAIL_OUTBOX_LEASE = float(os.environ.get("EMAIL_OUTBOX_LEASE", 300))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -194,6 +267,12 @@ EMAIL_HOST_USER=os.environ.get("EMAIL_HOST_USER", None)
 EMAIL_HOST_PASSWORD=os.environ.get("EMAIL_HOST_PASSWORD")
 EMAIL_USE_TLS=os.environ.get("EMAIL_USE_TLS")
 BREVO_API_KEY=os.environ.get("BREVO_API_KEY")
+# Point at `manage.py fake_brevo_server` to load-test without sending real email
+BREVO_API_HOST = os.environ.get("BREVO_API_HOST", "https://api.sendinblue.com/v3")
+BREVO_CONNECT_TIMEOUT = float(os.environ.get("BREVO_CONNECT_TIMEOUT", 3))
+BREVO_READ_TIMEOUT = float(os.environ.get("BREVO_READ_TIMEOUT", 10))
+# Kept-alive connections per process, size it to the outbox worker concurrency
+BREVO_CONNECTION_POOL_SIZE = int(os.environ.get("BREVO_CONNECTION_POOL_SIZE", 8))
 DEFAULT_FROM_EMAIL=os.environ.get("DEFAULT_FROM_EMAIL")
 
 OTP_EXPIRY_TIME = 600
@@ -201,6 +280,12 @@ OTP_EXPIRY_TIME = 600
 
 TOKEN_EXPIRY_TIME = 1
 
+# Access token blacklist checks go through a per-process bloom filter. Logouts on
+# other workers apply within ACCESS_TOKEN_BLACKLIST_TTL seconds, even with a shared CACHE_BACKEND
+ACCESS_TOKEN_BLACKLIST_TTL = float(os.environ.get("ACCESS_TOKEN_BLACKLIST_TTL", 5))
+ACCESS_TOKEN_BLACKLIST_REBUILD_INTERVAL = float(os.environ.get("ACCESS_TOKEN_BLACKLIST_REBUILD_INTERVAL", 3600))
+ACCESS_TOKEN_BLACKLIST_CAPACITY = int(os.environ.get("ACCESS_TOKEN_BLACKLIST_CAPACITY", 100000))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=TOKEN_EXPIRY_TIME),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=3),
@@ -1,46 +1,105 @@
 # utils/brevo_utils.py
 
+import logging
+import os
+import threading
+
 from sib_api_v3_sdk import Configuration, ApiClient
 from sib_api_v3_sdk.api.transactional_emails_api import TransactionalEmailsApi
-from sib_api_v3_sdk.models import SendSmtpEmail, CreateSmtpEmail
+from sib_api_v3_sdk.models import SendSmtpEmail, SendSmtpEmailMessageVersions, CreateSmtpEmail
 from django.conf import settings
 
-def send_brevo_email(subject, body, to_emails):
+logger = logging.getLogger("app")
+
+FROM_EMAIL = "no-reply@spatiumoffices.com"
+FROM_NAME = "Spatium Offices"
+
+# Brevo accepts at most this many message versions in one call
+MAX_MESSAGE_VERSIONS = 1000
+
+
+class BrevoTransport:
+    """
+    Per-process Brevo client.
+
+    The ApiClient and its urllib3 pool are created on first use and kept, so
+    consecutive sends reuse kept-alive TLS connections. A forked child (e.g. a
+    gunicorn worker) notices the pid change and builds its own client instead
+    of sharing the parent's sockets.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._api = None
+
+    def _get_api(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    configuration = Configuration()
+                    configuration.host = settings.BREVO_API_HOST
+                    configuration.api_key['api-key'] = settings.BREVO_API_KEY
+                    configuration.connection_pool_maxsize = settings.BREVO_CONNECTION_POOL_SIZE
+                    self._api = TransactionalEmailsApi(ApiClient(configuration))
+                    self._pid = pid
+        return self._api
+
+    def reset(self):
+        # The next send builds a new client, e.g. after BREVO_API_HOST changed
+        with self._lock:
+            self._pid = None
+            self._api = None
+
+    def _send(self, send_smtp_email):
+        try:
+            response = self._get_api().send_transac_email(
+                send_smtp_email,
+                _request_timeout=(settings.BREVO_CONNECT_TIMEOUT, settings.BREVO_READ_TIMEOUT),
+            )
 
-    from_email = "no-reply@spatiumoffices.com"
-    from_name = "Spatium Offices"
-    configuration = Configuration()
-    configuration.api_key['api-key'] = settings.BREVO_API_KEY
-    
-    api_client = ApiClient(configuration)
-    
-    try:
-        api_instance = TransactionalEmailsApi(api_client)
-        
-        send_smtp_email = SendSmtpEmail(
+            # Check the response status or other indicators to determine success or failure
+            if isinstance(response, CreateSmtpEmail):
+                return True, "Email sent successfully"
+            logger.error(f"unexpected Brevo response: {response}")
+            return False, f"Failed to send email. Response: {response}"
+
+        except Exception as e:
+            error_message = f"Error sending email: {str(e)}"
+            logger.error(error_message)
+            return False, error_message
+
+    def send(self, subject, body, to_emails):
+        return self._send(SendSmtpEmail(
             to=[{"email": email} for email in to_emails],
-            sender={"email": from_email, "name": from_name},
+            sender={"email": FROM_EMAIL, "name": FROM_NAME},
             subject=subject,
             html_content=body
-        )
-        
-        # Send the email using Brevo API
-        response = api_instance.send_transac_email(send_smtp_email)
-        
-        # Check the response status or other indicators to determine success or failure
-        if isinstance(response, CreateSmtpEmail):
-            # Assuming success based on receiving CreateSmtpEmail object
-            return True, "Email sent successfully"
-        else:
-            print(response)
-            # Handle other cases where response indicates failure
-            return False, f"Failed to send email. Response: {response}"
-    
-    except Exception as e:
-        error_message = f"Error sending email: {str(e)}"
-        print(error_message)
-        return False, error_message
-    
-    finally:
-        if api_client:
-            api_client.pool.close()  # Adjust based on SDK specifics
+        ))
+
+    def send_versions(self, body, versions):
+        """
+        Sends one ``body`` to several ``(subject, to_emails)`` versions in a
+        single API call. Each version is delivered as its own email, so
+        recipients of different versions don't see each other.
+        """
+        if len(versions) > MAX_MESSAGE_VERSIONS:
+            raise ValueError(f"At most {MAX_MESSAGE_VERSIONS} message versions can be sent at once.")
+
+        return self._send(SendSmtpEmail(
+            sender={"email": FROM_EMAIL, "name": FROM_NAME},
+            subject=versions[0][0],
+            html_content=body,
+            message_versions=[
+                SendSmtpEmailMessageVersions(to=[{"email": email} for email in to_emails], subject=subject)
+                for subject, to_emails in versions
+            ],
+        ))
+
+
+brevo_transport = BrevoTransport()
+
+
+def send_brevo_email(subject, body, to_emails):
+    return brevo_transport.send(subject, body, to_emails)
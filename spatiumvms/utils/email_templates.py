@@ -0,0 +1,63 @@
+# utils/email_templates.py
+
+import logging
+import re
+import threading
+
+from django.template import Context, Template, TemplateDoesNotExist, TemplateSyntaxError, engines
+
+logger = logging.getLogger("app")
+
+EMAIL_TEMPLATES = (
+    'Otp.html',
+    'Visitor_request.html',
+    'Download_id.html',
+    'Visitor_invite.html',
+)
+
+# Indentation only makes the email bigger, mail clients don't see it
+_INDENTATION = re.compile(r'\n[ \t]+')
+
+
+class EmailTemplateRegistry:
+    """
+    Compiles each email template once per process and afterwards renders
+    only the per-message context.
+
+    The templates are already written with inline styles (the one <style>
+    block is an Outlook conditional comment that must stay in the head), so
+    compiling just strips the indentation.
+    """
+
+    def __init__(self, names):
+        self.names = names
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def _compile(self, name):
+        engine = engines['django'].engine
+        source = engine.get_template(name).source
+        template = Template(_INDENTATION.sub('\n', source).strip(), engine=engine, name=name)
+        with self._lock:
+            self._compiled[name] = template
+        return template
+
+    def warm_up(self):
+        # Runs for every manage.py command, a broken template must not stop migrate.
+        # It is compiled again, and raises, when an email actually needs it
+        for name in self.names:
+            try:
+                self._compile(name)
+            except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+                logger.error(f"email template {name} could not be compiled: {e!r}")
+
+    def render(self, name, context):
+        template = self._compiled.get(name) or self._compile(name)
+        return template.render(Context(context))
+
+
+email_templates = EmailTemplateRegistry(EMAIL_TEMPLATES)
+
+
+def render_email(name, context):
+    return email_templates.render(name, context)
@@ -0,0 +1,105 @@
+# utils/fake_brevo.py
+
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SEND_PATH = "/v3/smtp/email"
+
+
+class FakeBrevoServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the part of the Brevo transactional email API that
+    send_brevo_email uses (POST /v3/smtp/email). Every accepted email is
+    counted and dropped. ``latency`` and ``jitter`` are in seconds,
+    ``error_rate`` is the share of requests answered with a 500.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, seed=None, verbose=False):
+        super().__init__(address, FakeBrevoHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.emails = 0
+        self.errors = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v3"
+
+    def start(self):
+        """
+        Serves on a daemon thread and returns it, for use inside benchmarks.
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'emails': self.emails, 'errors': self.errors}
+
+
+class FakeBrevoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, don't let Nagle hold back the body
+    disable_nagle_algorithm = True
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+
+        if self.path.split("?")[0] != SEND_PATH:
+            return self._reply(404, {"code": "not_found", "message": "Not found"})
+        if not self.headers.get("api-key"):
+            return self._reply(401, {"code": "unauthorized", "message": "Key not found"})
+
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return self._reply(400, {"code": "bad_request", "message": "Invalid JSON"})
+
+        versions = payload.get("messageVersions") or []
+        if not payload.get("sender") or not payload.get("htmlContent") or not (payload.get("to") or versions):
+            return self._reply(400, {"code": "missing_parameter", "message": "sender, htmlContent and to are required"})
+
+        with server.lock:
+            delay = server.latency + server.random.uniform(0, server.jitter)
+            failed = server.random.random() < server.error_rate
+        time.sleep(delay)
+
+        with server.lock:
+            server.requests += 1
+            if failed:
+                server.errors += 1
+            else:
+                server.emails += len(versions) or 1
+
+        if failed:
+            return self._reply(500, {"code": "internal_error", "message": "Injected failure"})
+        if versions:
+            return self._reply(201, {"messageIds": [f"<{uuid.uuid4()}@fake-brevo>" for _ in versions]})
+        return self._reply(201, {"messageId": f"<{uuid.uuid4()}@fake-brevo>"})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
@@ -0,0 +1,109 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from vms.models import Visitor
+
+ANALYTICS_CACHE_PREFIX = 'vms:analytics'
+
+
+def _version_key(facility_id):
+    return f"{ANALYTICS_CACHE_PREFIX}:version:{facility_id}"
+
+
+def _new_version():
+    # Not 1, so entries cached before the version key was evicted are never matched again
+    return int(time.time() * 1000)
+
+
+def analytics_version(facility_id):
+    key = _version_key(facility_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_facility_analytics(facility_id):
+    key = _version_key(facility_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _new_version(), timeout=None)
+
+
+def compute_facility_analytics(facility_id, today):
+    """
+    Visitors per hour today, per day this month, and this month's split by
+    purpose of visit and host company, from a single grouped query.
+
+    Hours and days are bucketed in the project TIME_ZONE, not per facility.
+    Facilities don't record a time zone of their own, so a site elsewhere
+    sees its hours shifted by the difference.
+    """
+    current_timezone = timezone.get_current_timezone()
+    month_start = today.replace(day=1)
+
+    rows = (
+        Visitor.objects.filter(
+            facility_id=facility_id,
+            created_at__gte=timezone.make_aware(datetime.combine(month_start, datetime.min.time())),
+            created_at__lt=timezone.make_aware(datetime.combine(today + timedelta(days=1), datetime.min.time())),
+        )
+        .annotate(day=TruncDate('created_at', tzinfo=current_timezone), hour=ExtractHour('created_at', tzinfo=current_timezone))
+        .values('day', 'hour', 'purpose_of_visit_id', 'purpose_of_visit__name', 'company_id', 'company__name')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    hourly = [0] * 24
+    daily = {month_start + timedelta(days=offset): 0 for offset in range((today - month_start).days + 1)}
+    purposes = {}
+    companies = {}
+
+    for row in rows:
+        count = row['count']
+        if row['day'] == today:
+            hourly[row['hour']] += count
+        daily[row['day']] += count
+
+        purpose = purposes.setdefault(row['purpose_of_visit_id'], {
+            'purpose_of_visit_id': row['purpose_of_visit_id'], 'purpose_of_visit_name': row['purpose_of_visit__name'], 'count': 0,
+        })
+        purpose['count'] += count
+
+        company = companies.setdefault(row['company_id'], {
+            'company_id': row['company_id'], 'company_name': row['company__name'], 'count': 0,
+        })
+        company['count'] += count
+
+    return {
+        'facility_id': facility_id,
+        'timezone': str(current_timezone),
+        'date': today.isoformat(),
+        'hourly_today': [{'hour': hour, 'count': count} for hour, count in enumerate(hourly)],
+        'daily_this_month': [{'date': day.isoformat(), 'count': count} for day, count in daily.items()],
+        'by_purpose_this_month': sorted(purposes.values(), key=lambda item: -item['count']),
+        'by_company_this_month': sorted(companies.values(), key=lambda item: -item['count']),
+    }
+
+
+def facility_analytics(facility_id):
+    """
+    Cached compute_facility_analytics. Entries live for
+    VISITOR_ANALYTICS_CACHE_TTL seconds and a check-in at the facility
+    replaces them by bumping the facility's version.
+    """
+    today = timezone.localdate()
+    key = f"{ANALYTICS_CACHE_PREFIX}:{facility_id}:{today.isoformat()}:{analytics_version(facility_id)}"
+    data = cache.get(key)
+    if data is None:
+        data = compute_facility_analytics(facility_id, today)
+        cache.set(key, data, settings.VISITOR_ANALYTICS_CACHE_TTL)
+    return data
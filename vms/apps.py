@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class VmsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vms'
+
+    def ready(self):
+        from spatiumvms.utils.email_templates import email_templates
+
+        # Compile the email templates before the first check-in or OTP needs them
+        email_templates.warm_up()
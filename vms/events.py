@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+logger = logging.getLogger("app")
+
+# Columns of a check-in event
+CHECK_IN_FIELDS = (
+    'id', 'name', 'created_at', 'company_id', 'company__name', 'purpose_of_visit__name',
+    'user__first_name', 'user__last_name',
+)
+
+# Events kept for a subscriber that isn't reading, older ones are dropped
+SUBSCRIPTION_BACKLOG = 200
+
+# Visitor ids remembered per facility so the poller doesn't repeat local check-ins
+SEEN_IDS = 2000
+
+STREAM_TOKEN_SALT = 'vms.events.stream'
+
+
+def issue_stream_token(user_id, facility_id):
+    """
+    Returns a signed token that opens the event stream of ``facility_id``
+    for VMS_EVENTS_TOKEN_MAX_AGE seconds.
+    """
+    return signing.dumps({'user_id': user_id, 'facility_id': facility_id}, salt=STREAM_TOKEN_SALT, compress=True)
+
+
+def read_stream_token(token):
+    """
+    Returns the facility id of a stream token. Raises signing.BadSignature
+    when it was tampered with or signing.SignatureExpired when it is too old.
+    """
+    return signing.loads(token, salt=STREAM_TOKEN_SALT, max_age=settings.VMS_EVENTS_TOKEN_MAX_AGE)['facility_id']
+
+
+def format_event(event, data, event_id=None):
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, cls=DjangoJSONEncoder)}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+def check_in_event(row):
+    user_name = f"{row['user__first_name']} {row['user__last_name']}" if row['user__first_name'] is not None else None
+    return format_event('check_in', {
+        'id': row['id'],
+        'name': row['name'],
+        'company_id': row['company_id'],
+        'company_name': row['company__name'],
+        'purpose_of_visit_name': row['purpose_of_visit__name'],
+        'user_name': user_name,
+        'created_at': timezone.localtime(row['created_at']),
+    }, event_id=row['id'])
+
+
+def counters_event(facility_id):
+    from vms.stats import facility_visit_counts
+
+    return format_event('counters', facility_visit_counts(facility_id))
+
+
+class Subscription:
+    """
+    Events of one facility for one open stream. Waiting works from a
+    thread or greenlet (``wait``) and from an event loop (``wait_async``,
+    when created with ``loop``).
+    """
+
+    def __init__(self, facility_id, loop=None):
+        self.facility_id = facility_id
+        self.loop = loop
+        self._events = deque(maxlen=SUBSCRIPTION_BACKLOG)
+        self._ready = asyncio.Event() if loop is not None else threading.Event()
+
+    def push(self, event):
+        self._events.append(event)
+        if self.loop is None:
+            self._ready.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # The loop is gone, the stream is closing
+            pass
+
+    def drain(self):
+        self._ready.clear()
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+        return events
+
+    def wait(self, timeout):
+        return self._ready.wait(timeout)
+
+    async def wait_async(self, timeout):
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class FacilityEventBroker:
+    """
+    In-process pub/sub of check-in and counter events per facility.
+
+    Check-ins made on this worker are published as soon as they commit.
+    Check-ins made on other workers are picked up by one poller thread per
+    facility, which only runs while this worker has subscribers for it and
+    costs one indexed query every ``poll_interval`` seconds, however many
+    streams are open. A ``poll_interval`` of 0 turns polling off for
+    single worker deployments.
+    """
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._pollers = {}
+        self._seen = defaultdict(lambda: deque(maxlen=SEEN_IDS))
+
+    def subscribe(self, facility_id, loop=None):
+        subscription = Subscription(facility_id, loop)
+        with self._lock:
+            self._subscribers[facility_id].add(subscription)
+            if self.poll_interval and facility_id not in self._pollers:
+                poller = threading.Thread(target=self._poll, args=(facility_id,), daemon=True)
+                self._pollers[facility_id] = poller
+                poller.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.facility_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.facility_id]
+
+    def has_subscribers(self, facility_id):
+        return bool(self._subscribers.get(facility_id))
+
+    def publish(self, facility_id, events):
+        with self._lock:
+            subscribers = list(self._subscribers.get(facility_id, ()))
+        for subscription in subscribers:
+            for event in events:
+                subscription.push(event)
+
+    def _publish_rows(self, facility_id, rows):
+        seen = self._seen[facility_id]
+        rows = [row for row in rows if row['id'] not in seen]
+        if not rows:
+            return
+        seen.extend(row['id'] for row in rows)
+        self.publish(facility_id, [check_in_event(row) for row in rows] + [counters_event(facility_id)])
+
+    def publish_check_ins(self, visitors):
+        """
+        Publishes committed visitors to this worker's streams. Does nothing
+        for facilities nobody on this worker is watching.
+        """
+        from vms.models import Visitor
+
+        visitor_ids = defaultdict(list)
+        for visitor in visitors:
+            if visitor.facility_id is not None and self.has_subscribers(visitor.facility_id):
+                visitor_ids[visitor.facility_id].append(visitor.id)
+
+        for facility_id, ids in visitor_ids.items():
+            rows = Visitor.objects.filter(id__in=ids).order_by('id').values(*CHECK_IN_FIELDS)
+            self._publish_rows(facility_id, list(rows))
+
+    def _poll(self, facility_id):
+        from vms.models import Visitor
+
+        # Look back a little further than the last poll so rows committed late by another worker aren't missed
+        overlap = timedelta(seconds=self.poll_interval + 30)
+        since = timezone.now()
+        try:
+            while True:
+                time.sleep(self.poll_interval)
+                with self._lock:
+                    if not self._subscribers.get(facility_id):
+                        del self._pollers[facility_id]
+                        return
+
+                polled_at = timezone.now()
+                try:
+                    close_old_connections()
+                    rows = Visitor.objects.filter(facility_id=facility_id, created_at__gte=since - overlap).order_by('id').values(*CHECK_IN_FIELDS)
+                    self._publish_rows(facility_id, list(rows))
+                    since = polled_at
+                except Exception as e:
+                    logger.error(f"visitor event poll failed for facility {facility_id}: {str(e)}")
+        finally:
+            connection.close()
+
+
+facility_events = FacilityEventBroker(settings.VMS_EVENTS_POLL_INTERVAL)
+
+
+def initial_events(facility_id, last_event_id=None):
+    """
+    First chunk of a stream: check-ins missed since ``last_event_id`` when
+    the browser reconnects, then the current counters.
+    """
+    from vms.models import Visitor
+
+    events = []
+    if str(last_event_id or '').isdigit():
+        rows = (
+            Visitor.objects.filter(facility_id=facility_id, id__gt=int(last_event_id))
+            .order_by('id')
+            .values(*CHECK_IN_FIELDS)[:SUBSCRIPTION_BACKLOG]
+        )
+        events.extend(check_in_event(row) for row in rows)
+    events.append(counters_event(facility_id))
+    return b"".join(events)
+
+
+def stream_events(facility_id, initial):
+    """
+    Server-sent events for WSGI (gevent) workers, where waiting blocks only the greenlet.
+    """
+    subscription = facility_events.subscribe(facility_id)
+    deadline = time.monotonic() + settings.VMS_EVENTS_STREAM_MAX_AGE
+    try:
+        yield b"retry: 3000\n\n" + initial
+        while time.monotonic() < deadline:
+            if subscription.wait(settings.VMS_EVENTS_HEARTBEAT):
+                yield b"".join(subscription.drain())
+            else:
+                yield b": keep-alive\n\n"
+    finally:
+        facility_events.unsubscribe(subscription)
+
+
+async def stream_events_async(facility_id, initial):
+    """
+    Server-sent events for ASGI servers, an open stream is a suspended coroutine.
+    """
+    subscription = facility_events.subscribe(facility_id, loop=asyncio.get_running_loop())
+    deadline = time.monotonic() + settings.VMS_EVENTS_STREAM_MAX_AGE
+    try:
+        yield b"retry: 3000\n\n" + initial
+        while time.monotonic() < deadline:
+            if await subscription.wait_async(settings.VMS_EVENTS_HEARTBEAT):
+                yield b"".join(subscription.drain())
+            else:
+                yield b": keep-alive\n\n"
+    finally:
+        facility_events.unsubscribe(subscription)
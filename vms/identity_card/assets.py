@@ -0,0 +1,115 @@
+import base64
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image
+
+logger = logging.getLogger("app")
+
+PLACEHOLDER_SIZE = (107, 106)
+PLACEHOLDER_COLOR = (217, 217, 222)
+
+# Seconds to wait before retrying a failed logo load
+LOGO_RETRY_INTERVAL = 60
+
+
+class BadgeAssetLoader:
+    """
+    Supplies the images embedded into identity cards as base64 encoded bytes.
+
+    Brand artwork is static, so it is loaded once per worker process and kept
+    in memory. Visitor photos are read straight from the storage backend
+    instead of looping back through the public media URL. A missing or
+    unreadable photo falls back to a placeholder so the render never fails.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (base64 logo, digest of the file, its modification time) once loaded
+        self._logo = None
+        self._logo_retry_at = 0
+        self._placeholder = None
+
+    @property
+    def has_logo(self):
+        return self._logo is not None
+
+    def logo_with_digest(self):
+        """
+        Returns ``(logo, digest)``. The digest identifies the logo file so
+        badges can be keyed on it, it is None while the placeholder stands in.
+        """
+        if self._logo is None:
+            with self._lock:
+                if self._logo is None and time.monotonic() >= self._logo_retry_at:
+                    content, modified_at = self._load_logo()
+                    if content is None:
+                        self._logo_retry_at = time.monotonic() + LOGO_RETRY_INTERVAL
+                    else:
+                        self._logo = (base64.b64encode(content), hashlib.sha256(content).hexdigest()[:16], modified_at)
+        logo = self._logo
+        return logo[:2] if logo is not None else (self.placeholder(), None)
+
+    @property
+    def logo_modified_at(self):
+        """
+        Unix time the loaded logo last changed, 0 while there is none.
+        """
+        logo = self._logo
+        return logo[2] if logo is not None else 0
+
+    def logo(self):
+        return self.logo_with_digest()[0]
+
+    def visitor_photo(self, name):
+        if not name:
+            return self.placeholder()
+
+        try:
+            with default_storage.open(str(name), 'rb') as fh:
+                content = fh.read()
+        except (OSError, ValueError) as e:
+            logger.error(f"visitor image {name} could not be read: {e}")
+            return self.placeholder()
+
+        if not content:
+            return self.placeholder()
+        return base64.b64encode(content)
+
+    def placeholder(self):
+        if self._placeholder is None:
+            buffer = io.BytesIO()
+            Image.new('RGB', PLACEHOLDER_SIZE, PLACEHOLDER_COLOR).save(buffer, format='PNG')
+            self._placeholder = base64.b64encode(buffer.getvalue())
+        return self._placeholder
+
+    def _load_logo(self):
+        path = settings.IDENTITY_CARD_LOGO_PATH
+        if path and os.path.exists(path):
+            with open(path, 'rb') as fh:
+                return fh.read(), os.path.getmtime(path)
+
+        if path:
+            logger.error(f"identity card logo {path} is missing")
+        if not settings.IDENTITY_CARD_LOGO_URL:
+            if not path:
+                logger.error("identity card logo is not configured, set IDENTITY_CARD_LOGO_PATH")
+            return None, None
+
+        try:
+            response = requests.get(settings.IDENTITY_CARD_LOGO_URL, timeout=5)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error(f"identity card logo could not be fetched: {e}")
+            return None, None
+        return response.content, time.time()
+
+
+badge_assets = BadgeAssetLoader()
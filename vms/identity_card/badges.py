@@ -0,0 +1,162 @@
+import time
+from collections import deque
+from functools import partial
+
+from django.conf import settings
+
+from vms.utils import visit_validity
+
+from .assets import badge_assets
+from .rendering import RenderPoolSaturated, badge_render_pool
+from .sheets import SHEET_COLUMNS, SHEET_ROWS, PdfStreamWriter, badge_page, sheet_page
+from .store import BadgeStore, badge_store
+from .template import identity_card_template
+
+# Columns IdentityCardView and the batch export need to build a badge
+BADGE_FIELDS = (
+    'id', 'name', 'image', 'image_badge', 'phone_number', 'created_at', 'modified_at',
+    'purpose_of_visit__name', 'company__name', 'user__first_name', 'user__last_name',
+)
+
+
+def badge_cache_key(visitor, logo_digest):
+    return BadgeStore.make_key(visitor['id'], visitor['modified_at'], identity_card_template.version, logo_digest)
+
+
+def build_badge_svg(visitor, logo):
+    """
+    Fills the identity card template for a visitor row selected with
+    BADGE_FIELDS, with ``logo`` from ``badge_assets.logo_with_digest()``.
+    """
+    created_at = visitor['created_at']
+    formatted_created_at = created_at.strftime("%d %b %Y")
+    user_name = f"{visitor['user__first_name']} {visitor['user__last_name']}"
+    _, end_date = visit_validity(created_at)
+
+    # Prefer the badge sized derivative, older visitors only have the original upload
+    image = visitor['image_badge'] or visitor['image']
+
+    # Only the variable text and images are filled in, the rest of the badge is pre-compiled
+    return identity_card_template.render(
+        name=visitor['name'],
+        phone_number=visitor['phone_number'],
+        company_name=visitor['company__name'],
+        user_name=user_name,
+        purpose_of_visit=visitor['purpose_of_visit__name'],
+        formatted_end_date=end_date.strftime('%I:%M %p'),
+        formatted_created_at=formatted_created_at,
+        base64_profile_image=badge_assets.visitor_photo(image),
+        base64_image=logo,
+    )
+
+
+def store_badge(cache_key, png_data, has_logo):
+    # Don't pin a badge rendered without the logo, the next download retries it.
+    # has_logo is whether the SVG was built with the logo, it may have loaded since.
+    if has_logo:
+        badge_store.put(cache_key, png_data)
+
+
+class BatchRenderIncomplete(RenderPoolSaturated):
+    """
+    Raised when a batch has more uncached badges than one request renders.
+    The rendered ones are stored, so a retry carries on from there.
+    """
+
+
+def _store_rendered(cache_key, has_logo, future):
+    if not future.cancelled() and future.exception() is None:
+        store_badge(cache_key, future.result(), has_logo)
+
+
+def render_budget(timeout):
+    # Renders the pool can be expected to finish within ``timeout``
+    return max(1, int(badge_render_pool.workers * timeout / settings.IDENTITY_CARD_RENDER_SECONDS))
+
+
+def render_badges(visitors, timeout):
+    """
+    Returns the PNG for each visitor row, in order.
+
+    Cached badges are reused and the rest are rendered on the render pool,
+    a few at a time, within ``timeout`` seconds. Each badge is stored as soon
+    as it is rendered, so when the pool is busy (RenderPoolSaturated), a
+    render runs past the deadline (RenderTimeout) or there are more badges
+    than the pool gets through in ``timeout`` (BatchRenderIncomplete), the
+    retry only renders what is still missing.
+    """
+    deadline = time.monotonic() + timeout
+    results = [None] * len(visitors)
+    missing = []
+    logo, logo_digest = badge_assets.logo_with_digest()
+    has_logo = logo_digest is not None
+
+    for index, visitor in enumerate(visitors):
+        cache_key = badge_cache_key(visitor, logo_digest)
+        png_data = badge_store.get(cache_key)
+        if png_data is None:
+            missing.append((index, cache_key, visitor))
+        else:
+            results[index] = png_data
+
+    # Placeholder badges aren't stored, splitting them over retries would never finish
+    budget = render_budget(timeout) if has_logo else len(missing)
+
+    window = badge_render_pool.workers + 1
+    in_flight = deque()
+
+    def collect():
+        index, future = in_flight.popleft()
+        results[index] = badge_render_pool.result(future, timeout=max(deadline - time.monotonic(), 0))
+
+    for index, cache_key, visitor in missing[:budget]:
+        future = badge_render_pool.submit(build_badge_svg(visitor, logo), wait=max(deadline - time.monotonic(), 0.001))
+        future.add_done_callback(partial(_store_rendered, cache_key, has_logo))
+        in_flight.append((index, future))
+        if len(in_flight) >= window:
+            collect()
+
+    while in_flight:
+        collect()
+
+    if len(missing) > budget:
+        raise BatchRenderIncomplete(f"{len(missing) - budget} badges left to render")
+    return results
+
+
+def render_badge_pages(png_list, layout, timeout):
+    """
+    Returns the PDF pages for a batch, one badge per page, or with
+    ``layout='sheet'`` badges tiled onto A4 sheets. Pages are composed on the
+    render pool a few at a time, so a failing or busy pool raises here, before
+    any of the response has been sent.
+    """
+    if layout == 'sheet':
+        per_page = SHEET_COLUMNS * SHEET_ROWS
+        tasks = [(sheet_page, png_list[i:i + per_page]) for i in range(0, len(png_list), per_page)]
+    else:
+        tasks = [(badge_page, png_data) for png_data in png_list]
+
+    pages = []
+    window = badge_render_pool.workers + 1
+    in_flight = deque()
+    for fn, arg in tasks:
+        in_flight.append(badge_render_pool.submit_task(fn, arg, wait=timeout))
+        if len(in_flight) >= window:
+            pages.append(badge_render_pool.result(in_flight.popleft(), timeout=timeout))
+
+    while in_flight:
+        pages.append(badge_render_pool.result(in_flight.popleft(), timeout=timeout))
+
+    return pages
+
+
+def stream_badge_pdf(pages):
+    """
+    Yields a PDF made of pages from ``render_badge_pages``, one page at a time.
+    """
+    writer = PdfStreamWriter()
+    yield writer.open()
+    for page in pages:
+        yield writer.page(*page)
+    yield writer.close()
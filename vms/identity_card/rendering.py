@@ -0,0 +1,116 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+logger = logging.getLogger("app")
+
+
+def svg_to_png(svg_bytes):
+    # Imported inside the pool process only, the web worker never loads cairo.
+    import cairosvg
+    return cairosvg.svg2png(bytestring=svg_bytes)
+
+
+class RenderPoolSaturated(Exception):
+    """
+    Raised when the render queue is full and the request should be retried later.
+    """
+
+
+class RenderTimeout(Exception):
+    """
+    Raised when a render doesn't finish within the per-render timeout.
+    """
+
+
+class BadgeRenderPool:
+    """
+    Rasterizes identity cards in a bounded pool of worker processes.
+
+    cairo is CPU bound and would otherwise block every greenlet on the gevent
+    worker. At most ``max_pending`` renders are queued or running per web
+    worker; past that ``submit`` fails fast with RenderPoolSaturated instead
+    of growing the backlog. A slot is released only once its render really
+    finishes, so renders that timed out still count against the limit.
+    """
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        # Created lazily so each gunicorn worker starts its own pool after the fork.
+        # Pool processes are spawned, not forked, to stay clear of the gevent hub.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._executor
+
+    def _discard_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit_task(self, fn, *args, wait=None):
+        """
+        Runs ``fn(*args)`` in the pool and returns a future. ``fn`` must be a
+        module level function that doesn't need Django. By default a full queue
+        fails fast; ``wait`` is the number of seconds to wait for a free slot.
+        """
+        if wait is None:
+            acquired = self._slots.acquire(blocking=False)
+        else:
+            acquired = self._slots.acquire(timeout=wait)
+        if not acquired:
+            raise RenderPoolSaturated()
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard_executor(executor)
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        future.executor = executor
+        return future
+
+    def submit(self, svg_content, wait=None):
+        """
+        Queues ``svg_content`` (bytes) for rasterization and returns a future.
+        """
+        return self.submit_task(svg_to_png, svg_content, wait=wait)
+
+    def result(self, future, timeout=None):
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise RenderTimeout()
+        except BrokenProcessPool:
+            logger.error("identity card render pool crashed, starting a new one")
+            self._discard_executor(future.executor)
+            raise
+
+    def render(self, svg_content):
+        return self.result(self.submit(svg_content))
+
+
+badge_render_pool = BadgeRenderPool(
+    settings.IDENTITY_CARD_RENDER_WORKERS,
+    settings.IDENTITY_CARD_RENDER_QUEUE_DEPTH,
+    settings.IDENTITY_CARD_RENDER_TIMEOUT,
+)
@@ -0,0 +1,114 @@
+import io
+
+from PIL import Image
+
+# These helpers run inside the render pool processes, keep them free of Django.
+
+POINTS_PER_INCH = 72
+
+# One badge per page, printed 2.25 inches wide
+BADGE_PAGE_WIDTH = 2.25 * POINTS_PER_INCH
+
+# A4 sheet with a 3x3 grid of badges, composed at 200 dpi
+SHEET_PAGE_SIZE = (595.28, 841.89)
+SHEET_DPI = 200
+SHEET_COLUMNS = 3
+SHEET_ROWS = 3
+SHEET_MARGIN = 24
+
+JPEG_QUALITY = 88
+
+
+def _jpeg(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+def badge_page(png_data):
+    """
+    Returns ``(jpeg, width, height, page_width, page_height)`` for a single
+    badge page.
+    """
+    image = Image.open(io.BytesIO(png_data)).convert('RGB')
+    width, height = image.size
+    page_height = BADGE_PAGE_WIDTH * height / width
+    return _jpeg(image), width, height, BADGE_PAGE_WIDTH, page_height
+
+
+def sheet_page(png_list):
+    """
+    Tiles up to SHEET_COLUMNS x SHEET_ROWS badges onto one A4 page, returned
+    in the same shape as ``badge_page``.
+    """
+    page_width, page_height = SHEET_PAGE_SIZE
+    width = round(page_width / POINTS_PER_INCH * SHEET_DPI)
+    height = round(page_height / POINTS_PER_INCH * SHEET_DPI)
+    sheet = Image.new('RGB', (width, height), 'white')
+
+    cell_width = (width - SHEET_MARGIN) // SHEET_COLUMNS
+    cell_height = (height - SHEET_MARGIN) // SHEET_ROWS
+
+    for index, png_data in enumerate(png_list):
+        badge = Image.open(io.BytesIO(png_data)).convert('RGB')
+        badge.thumbnail((cell_width - SHEET_MARGIN, cell_height - SHEET_MARGIN), Image.LANCZOS)
+
+        column, row = index % SHEET_COLUMNS, index // SHEET_COLUMNS
+        left = SHEET_MARGIN + column * cell_width + (cell_width - SHEET_MARGIN - badge.width) // 2
+        top = SHEET_MARGIN + row * cell_height + (cell_height - SHEET_MARGIN - badge.height) // 2
+        sheet.paste(badge, (left, top))
+
+    return _jpeg(sheet), width, height, page_width, page_height
+
+
+class PdfStreamWriter:
+    """
+    Writes a PDF made of full-page JPEG images one page at a time, so a batch
+    can be streamed without holding the whole document in memory. The page
+    tree and cross-reference table are written last.
+    """
+
+    def __init__(self):
+        self.position = 0
+        self.offsets = {}
+        self.page_ids = []
+        # 1 is the catalog and 2 the page tree, both written in close()
+        self.next_id = 3
+
+    def _write(self, data):
+        self.position += len(data)
+        return data
+
+    def _object(self, object_id, body):
+        self.offsets[object_id] = self.position
+        return self._write(b"%d 0 obj\n" % object_id + body + b"\nendobj\n")
+
+    def open(self):
+        return self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def page(self, jpeg, width, height, page_width, page_height):
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+        self.page_ids.append(page_id)
+
+        content = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (page_width, page_height)
+        return b"".join([
+            self._object(image_id, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+                                   b"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode /Length %d >>\n"
+                                   b"stream\n" % (width, height, len(jpeg)) + jpeg + b"\nendstream"),
+            self._object(content_id, b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"),
+            self._object(page_id, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+                                  b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+                                  % (page_width, page_height, image_id, content_id)),
+        ])
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.page_ids)
+        data = self._object(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(self.page_ids))
+        data += self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self.position
+        xref = [b"xref\n0 %d\n" % self.next_id, b"0000000000 65535 f \n"]
+        xref += [b"%010d 00000 n \n" % self.offsets[object_id] for object_id in range(1, self.next_id)]
+        xref.append(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.next_id, xref_offset))
+        return data + self._write(b"".join(xref))
@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger("app")
+
+
+class BadgeStore:
+    """
+    Content-addressed on-disk store for rendered identity cards.
+
+    Entries are keyed on everything that changes the rendered badge (visitor,
+    its ``modified_at``, the template version and the logo), so an entry never goes
+    stale; superseded entries simply age out. The store is bounded by
+    ``max_bytes`` and evicts the least recently used files first. Several
+    worker processes may share the same directory.
+    """
+
+    suffix = ".png"
+
+    # Evict down to this fraction of max_bytes so eviction doesn't run on every write.
+    low_watermark = 0.9
+
+    def __init__(self, root, max_bytes):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+
+    @staticmethod
+    def make_key(visitor_id, modified_at, template_version, logo_digest=None):
+        raw = f"{visitor_id}:{modified_at.isoformat()}:{template_version}:{logo_digest}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], key + self.suffix)
+
+    def get(self, key):
+        """
+        Returns the cached bytes for ``key`` or None on a miss.
+        """
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+        except FileNotFoundError:
+            return None
+
+        # Bump the mtime so eviction treats the entry as recently used.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        path = self.path_for(key)
+        directory = os.path.dirname(path)
+
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            # Atomic rename, readers in other workers never see a partial file.
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"failed to store identity card {key}: {e}")
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += len(data)
+
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            shards = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return entries
+
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _disk_usage(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.low_watermark
+
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        self._size = total
+
+
+badge_store = BadgeStore(settings.IDENTITY_CARD_CACHE_DIR, settings.IDENTITY_CARD_CACHE_MAX_BYTES)
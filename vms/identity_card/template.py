@@ -0,0 +1,94 @@
+import re
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+SLOT_PATTERN = re.compile(r'\{(\w+)\}')
+
+# Characters XML 1.0 doesn't allow at all, escaping can't make them valid
+INVALID_XML_CHARS = re.compile('[^\x09\x0A\x0D\x20-\uD7FF\uE000-\uFFFD\U00010000-\U0010FFFF]')
+
+
+class BadgeTemplate:
+    """
+    An SVG template compiled once at import time.
+
+    The source is checked for well-formedness and split at its ``{slot}``
+    placeholders into pre-encoded static chunks, so a render only escapes the
+    variable values and joins bytes. Text slots are stripped of characters XML
+    can't carry and XML escaped; ``raw_slots`` (base64 image data, preferably
+    bytes) are inserted verbatim.
+    """
+
+    def __init__(self, version, source, raw_slots=()):
+        self.version = version
+        self.raw_slots = frozenset(raw_slots)
+
+        # Parse once with empty slots so a broken template fails at startup, not per request.
+        ET.fromstring(SLOT_PATTERN.sub('', source).encode('utf-8'))
+
+        parts = SLOT_PATTERN.split(source)
+        self._chunks = [part.encode('utf-8') for part in parts[0::2]]
+        self._slots = parts[1::2]
+
+    @property
+    def slots(self):
+        return tuple(self._slots)
+
+    def render(self, **context):
+        output = [self._chunks[0]]
+        for slot, chunk in zip(self._slots, self._chunks[1:]):
+            value = context[slot]
+            if value is None:
+                value = b''
+            elif slot in self.raw_slots:
+                # Image data arrives as base64 bytes and is copied as-is.
+                if isinstance(value, str):
+                    value = value.encode('ascii')
+            else:
+                value = escape(INVALID_XML_CHARS.sub('', str(value))).encode('utf-8')
+            output.append(value)
+            output.append(chunk)
+        return b''.join(output)
+
+
+IDENTITY_CARD_SVG = """<?xml version="1.0" encoding="utf-8"?>
+<svg version="1.1" id="Layer_1" xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" x="0px" y="0px" viewBox="0 0 1125 1963" style="enable-background:new 0 0 1125 1963;" xml:space="preserve">
+<g>
+<linearGradient id="Rectangle_15_00000061439451003741594480000011590328598646312856_" gradientUnits="userSpaceOnUse" x1="0.793" y1="2438.2202" x2="0.793" y2="2435.219" gradientTransform="matrix(375 0 0 -654 265 1594596)">
+<stop offset="0" style="stop-color:#6E36C5"/>
+<stop offset="0.429" style="stop-color:#411F74"/>
+<stop offset="1" style="stop-color:#2F1754"/>
+</linearGradient>
+<rect id="Rectangle_15" x="-0.34" y="0" style="fill:url(#Rectangle_15_00000061439451003741594480000011590328598646312856_);" width="1125.46" height="1962.81"/>
+<g id="Rectangle_14" transform="translate(14 179)">
+<path style="opacity:0.1;fill:#FFFFFF;" d="M69.69,358.22h954.39c23.21,0,42.02,18.81,42.02,42.02v1293.53 c0,23.21-18.81,42.02-42.02,42.02H69.69c-23.21,0-42.02-18.81-42.02-42.02V400.24C27.67,377.03,46.48,358.22,69.69,358.22z"/>
+<path style="fill:none;stroke:#FFFFFF;" d="M69.69,359.72h954.39c22.38,0,40.52,18.14,40.52,40.52v1293.53 c0,22.38-18.14,40.52-40.52,40.52H69.69c-22.38,0-40.52-18.14-40.52-40.52V400.24C29.17,377.86,47.31,359.72,69.69,359.72z"/>
+</g>
+<g id="Rectangle_13" transform="translate(128 120)">
+<path style="fill:#FFFFFF;" d="M282.82,240.15h300.12c14.92,0,27.01,12.09,27.01,27.01v300.12c0,14.92-12.09,27.01-27.01,27.01 H282.82c-14.92,0-27.01-12.09-27.01-27.01V267.16C255.81,252.24,267.91,240.15,282.82,240.15z"/>
+<path style="fill:none;stroke:#FFFFFF;" d="M282.82,241.65h300.12c14.09,0,25.51,11.42,25.51,25.51v300.12 c0,14.09-11.42,25.51-25.51,25.51H282.82c-14.09,0-25.51-11.42-25.51-25.51V267.16C257.31,253.07,268.74,241.65,282.82,241.65z"/>
+</g>
+<text transform="matrix(1 0 0 1 550 843.3472)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:78.0321px;">{name}</text>
+<text transform="matrix(1 0 0 1 550 939.3877)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-Medium'; font-size:54.0222px;">{phone_number}</text>
+<text transform="matrix(1 0 0 1 344.7998 1134.4683)" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:78.0321px;">Host details</text>
+<text transform="matrix(1 0 0 1 550 1236.5098)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-Medium'; font-size:60.0247px;">{company_name}</text>
+<text transform="matrix(1 0 0 1 550 1311.542)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-Medium'; font-size:60.0247px;">{user_name}</text>
+<text transform="matrix(1 0 0 1 550 1467.6064)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:78.0321px;">{purpose_of_visit}</text>
+<text transform="matrix(1 0 0 1 191.7358 1617.6689)" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:48.0198px;">Valid till: {formatted_end_date} | {formatted_created_at}</text>
+<text transform="matrix(1 0 0 1 281.7734 1851.7646)" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:138.0568px;">VISITOR</text>
+<line id="Line_1" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1000.91" x2="1078.6" y2="1000.91"/>
+<line id="Line_2" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1691.2" x2="1078.6" y2="1691.2"/>
+<line id="Line_4" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1509.62" x2="1078.6" y2="1509.62"/>
+<line id="Line_3" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1379.07" x2="1078.6" y2="1379.07"/>
+<image style="overflow:visible;enable-background:new ;" width="107" height="106" id="sample2" xlink:href="data:image/png;base64,{base64_profile_image}" transform="matrix(3.0012 0 0 3.0012 398.8195 378.1557)"/>
+<image style="overflow:visible;enable-background:new ;" width="173" height="65" id="sample" xlink:href="data:image/png;base64,{base64_image}" transform="matrix(3.0012 0 0 3.0012 302.78 87.0358)"/>
+</g>
+</svg>
+"""
+
+# Bump the version whenever the layout changes, cached badges are keyed on it.
+identity_card_template = BadgeTemplate(
+    version=2,
+    source=IDENTITY_CARD_SVG,
+    raw_slots=('base64_profile_image', 'base64_image'),
+)
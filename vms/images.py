@@ -0,0 +1,57 @@
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger("app")
+
+# The identity card draws the photo at 107x106 scaled by 3.0012
+BADGE_IMAGE_SIZE = (321, 318)
+THUMBNAIL_SIZE = (96, 96)
+JPEG_QUALITY = 82
+
+
+def _encode_derivative(source, size):
+    image = source.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    # Saving without an exif argument drops the camera metadata (GPS, device, ...)
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def create_visitor_image_derivatives(visitor):
+    """
+    Stores a badge sized copy and a list thumbnail next to the visitor's
+    uploaded photo. Both are EXIF free JPEGs, rotated upright first.
+    Returns False when the visitor has no usable image or the copies could
+    not be stored.
+
+    CPU bound, so it runs in the create_visitor_image_derivatives command
+    rather than during check-in.
+    """
+    if not visitor.image:
+        return False
+
+    try:
+        with visitor.image.open('rb') as fh:
+            source = Image.open(fh)
+            # JPEGs are decoded at the smallest scale still covering the badge, a fraction of a phone photo
+            source.draft('RGB', BADGE_IMAGE_SIZE)
+            source = ImageOps.exif_transpose(source).convert('RGB')
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.error(f"visitor {visitor.id} image {visitor.image.name} could not be processed: {e}")
+        return False
+
+    base_name = os.path.splitext(os.path.basename(visitor.image.name))[0]
+
+    try:
+        visitor.image_badge.save(f"{base_name}_badge.jpg", ContentFile(_encode_derivative(source, BADGE_IMAGE_SIZE)), save=False)
+        visitor.image_thumbnail.save(f"{base_name}_thumb.jpg", ContentFile(_encode_derivative(source, THUMBNAIL_SIZE)), save=False)
+    except (OSError, ValueError) as e:
+        logger.error(f"visitor {visitor.id} image derivatives could not be stored: {e}")
+        return False
+    visitor.save(update_fields=['image_badge', 'image_thumbnail', 'modified_at'])
+    return True
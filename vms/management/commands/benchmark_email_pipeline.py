@@ -0,0 +1,112 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from spatiumvms.utils.brevo_utils import brevo_transport
+from spatiumvms.utils.fake_brevo import FakeBrevoServer
+
+
+def summarize(label, durations):
+    total = sum(durations)
+    ordered = sorted(durations)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (f"{label:<12} {len(durations) / total:8.1f} req/s  "
+            f"p50 {statistics.median(durations) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms")
+
+
+class Command(BaseCommand):
+    help = ("Measures check-in and verify-email throughput and the outbox send rate "
+            "against a local fake Brevo API, on a throwaway test database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help="Outbox worker concurrency while draining.")
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--latency-ms', type=float, default=100)
+        parser.add_argument('--jitter-ms', type=float, default=50)
+        parser.add_argument('--error-rate', type=float, default=0.0)
+
+    def handle(self, *args, **options):
+        server = FakeBrevoServer(
+            ('127.0.0.1', 0),
+            latency=options['latency_ms'] / 1000,
+            jitter=options['jitter_ms'] / 1000,
+            error_rate=options['error_rate'],
+            seed=0,
+        )
+        server.start()
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(BREVO_API_HOST=server.url, BREVO_API_KEY='benchmark',
+                                   BREVO_CONNECTION_POOL_SIZE=options['concurrency'],
+                                   AUTHENTICATION_FLAG='email', EMAIL_OUTBOX_BACKOFF_BASE=0.05):
+                brevo_transport.reset()
+                self.run_benchmark(options)
+        finally:
+            brevo_transport.reset()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(f"fake brevo   {server.stats()}")
+
+    def run_benchmark(self, options):
+        from admin_panel.models import Company, Facility, PurposeOfVisit
+        from authentication.models import CustomUser
+        from vms.models import EmailOutbox
+        from vms.outbox import drain_outbox
+
+        facility = Facility.objects.create(name='Benchmark')
+        company = Company.objects.create(name='Benchmark', facility=facility)
+        purpose = PurposeOfVisit.objects.create(name='Meeting')
+        host = CustomUser.objects.create(
+            email='host@example.com', phone_number='9000000000', first_name='Host',
+            company=company, facility=facility, is_superuser=True,
+        )
+
+        client = APIClient()
+        client.force_authenticate(host)
+
+        check_ins = []
+        for index in range(options['requests']):
+            start = time.perf_counter()
+            response = client.post('/api/v1/vms/visitor/', {
+                'name': f'Visitor {index}', 'email': f'visitor{index}@example.com',
+                'phone_number': f'{9100000000 + index}', 'company_id': company.id,
+                'user_id': host.id, 'purpose_of_visit_id': purpose.id,
+            }, format='json')
+            check_ins.append(time.perf_counter() - start)
+            if response.status_code != 201:
+                self.stderr.write(f"check-in failed: {response.status_code} {response.data}")
+                return
+        self.stdout.write(summarize('check-in', check_ins))
+
+        # verify-email still sends the OTP inline, so it pays the Brevo round trip
+        anonymous = APIClient()
+        verify_emails = []
+        for _ in range(options['requests']):
+            start = time.perf_counter()
+            anonymous.post('/api/v1/auth/verify-email/', {'email': host.email}, format='json')
+            verify_emails.append(time.perf_counter() - start)
+        self.stdout.write(summarize('verify-email', verify_emails))
+
+        queued = EmailOutbox.objects.count()
+        start = time.perf_counter()
+        while EmailOutbox.objects.filter(status__in=[EmailOutbox.PENDING, EmailOutbox.SENDING]).exists():
+            if not drain_outbox(options['batch_size'], options['concurrency']):
+                # Only retries that aren't due yet are left
+                time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+        sent = EmailOutbox.objects.filter(status=EmailOutbox.SENT).count()
+        failed = EmailOutbox.objects.filter(status=EmailOutbox.FAILED).count()
+        self.stdout.write(f"outbox       {sent / elapsed:8.1f} emails/s  {queued} queued, {sent} sent, {failed} failed "
+                          f"at concurrency {options['concurrency']}")
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from spatiumvms.constants import EMAIL_LOGO
+from spatiumvms.utils.email_templates import email_templates
+
+SAMPLE_CONTEXTS = {
+    'Otp.html': {'otp': '482913', 'logo': EMAIL_LOGO},
+    'Visitor_request.html': {
+        'employee_name': 'Rahul', 'name': 'Ananya Krishnamurthy', 'phone_number': '9876543210',
+        'email': 'ananya@example.com', 'purpose_of_visit': 'Interview', 'logo': EMAIL_LOGO,
+        'from_company': 'Acme & Sons',
+    },
+    'Download_id.html': {
+        'name': 'Ananya Krishnamurthy', 'visitor_id': 1024, 'base_url': 'https://vms.example.com', 'logo': EMAIL_LOGO,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = "Compares building the email bodies with render_to_string and with the pre-compiled template registry."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        for name, context in SAMPLE_CONTEXTS.items():
+            builds = (
+                ('render_to_string', lambda: render_to_string(name, context)),
+                ('registry', lambda: email_templates.render(name, context)),
+            )
+            for label, build in builds:
+                size = len(build())
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    build()
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{name:<22} {label:<17} {elapsed / iterations * 1e6:8.1f} us/email  {size:>6} bytes")
@@ -0,0 +1,120 @@
+import base64
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from vms.identity_card.template import identity_card_template
+
+
+def legacy_render(name, phone_number, company_name, user_name, purpose_of_visit,
+                  formatted_end_date, formatted_created_at, base64_profile_image, base64_image):
+    # The per-request f-string IdentityCardView used before the compiled template, kept as the baseline.
+    svg_content = f"""<?xml version="1.0" encoding="utf-8"?>
+        <!-- Generator: Adobe Illustrator 28.3.0, SVG Export Plug-In . SVG Version: 6.00 Build 0)  -->
+        <svg version="1.1" id="Layer_1" xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" x="0px" y="0px"
+            viewBox="0 0 1125 1963" style="enable-background:new 0 0 1125 1963;" xml:space="preserve">
+        <g>
+            
+                <linearGradient id="Rectangle_15_00000061439451003741594480000011590328598646312856_" gradientUnits="userSpaceOnUse" x1="0.793" y1="2438.2202" x2="0.793" y2="2435.219" gradientTransform="matrix(375 0 0 -654 265 1594596)">
+                <stop  offset="0" style="stop-color:#6E36C5"/>
+                <stop  offset="0.429" style="stop-color:#411F74"/>
+                <stop  offset="1" style="stop-color:#2F1754"/>
+            </linearGradient>
+            
+                <rect id="Rectangle_15" x="-0.34" y="0" style="fill:url(#Rectangle_15_00000061439451003741594480000011590328598646312856_);" width="1125.46" height="1962.81"/>
+            <g id="Rectangle_14" transform="translate(14 179)">
+                <path style="opacity:0.1;fill:#FFFFFF;" d="M69.69,358.22h954.39c23.21,0,42.02,18.81,42.02,42.02v1293.53
+                    c0,23.21-18.81,42.02-42.02,42.02H69.69c-23.21,0-42.02-18.81-42.02-42.02V400.24C27.67,377.03,46.48,358.22,69.69,358.22z"/>
+                <path style="fill:none;stroke:#FFFFFF;" d="M69.69,359.72h954.39c22.38,0,40.52,18.14,40.52,40.52v1293.53
+                    c0,22.38-18.14,40.52-40.52,40.52H69.69c-22.38,0-40.52-18.14-40.52-40.52V400.24C29.17,377.86,47.31,359.72,69.69,359.72z"/>
+            </g>
+            <g id="Rectangle_13" transform="translate(128 120)">
+                <path style="fill:#FFFFFF;" d="M282.82,240.15h300.12c14.92,0,27.01,12.09,27.01,27.01v300.12c0,14.92-12.09,27.01-27.01,27.01
+                    H282.82c-14.92,0-27.01-12.09-27.01-27.01V267.16C255.81,252.24,267.91,240.15,282.82,240.15z"/>
+                <path style="fill:none;stroke:#FFFFFF;" d="M282.82,241.65h300.12c14.09,0,25.51,11.42,25.51,25.51v300.12
+                    c0,14.09-11.42,25.51-25.51,25.51H282.82c-14.09,0-25.51-11.42-25.51-25.51V267.16C257.31,253.07,268.74,241.65,282.82,241.65z"/>
+            </g>
+            
+                <text transform="matrix(1 0 0 1 550 843.3472)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:78.0321px;">{name}</text>
+            
+                <text transform="matrix(1 0 0 1 550 939.3877)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-Medium'; font-size:54.0222px;">{phone_number}</text>
+            
+                <text transform="matrix(1 0 0 1 344.7998 1134.4683)" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:78.0321px;">Host details</text>
+            
+                <text transform="matrix(1 0 0 1 550 1236.5098)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-Medium'; font-size:60.0247px;">{company_name}</text>
+            
+                <text transform="matrix(1 0 0 1 550 1311.542)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-Medium'; font-size:60.0247px;">{user_name}</text>
+            
+                <text transform="matrix(1 0 0 1 550 1467.6064)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:78.0321px;">{purpose_of_visit}</text>
+            
+                <text transform="matrix(1 0 0 1 191.7358 1617.6689)" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:48.0198px;">Valid till: {formatted_end_date} | {formatted_created_at}</text>
+            
+                <text transform="matrix(1 0 0 1 281.7734 1851.7646)" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:138.0568px;">VISITOR</text>
+            <line id="Line_1" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1000.91" x2="1078.6" y2="1000.91"/>
+            <line id="Line_2" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1691.2" x2="1078.6" y2="1691.2"/>
+            <line id="Line_4" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1509.62" x2="1078.6" y2="1509.62"/>
+            <line id="Line_3" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1379.07" x2="1078.6" y2="1379.07"/>
+            
+                <image style="overflow:visible;enable-background:new    ;" width="107" height="106" id="sample2" xlink:href="data:image/png;base64,{base64_profile_image}" transform="matrix(3.0012 0 0 3.0012 398.8195 378.1557)">
+            </image>
+
+            <image style="overflow:visible;enable-background:new ;" width="173" height="65" id="sample" xlink:href="data:image/png;base64,{base64_image}" transform="matrix(3.0012 0 0 3.0012 302.78 87.0358)">
+            </image>
+        </g>
+        </svg>
+        """
+    return svg_content.encode('utf-8')
+
+
+def sample_image(size, fmt):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Compares the per-render cost of building the identity card SVG before and after the compiled template."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        text = {
+            'name': 'Ananya Krishnamurthy',
+            'phone_number': '9876543210',
+            'company_name': 'Acme & Sons Pvt. Ltd.',
+            'user_name': 'Rahul Sharma',
+            'purpose_of_visit': 'Interview',
+            'formatted_end_date': '01:30 PM',
+            'formatted_created_at': '18 Oct 2026',
+        }
+        photo = sample_image((321, 318), 'JPEG')
+        logo = sample_image((173, 65), 'PNG')
+        cached_logo = base64.b64encode(logo)
+
+        def before():
+            # Both images were base64 encoded and decoded to str on every request.
+            return legacy_render(
+                base64_profile_image=base64.b64encode(photo).decode(),
+                base64_image=base64.b64encode(logo).decode(),
+                **text,
+            )
+
+        def after():
+            # The logo is encoded once per process, text values are escaped.
+            return identity_card_template.render(
+                base64_profile_image=base64.b64encode(photo),
+                base64_image=cached_logo,
+                **text,
+            )
+
+        for label, build in (('before', before), ('after', after)):
+            size = len(build())
+            start = time.perf_counter()
+            for _ in range(iterations):
+                build()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{label:<8} {elapsed / iterations * 1e6:9.1f} us/render  {size:>8} bytes of SVG")
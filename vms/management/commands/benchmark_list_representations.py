@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+
+class Command(BaseCommand):
+    help = ("Compares list serialization through the DRF serializers with the .values() representations, "
+            "on a throwaway test database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run_benchmark(self, options):
+        from admin_panel.models import Company, Facility, PurposeOfVisit
+        from admin_panel.representations import CompanyVisitorRepresentation, UserRepresentation
+        from admin_panel.serializers import CompanyVisitorSerializer, UserSerializer
+        from authentication.models import CustomUser
+        from vms.models import Visitor
+        from vms.representations import VisitorRepresentation
+        from vms.serializers import VisitorSerializer
+
+        rows = options['rows']
+        facility = Facility.objects.create(name='Benchmark')
+        company = Company.objects.create(name='Benchmark', facility=facility)
+        purpose = PurposeOfVisit.objects.create(name='Meeting')
+        CustomUser.objects.bulk_create([
+            CustomUser(email=f'user{i}@example.com', phone_number=f'{9000000000 + i}', first_name='User', last_name=str(i),
+                       company=company, facility=facility, profile_picture=f'profile_pictures/{i}.png')
+            for i in range(rows)
+        ])
+        host = CustomUser.objects.first()
+        Visitor.objects.bulk_create([
+            Visitor(name=f'Visitor {i}', email=f'visitor{i}@example.com', phone_number=f'{9100000000 + i}', company=company,
+                    user=host, purpose_of_visit=purpose, image=f'visitors/{i}.jpg', image_thumbnail=f'visitors/{i}_thumb.jpg')
+            for i in range(rows)
+        ])
+
+        request = Request(APIRequestFactory().get('/'))
+        visitors = Visitor.objects.select_related('company', 'user', 'purpose_of_visit').order_by('-pk')
+        cases = (
+            ('VisitorSerializer', VisitorSerializer, VisitorRepresentation, visitors),
+            ('CompanyVisitorSerializer', CompanyVisitorSerializer, CompanyVisitorRepresentation, visitors),
+            ('UserSerializer', UserSerializer, UserRepresentation, CustomUser.objects.prefetch_related('groups', 'user_permissions').order_by('pk')),
+        )
+        renderer = JSONRenderer()
+
+        for label, serializer_class, representation_class, queryset in cases:
+            def serializer_path():
+                return renderer.render(serializer_class(queryset.all(), many=True, context={'request': request}).data)
+
+            def representation_path():
+                representation = representation_class(request)
+                return renderer.render(representation.represent(representation.values(queryset.all())))
+
+            identical = serializer_path() == representation_path()
+            timings = {}
+            for path_label, build in (('serializer', serializer_path), ('values', representation_path)):
+                start = time.perf_counter()
+                for _ in range(options['iterations']):
+                    build()
+                timings[path_label] = (time.perf_counter() - start) / options['iterations']
+
+            self.stdout.write(
+                f"{label:<26} serializer {rows / timings['serializer']:9.0f} rows/s  "
+                f"values {rows / timings['values']:9.0f} rows/s  "
+                f"x{timings['serializer'] / timings['values']:.1f}  identical={identical}"
+            )
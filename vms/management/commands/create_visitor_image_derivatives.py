@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from vms.images import create_visitor_image_derivatives
+from vms.models import Visitor
+
+
+class Command(BaseCommand):
+    help = "Creates badge and thumbnail images for visitors checked in with a photo, polling for new check-ins."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--poll-interval', type=float, default=2,
+                            help="Seconds to sleep when no visitor is waiting.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once every waiting visitor is done instead of polling.")
+
+    def handle(self, *args, **options):
+        created = 0
+        # Visitors whose image can't be processed keep an empty image_badge, only look past them
+        last_pk = 0
+        while True:
+            visitors = list(
+                Visitor.objects.exclude(image='').filter(image_badge='', pk__gt=last_pk)
+                .order_by('pk')[:options['batch_size']]
+            )
+            for visitor in visitors:
+                if create_visitor_image_derivatives(visitor):
+                    created += 1
+                last_pk = visitor.pk
+            if visitors:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Created image derivatives for {created} visitors."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from spatiumvms.utils.fake_brevo import FakeBrevoServer
+
+
+class Command(BaseCommand):
+    help = ("Runs a local stand-in for the Brevo transactional email API. "
+            "Point BREVO_API_HOST at the printed URL to send to it instead of Brevo.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8025)
+        parser.add_argument('--latency-ms', type=float, default=100,
+                            help="Fixed delay before every response.")
+        parser.add_argument('--jitter-ms', type=float, default=50,
+                            help="Random extra delay, up to this much.")
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help="Share of requests answered with a 500, between 0 and 1.")
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        server = FakeBrevoServer(
+            (options['host'], options['port']),
+            latency=options['latency_ms'] / 1000,
+            jitter=options['jitter_ms'] / 1000,
+            error_rate=options['error_rate'],
+            seed=options['seed'],
+            verbose=options['verbosity'] > 1,
+        )
+        self.stdout.write(f"Fake Brevo API listening on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(self.style.SUCCESS(f"Served {server.stats()}"))
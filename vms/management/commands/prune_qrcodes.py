@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from vms.models import Visitor
+from vms.qr import QR_DIRECTORY, QR_FILE_PATTERN
+
+
+class Command(BaseCommand):
+    help = "Deletes QR code images of visits that have expired or whose visitor no longer exists."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1,
+                            help="Keep QR codes of visits created within this many local days, today included.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        # Passes are valid until the end of the visit day at the latest
+        today = timezone.localdate()
+        cutoff = timezone.make_aware(datetime.combine(today - timedelta(days=options['days'] - 1), datetime.min.time()))
+
+        try:
+            _, file_names = default_storage.listdir(QR_DIRECTORY)
+        except FileNotFoundError:
+            file_names = []
+
+        files_by_visitor = {}
+        for file_name in file_names:
+            match = QR_FILE_PATTERN.match(file_name)
+            if match:
+                files_by_visitor.setdefault(int(match.group('visitor_id')), []).append(file_name)
+
+        visitor_ids = list(files_by_visitor)
+        active_ids = set()
+        batch_size = options['batch_size']
+        for start in range(0, len(visitor_ids), batch_size):
+            active_ids.update(
+                Visitor.objects.filter(id__in=visitor_ids[start:start + batch_size], created_at__gte=cutoff)
+                .values_list('id', flat=True)
+            )
+
+        deleted = 0
+        for visitor_id, names in files_by_visitor.items():
+            if visitor_id in active_ids:
+                continue
+            for file_name in names:
+                if not options['dry_run']:
+                    default_storage.delete(f"{QR_DIRECTORY}/{file_name}")
+                deleted += 1
+
+        action = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{action} {deleted} QR code files."))
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vms.stats import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = "Recomputes the per company daily visitor counters used by the dashboards."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only rebuild local dates from YYYY-MM-DD onwards.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--since must be in YYYY-MM-DD format.")
+
+        written = rebuild_daily_stats(since)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily visitor counters."))
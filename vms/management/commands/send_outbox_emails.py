@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from vms.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Sends queued visitor notification emails from the outbox, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help="Number of emails sent at the same time.")
+        parser.add_argument('--poll-interval', type=float, default=2,
+                            help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once no messages are due instead of polling.")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            attempted = drain_outbox(options['batch_size'], options['concurrency'])
+            total += attempted
+            if attempted:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Attempted {total} outbox emails."))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vms', '0004_visitor_from_company'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitor',
+            name='image_badge',
+            field=models.ImageField(blank=True, max_length=4096, upload_to='visitors/'),
+        ),
+        migrations.AddField(
+            model_name='visitor',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, max_length=4096, upload_to='visitors/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vms', '0005_visitor_image_badge_visitor_image_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitor',
+            name='pass_revoked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
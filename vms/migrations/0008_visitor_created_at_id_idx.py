@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 12:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vms', '0007_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visitor',
+            index=models.Index(fields=['-created_at', '-id'], name='visitor_created_at_id_idx'),
+        ),
+    ]
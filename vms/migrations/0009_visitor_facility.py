@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-18 12:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_visitor_facility(apps, schema_editor):
+    Company = apps.get_model('admin_panel', 'Company')
+    Visitor = apps.get_model('vms', 'Visitor')
+    Visitor.objects.filter(company__isnull=False).update(
+        facility_id=Subquery(Company.objects.filter(pk=OuterRef('company_id')).values('facility_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0006_zone_city'),
+        ('vms', '0008_visitor_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitor',
+            name='facility',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='visitor_facility', to='admin_panel.facility'),
+        ),
+        migrations.RunPython(backfill_visitor_facility, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='visitor',
+            index=models.Index(fields=['facility', '-created_at', '-id'], name='visitor_facility_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitor',
+            index=models.Index(fields=['company', '-created_at'], name='visitor_company_created_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-18 12:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def build_daily_stats(apps, schema_editor):
+    Visitor = apps.get_model('vms', 'Visitor')
+    VisitorDailyStat = apps.get_model('vms', 'VisitorDailyStat')
+    rows = (
+        Visitor.objects.filter(facility__isnull=False, company__isnull=False)
+        .annotate(date=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+        .values('facility_id', 'company_id', 'date')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    VisitorDailyStat.objects.bulk_create([VisitorDailyStat(**row) for row in rows.iterator()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0006_zone_city'),
+        ('vms', '0009_visitor_facility'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitorDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitor_daily_stats', to='admin_panel.company')),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitor_daily_stats', to='admin_panel.facility')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='visitordailystat',
+            index=models.Index(fields=['facility', 'date'], name='visitor_stat_facility_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='visitordailystat',
+            constraint=models.UniqueConstraint(fields=('facility', 'company', 'date'), name='visitor_daily_stat_unique'),
+        ),
+        migrations.RunPython(build_daily_stats, migrations.RunPython.noop),
+    ]
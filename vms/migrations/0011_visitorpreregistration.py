@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-18 12:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import vms.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0007_employeeimportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('vms', '0010_visitordailystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitorPreRegistration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=255)),
+                ('phone_number', models.CharField(max_length=13)),
+                ('name', models.CharField(max_length=100)),
+                ('from_company', models.TextField(blank=True, null=True)),
+                ('expected_on', models.DateField()),
+                ('code', models.CharField(default=vms.models.pre_registration_code, max_length=32, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitor_pre_registrations', to='admin_panel.company')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_pre_registrations', to=settings.AUTH_USER_MODEL)),
+                ('facility', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='visitor_pre_registrations', to='admin_panel.facility')),
+                ('purpose_of_visit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='visitor_pre_registrations', to='admin_panel.purposeofvisit')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='visitor_pre_registrations', to=settings.AUTH_USER_MODEL)),
+                ('visitor', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pre_registration', to='vms.visitor')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='visitorpreregistration',
+            index=models.Index(fields=['facility', 'expected_on'], name='visitor_prereg_facility_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='visitorpreregistration',
+            constraint=models.UniqueConstraint(fields=('company', 'expected_on', 'email'), name='visitor_pre_registration_unique'),
+        ),
+    ]
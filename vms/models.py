@@ -1,6 +1,9 @@
+import secrets
+
 from django.db import models
+from django.utils import timezone
 
-from admin_panel.models import Company, PurposeOfVisit
+from admin_panel.models import Company, Facility, PurposeOfVisit
 from authentication.models import CustomUser
 
 # Create your models here.
@@ -11,11 +14,120 @@ class Visitor(models.Model):
     name = models.CharField(max_length=100, blank=True)
     from_company = models.TextField(blank=True, null=True)
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='visitor_company', null=True, blank=True)
+    # Copy of company.facility at check-in, so facility queries don't join Company
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='visitor_facility', null=True, blank=True)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='visitor_user', null=True, blank=True)
     purpose_of_visit = models.ForeignKey(PurposeOfVisit, on_delete=models.CASCADE, related_name='purpose_if_visit', null=True, blank=True)
     image = models.ImageField(upload_to='visitors/', blank=True, max_length=4096)
+    image_badge = models.ImageField(upload_to='visitors/', blank=True, max_length=4096)
+    image_thumbnail = models.ImageField(upload_to='visitors/', blank=True, max_length=4096)
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
+    pass_revoked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='visitor_created_at_id_idx'),
+            models.Index(fields=['facility', '-created_at', '-id'], name='visitor_facility_created_idx'),
+            models.Index(fields=['company', '-created_at'], name='visitor_company_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        if self.company_id is not None and self.facility_id is None:
+            self.facility_id = Company.objects.filter(pk=self.company_id).values_list('facility_id', flat=True).first()
+        super().save(*args, **kwargs)
+
+class EmailOutbox(models.Model):
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    to_emails = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a pending message is due, or when the lease of a sending one runs out
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
+
+
+class VisitorDailyStat(models.Model):
+    """
+    Number of visitors checked in per company and local day, kept up to date
+    on insert and rebuilt with `manage.py rebuild_visitor_daily_stats`.
+    """
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='visitor_daily_stats')
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='visitor_daily_stats')
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['facility', 'company', 'date'], name='visitor_daily_stat_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['facility', 'date'], name='visitor_stat_facility_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.company_id} {self.date}: {self.count}"
+
+
+def pre_registration_code():
+    return secrets.token_urlsafe(12)
+
+
+class VisitorPreRegistration(models.Model):
+    """
+    A guest expected on a given day, registered ahead by their host. The
+    invite carries ``code`` as a QR code, and checking in at the desk turns
+    the pre-registration into a Visitor.
+    """
+    email = models.EmailField(max_length=255)
+    phone_number = models.CharField(max_length=13)
+    name = models.CharField(max_length=100)
+    from_company = models.TextField(blank=True, null=True)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='visitor_pre_registrations')
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='visitor_pre_registrations', null=True, blank=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='visitor_pre_registrations', null=True, blank=True)
+    purpose_of_visit = models.ForeignKey(PurposeOfVisit, on_delete=models.SET_NULL, related_name='visitor_pre_registrations', null=True, blank=True)
+    expected_on = models.DateField()
+    code = models.CharField(max_length=32, unique=True, default=pre_registration_code)
+    # Set when the guest checks in
+    visitor = models.OneToOneField(Visitor, on_delete=models.SET_NULL, related_name='pre_registration', null=True, blank=True)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, related_name='created_pre_registrations', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'expected_on', 'email'], name='visitor_pre_registration_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['facility', 'expected_on'], name='visitor_prereg_facility_idx'),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"{self.name} ({self.expected_on})"
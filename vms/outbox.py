@@ -0,0 +1,124 @@
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from spatiumvms.utils.brevo_utils import MAX_MESSAGE_VERSIONS, brevo_transport
+from vms.models import EmailOutbox
+
+logger = logging.getLogger("app")
+
+
+def enqueue_email(subject, body, to_emails):
+    """
+    Queues an email for the outbox worker. Call it inside the transaction that
+    writes the rows the email is about, so both are committed or neither is.
+    """
+    return EmailOutbox.objects.create(subject=subject, body=body, to_emails=list(to_emails))
+
+
+def enqueue_emails(messages, batch_size=500):
+    """
+    Queues many ``(subject, body, to_emails)`` emails with batched inserts,
+    for imports. Same transaction rule as enqueue_email.
+    """
+    return EmailOutbox.objects.bulk_create(
+        [EmailOutbox(subject=subject, body=body, to_emails=list(to_emails)) for subject, body, to_emails in messages],
+        batch_size=batch_size,
+    )
+
+
+def retry_delay(attempts):
+    # Exponential backoff with jitter, so a Brevo outage isn't retried in lockstep
+    delay = min(settings.EMAIL_OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), settings.EMAIL_OUTBOX_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_batch(batch_size):
+    """
+    Marks up to ``batch_size`` due messages as sending and returns them.
+    Rows locked by another worker are skipped. Messages left in sending by a
+    worker that died are due again once their lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=EmailOutbox.PENDING) | Q(status=EmailOutbox.SENDING), next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if messages:
+            EmailOutbox.objects.filter(id__in=[message.id for message in messages]).update(
+                status=EmailOutbox.SENDING,
+                next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE),
+                modified_at=now,
+            )
+    return messages
+
+
+def record_result(message, success, error):
+    now = timezone.now()
+    message.attempts += 1
+    if success:
+        message.status = EmailOutbox.SENT
+        message.sent_at = now
+        message.last_error = ''
+    elif message.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        message.status = EmailOutbox.FAILED
+        message.last_error = error
+        logger.error(f"outbox email {message.id} failed after {message.attempts} attempts: {error}")
+    else:
+        message.status = EmailOutbox.PENDING
+        message.next_attempt_at = now + retry_delay(message.attempts)
+        message.last_error = error
+    message.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at', 'modified_at'])
+
+
+def send_group(messages):
+    try:
+        if len(messages) == 1:
+            message = messages[0]
+            return brevo_transport.send(message.subject, message.body, message.to_emails)
+        # Same body, one API call with a message version per queued email
+        return brevo_transport.send_versions(
+            messages[0].body, [(message.subject, message.to_emails) for message in messages]
+        )
+    except Exception as e:
+        return False, str(e)
+
+
+def group_by_body(messages):
+    groups = {}
+    for message in messages:
+        group = groups.setdefault(message.body, [[]])
+        if len(group[-1]) >= MAX_MESSAGE_VERSIONS:
+            group.append([])
+        group[-1].append(message)
+    return [chunk for group in groups.values() for chunk in group]
+
+
+def drain_outbox(batch_size, concurrency):
+    """
+    Sends one batch of due messages, ``concurrency`` API calls at a time, and
+    returns the number of messages that were attempted. Messages with the
+    same body are coalesced into a single call.
+    """
+    messages = claim_batch(batch_size)
+    if not messages:
+        return 0
+
+    groups = group_by_body(messages)
+
+    # Only the Brevo calls run on the threads, every database write stays on this one
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send_group, groups))
+
+    for group, (success, error) in zip(groups, results):
+        for message in group:
+            record_result(message, success, error)
+    return len(messages)
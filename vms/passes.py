@@ -0,0 +1,131 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+
+from vms.utils import VISIT_MAX_DURATION, visit_validity
+
+PASS_TOKEN_VERSION = 1
+PASS_KEY_SALT = 'vms.passes.VisitorPass'
+
+# version, visitor id, facility id (0 when unknown), valid from and valid until as unix seconds
+_PAYLOAD = struct.Struct('>BQIII')
+# Truncated HMAC-SHA256, plenty against forgery for a pass that lives one day at most
+_SIGNATURE_BYTES = 12
+
+VisitorPass = namedtuple('VisitorPass', ['visitor_id', 'facility_id', 'valid_from', 'valid_until'])
+
+
+class InvalidPass(Exception):
+    """
+    Raised when a pass token can't be accepted, ``reason`` says why.
+    """
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+@lru_cache(maxsize=4)
+def _signing_key(secret):
+    return hashlib.sha256((PASS_KEY_SALT + secret).encode()).digest()
+
+
+def _sign(payload):
+    return hmac.new(_signing_key(settings.SECRET_KEY), payload, hashlib.sha256).digest()[:_SIGNATURE_BYTES]
+
+
+def issue_pass(visitor_id, facility_id, valid_from, valid_until):
+    """
+    Returns a URL safe token carrying the visitor, facility and validity window.
+    """
+    payload = _PAYLOAD.pack(
+        PASS_TOKEN_VERSION, visitor_id, facility_id or 0, int(valid_from.timestamp()), int(valid_until.timestamp()),
+    )
+    return base64.urlsafe_b64encode(payload + _sign(payload)).rstrip(b'=').decode()
+
+
+def pass_for_visitor(visitor_id, facility_id, created_at):
+    valid_from, valid_until = visit_validity(created_at)
+    return issue_pass(visitor_id, facility_id, valid_from, valid_until)
+
+
+def verify_pass(token, now=None):
+    """
+    Checks the signature and validity window of ``token`` without touching the
+    database and returns the VisitorPass. Raises InvalidPass otherwise.
+    """
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except (TypeError, ValueError, binascii.Error):
+        raise InvalidPass('malformed')
+    if len(data) != _PAYLOAD.size + _SIGNATURE_BYTES:
+        raise InvalidPass('malformed')
+
+    payload, signature = data[:_PAYLOAD.size], data[_PAYLOAD.size:]
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidPass('bad_signature')
+
+    version, visitor_id, facility_id, valid_from, valid_until = _PAYLOAD.unpack(payload)
+    if version != PASS_TOKEN_VERSION:
+        raise InvalidPass('unsupported_version')
+
+    now = time.time() if now is None else now
+    if now < valid_from:
+        raise InvalidPass('not_yet_valid')
+    if now > valid_until:
+        raise InvalidPass('expired')
+
+    return VisitorPass(visitor_id, facility_id or None, valid_from, valid_until)
+
+
+class RevocationCache:
+    """
+    In-process set of visitor ids whose passes were revoked.
+
+    Only passes of the last VISIT_MAX_DURATION can still verify, so that is
+    all the set holds. It is reloaded with a single query at most every
+    ``ttl`` seconds; revocations made by this worker apply immediately, the
+    ones made on other workers within ``ttl``.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._revoked = frozenset()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        from vms.models import Visitor
+
+        since = timezone.now() - VISIT_MAX_DURATION
+        return frozenset(
+            Visitor.objects.filter(pass_revoked_at__isnull=False, created_at__gte=since).values_list('id', flat=True)
+        )
+
+    def refresh(self):
+        revoked = self._load()
+        with self._lock:
+            self._revoked = revoked
+            self._loaded_at = time.monotonic()
+
+    def is_revoked(self, visitor_id):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            self.refresh()
+        return visitor_id in self._revoked
+
+    def add(self, visitor_id):
+        with self._lock:
+            self._revoked = self._revoked | {visitor_id}
+
+
+revocation_cache = RevocationCache(settings.VISITOR_PASS_REVOCATION_TTL)
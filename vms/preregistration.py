@@ -0,0 +1,157 @@
+import logging
+
+import pandas as pd
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from spatiumvms.constants import EMAIL_LOGO, VISITOR_INVITE
+from spatiumvms.utils.email_templates import render_email
+
+from .models import Visitor, VisitorPreRegistration
+from .outbox import enqueue_emails
+from .serializers import enqueue_check_in_emails
+from .stats import record_check_ins
+
+logger = logging.getLogger("app")
+
+# CSV header -> JSON key
+CSV_COLUMNS = {
+    'Name': 'name',
+    'Email': 'email',
+    'PhoneNumber': 'phone_number',
+    'FromCompany': 'from_company',
+}
+REQUIRED_COLUMNS = ['Name', 'Email', 'PhoneNumber']
+
+INSERT_BATCH_SIZE = 500
+
+
+def read_csv(file):
+    """
+    Reads an uploaded guest list. Returns ``(rows, error)``.
+    """
+    try:
+        df = pd.read_csv(file, dtype=str, keep_default_na=False)
+    except pd.errors.EmptyDataError:
+        return None, 'Empty file provided'
+    missing_columns = list(set(REQUIRED_COLUMNS) - set(df.columns))
+    if missing_columns:
+        return None, f'Missing required columns: {missing_columns}'
+    return df.rename(columns=CSV_COLUMNS), None
+
+
+def read_json(visitors):
+    if not isinstance(visitors, list) or not all(isinstance(visitor, dict) for visitor in visitors):
+        return None, 'visitors must be a list of objects.'
+    return pd.DataFrame(visitors, columns=list(CSV_COLUMNS.values()), dtype=object), None
+
+
+def _is_email(value):
+    try:
+        validate_email(value)
+        return True
+    except ValidationError:
+        return False
+
+
+def validate_rows(df, company_id, expected_on):
+    """
+    Checks the whole guest list at once: required values and formats per
+    column, guests listed twice, and guests already pre-registered with the
+    company for that day (one IN query). Returns the valid rows and the
+    failure messages, both in row order.
+    """
+    df = df.reindex(columns=list(CSV_COLUMNS.values())).fillna('').astype(str).apply(lambda column: column.str.strip())
+    df.index = pd.RangeIndex(1, len(df) + 1)
+
+    taken = set(
+        VisitorPreRegistration.objects.filter(
+            company_id=company_id, expected_on=expected_on, email__in=list(set(df['email'])),
+        ).values_list('email', flat=True)
+    )
+
+    checks = (
+        (df['name'] == '', lambda row: f"Row {row.Index}: Name is required."),
+        (~df['email'].map(_is_email), lambda row: f"Row {row.Index}: Email '{row.email}' is not valid."),
+        (~df['phone_number'].str.fullmatch(r'[0-9]{10}'), lambda row: f"Row {row.Index}: Phone number '{row.phone_number}' is not valid."),
+        (df['email'].isin(taken), lambda row: f"Row {row.Index}: Email '{row.email}' is already pre-registered for {expected_on}."),
+        (df['email'].duplicated(), lambda row: f"Row {row.Index}: Email '{row.email}' is listed more than once."),
+    )
+
+    failures = {}
+    failed = pd.Series(False, index=df.index)
+    for mask, message in checks:
+        # One message per row, the first check it fails
+        for row in df[mask & ~failed].itertuples():
+            failures[row.Index] = message(row)
+        failed |= mask
+
+    return df[~failed], [failures[row] for row in sorted(failures)]
+
+
+def pre_register(rows, company, expected_on, host, purpose_of_visit_id, created_by):
+    """
+    Inserts the validated guests and queues their invites in the same
+    transaction, in batches. Returns the pre-registrations.
+    """
+    pre_registrations = [
+        VisitorPreRegistration(
+            name=row.name, email=row.email, phone_number=row.phone_number, from_company=row.from_company or None,
+            company_id=company.id, facility_id=company.facility_id, user_id=host.id,
+            purpose_of_visit_id=purpose_of_visit_id, expected_on=expected_on, created_by=created_by,
+        )
+        for row in rows.itertuples()
+    ]
+
+    host_name = f"{host.first_name} {host.last_name}".strip() or host.email
+    subject = VISITOR_INVITE.get("subject", "").format(company.name)
+    with transaction.atomic():
+        VisitorPreRegistration.objects.bulk_create(pre_registrations, batch_size=INSERT_BATCH_SIZE)
+        enqueue_emails(
+            (
+                subject,
+                render_email('Visitor_invite.html', {
+                    'name': pre_registration.name, 'host_name': host_name, 'company_name': company.name,
+                    'expected_on': expected_on.strftime('%d %b %Y'), 'code': pre_registration.code,
+                    'base_url': settings.FRONT_DOMAIN, 'logo': EMAIL_LOGO,
+                }),
+                [pre_registration.email],
+            )
+            for pre_registration in pre_registrations
+        )
+
+    logger.info(f"pre-registered {len(pre_registrations)} visitors for company {company.id} on {expected_on}")
+    return pre_registrations
+
+
+def check_in(pre_registration_id):
+    """
+    Creates the Visitor for a pre-registered guest, the same way a desk
+    check-in does. Returns ``(visitor, created)``, ``created`` is False when
+    the guest had already checked in.
+    """
+    with transaction.atomic():
+        pre_registration = VisitorPreRegistration.objects.select_for_update().get(pk=pre_registration_id)
+        if pre_registration.visitor_id is not None:
+            return pre_registration.visitor, False
+
+        visitor = Visitor.objects.create(
+            name=pre_registration.name, email=pre_registration.email, phone_number=pre_registration.phone_number,
+            from_company=pre_registration.from_company, company_id=pre_registration.company_id,
+            facility_id=pre_registration.facility_id, user_id=pre_registration.user_id,
+            purpose_of_visit_id=pre_registration.purpose_of_visit_id,
+        )
+        pre_registration.visitor = visitor
+        pre_registration.save(update_fields=['visitor', 'modified_at'])
+        record_check_ins([visitor])
+
+        enqueue_check_in_emails(visitor)
+
+    return visitor, True
+
+
+def pass_payload(code):
+    # What the desk scanner reads from the invite
+    return settings.FRONT_DOMAIN+"/api/v1/vms/pre-registration-check-in/?code="+code
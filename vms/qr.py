@@ -0,0 +1,70 @@
+import hashlib
+import io
+import re
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+QR_DIRECTORY = 'qrcodes'
+QR_FORMATS = ('png', 'svg')
+
+QR_ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_L
+QR_BOX_SIZE = 10
+QR_BORDER = 4
+
+# qrcode_<visitor id>_<payload hash>.<format>, older files have no hash
+QR_FILE_PATTERN = re.compile(r'^qrcode_(?P<visitor_id>\d+)(?:_[0-9a-f]{16})?\.(?:png|svg)$')
+
+
+def identity_card_payload(visitor_id, pass_token):
+    # The signed pass lets gates verify the code without a database lookup
+    return settings.FRONT_DOMAIN+"/api/v1/vms/identity-card/?visitor_id="+str(visitor_id)+"&pass="+pass_token
+
+
+def render_qr(payload, image_format='png'):
+    """
+    Draws ``payload`` as a QR code in memory and returns the PNG or SVG bytes.
+    """
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=QR_ERROR_CORRECTION,
+        box_size=QR_BOX_SIZE,
+        border=QR_BORDER,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    if image_format == 'svg':
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+
+    buffer = io.BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
+
+
+def qr_file_name(visitor_id, payload, image_format='png'):
+    # Everything that changes the drawing goes into the hash, so one name always means one image
+    fingerprint = f"{payload}|{QR_ERROR_CORRECTION}|{QR_BOX_SIZE}|{QR_BORDER}"
+    digest = hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+    return f"{QR_DIRECTORY}/qrcode_{visitor_id}_{digest}.{image_format}"
+
+
+def get_or_create_qr(visitor_id, payload, image_format='png'):
+    """
+    Returns the storage name of the QR image for ``payload``, only drawing
+    and writing it when no file with the same payload hash exists yet.
+    """
+    name = qr_file_name(visitor_id, payload, image_format)
+    if default_storage.exists(name):
+        return name
+
+    saved_name = default_storage.save(name, ContentFile(render_qr(payload, image_format)))
+    if saved_name != name:
+        # A concurrent request wrote the same image first, keep a single copy.
+        default_storage.delete(saved_name)
+    return name
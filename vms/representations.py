@@ -0,0 +1,36 @@
+from spatiumvms.utils.representations import ValuesRepresentation, column, related_column
+
+
+def host_name(row):
+    # VisitorSerializer.get_user_name
+    if row['user_id'] is None:
+        return None
+    return f"{row['user__first_name']} {row['user__last_name']}"
+
+
+class VisitorRepresentation(ValuesRepresentation):
+    """
+    Fast list output of VisitorSerializer.
+    """
+
+    columns = (
+        'id', 'email', 'phone_number', 'name', 'from_company', 'image', 'image_thumbnail', 'created_at', 'modified_at',
+        'company_id', 'company__name', 'user_id', 'user__first_name', 'user__last_name',
+        'purpose_of_visit_id', 'purpose_of_visit__name',
+    )
+
+    def get_fields(self):
+        return [
+            ('id', column('id')),
+            ('email', column('email')),
+            ('phone_number', column('phone_number')),
+            ('name', column('name')),
+            ('company_name', related_column('company_id', 'company__name')),
+            ('from_company', column('from_company')),
+            ('user_name', host_name),
+            ('purpose_of_visit_name', related_column('purpose_of_visit_id', 'purpose_of_visit__name')),
+            ('image', self.file_column('image')),
+            ('image_thumbnail', self.file_column('image_thumbnail')),
+            ('created_at', self.datetime_column('created_at')),
+            ('modified_at', self.datetime_column('modified_at')),
+        ]
@@ -11,17 +11,52 @@ from spatiumvms.constants import (
 )
 
 from .models import Visitor
+from .outbox import enqueue_email
+from .stats import record_check_ins
 import re
 from django.conf import settings
-from django.template.loader import render_to_string
+from spatiumvms.utils.email_templates import render_email
 from django.core.mail import EmailMultiAlternatives
-from spatiumvms.utils.brevo_utils import send_brevo_email
+from django.db import transaction
+
+def enqueue_check_in_emails(visitor):
+    """
+    Queues the host's "visitor waiting" email and the visitor's identity
+    card link. Call it inside the check-in transaction.
+    """
+    # Pre-registrations keep their guests when the host or purpose of visit is deleted
+    purpose_of_visit = visitor.purpose_of_visit.name if visitor.purpose_of_visit else ''
+
+    if visitor.user is not None:
+        recipient = visitor.user.email
+        subject = VISITOR_WAITING.get("subject", "")
+
+        html_content = render_email('Visitor_request.html', {'employee_name':visitor.user.first_name,'name': visitor.name,'phone_number': visitor.phone_number,'email': visitor.email,'purpose_of_visit':purpose_of_visit , 'logo': EMAIL_LOGO,'from_company':visitor.from_company})
+
+        to_emails = [recipient]
+
+        # Sent by the outbox worker, check-in doesn't wait on Brevo
+        enqueue_email(subject, html_content, to_emails)
+
+
+    visitor_recipient = visitor.email
+    visitor_subject = DOWNLOAD_ID.get("subject", "")
+
+    base_url = settings.FRONT_DOMAIN
+
+    visitor_html_content = render_email('Download_id.html', {'name': visitor.name,'visitor_id':visitor.id,'base_url':base_url, 'logo': EMAIL_LOGO})
+
+    visitor_to_emails = [visitor_recipient]
+
+    enqueue_email(visitor_subject, visitor_html_content, visitor_to_emails)
+
 
 class VisitorSerializer(serializers.ModelSerializer):
     company_name = serializers.CharField(source='company.name', read_only=True)
     user_name = serializers.SerializerMethodField()
     purpose_of_visit_name = serializers.CharField(source='purpose_of_visit.name', read_only=True)
     phone_number = serializers.CharField(required=True)
+    image_thumbnail = serializers.ImageField(read_only=True)
 
     company_id = serializers.PrimaryKeyRelatedField(queryset=Company.objects.all(), write_only=True)
     user_id = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all(), write_only=True)
@@ -47,35 +82,21 @@ class VisitorSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        company_id = validated_data.pop('company_id').id
+        company = validated_data.pop('company_id')
+        company_id = company.id
         user_id = validated_data.pop('user_id').id
         purpose_of_visit_id = validated_data.pop('purpose_of_visit_id').id
 
-        visitor = Visitor.objects.create(company_id=company_id, user_id=user_id, purpose_of_visit_id=purpose_of_visit_id, **validated_data)
-
-        recipient = visitor.user.email
-        subject = VISITOR_WAITING.get("subject", "")
-
-        html_content = render_to_string('Visitor_request.html', {'employee_name':visitor.user.first_name,'name': visitor.name,'phone_number': visitor.phone_number,'email': visitor.email,'purpose_of_visit':visitor.purpose_of_visit.name , 'logo': EMAIL_LOGO,'from_company':visitor.from_company})
-
-        to_emails = [recipient]
-        
-        success, message = send_brevo_email(subject, html_content, to_emails)
-
-
-        visitor_recipient = visitor.email
-        visitor_subject = DOWNLOAD_ID.get("subject", "")
-
-        base_url = settings.FRONT_DOMAIN
+        with transaction.atomic():
+            visitor = Visitor.objects.create(company_id=company_id, facility_id=company.facility_id, user_id=user_id, purpose_of_visit_id=purpose_of_visit_id, **validated_data)
+            record_check_ins([visitor])
 
-        visitor_html_content = render_to_string('Download_id.html', {'name': visitor.name,'visitor_id':visitor.id,'base_url':base_url, 'logo': EMAIL_LOGO})
+            enqueue_check_in_emails(visitor)
 
-        visitor_to_emails = [visitor_recipient]
-        
-        success, message = send_brevo_email(visitor_subject, visitor_html_content, visitor_to_emails)
-        
+        # Badge and thumbnail copies are made by the create_visitor_image_derivatives worker,
+        # until then the badge uses the original upload
         return visitor
 
     class Meta:
         model = Visitor
-        fields = ['id', 'email', 'phone_number', 'name', 'company_name', 'from_company', 'user_name', 'purpose_of_visit_id', 'purpose_of_visit_name', 'image', 'created_at', 'modified_at', 'company_id', 'user_id']
+        fields = ['id', 'email', 'phone_number', 'name', 'company_name', 'from_company', 'user_name', 'purpose_of_visit_id', 'purpose_of_visit_name', 'image', 'image_thumbnail', 'created_at', 'modified_at', 'company_id', 'user_id']
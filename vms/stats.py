@@ -0,0 +1,127 @@
+from collections import Counter
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FilteredRelation, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from admin_panel.models import Company
+from vms.analytics import invalidate_facility_analytics
+from vms.events import facility_events
+from vms.models import Visitor, VisitorDailyStat
+
+
+def increment_daily_stat(facility_id, company_id, date, amount=1):
+    """
+    Adds ``amount`` to the counter row, creating it on the first visitor of the day.
+    """
+    key = {'facility_id': facility_id, 'company_id': company_id, 'date': date}
+    if VisitorDailyStat.objects.filter(**key).update(count=F('count') + amount):
+        return
+    try:
+        with transaction.atomic():
+            VisitorDailyStat.objects.create(count=amount, **key)
+    except IntegrityError:
+        # Another check-in created the row first
+        VisitorDailyStat.objects.filter(**key).update(count=F('count') + amount)
+
+
+def record_check_ins(visitors):
+    """
+    Counts new visitors in the daily stats. Visitors without a company or
+    facility don't show up on any dashboard and aren't counted.
+    """
+    visitors = list(visitors)
+    counts = Counter(
+        (visitor.facility_id, visitor.company_id, timezone.localdate(visitor.created_at))
+        for visitor in visitors
+        if visitor.facility_id is not None and visitor.company_id is not None
+    )
+    for (facility_id, company_id, date), amount in counts.items():
+        increment_daily_stat(facility_id, company_id, date, amount)
+
+    # Cached analytics are dropped once the new visitors are visible to other requests
+    for facility_id in {facility_id for facility_id, _, _ in counts}:
+        transaction.on_commit(lambda facility_id=facility_id: invalidate_facility_analytics(facility_id))
+
+    # Open dashboards on this worker get the new visitors pushed to them
+    if counts:
+        transaction.on_commit(lambda: facility_events.publish_check_ins(visitors))
+
+
+def rebuild_daily_stats(since=None):
+    """
+    Recomputes the counters from the visitor table, from local date ``since``
+    onwards or for all time. Returns the number of counter rows written.
+    """
+    visitors = Visitor.objects.filter(facility__isnull=False, company__isnull=False)
+    stats = VisitorDailyStat.objects.all()
+    if since is not None:
+        start = timezone.make_aware(datetime.combine(since, datetime.min.time()))
+        visitors = visitors.filter(created_at__gte=start)
+        stats = stats.filter(date__gte=since)
+
+    rows = (
+        visitors.annotate(date=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+        .values('facility_id', 'company_id', 'date')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        stats.delete()
+        created = VisitorDailyStat.objects.bulk_create(
+            [VisitorDailyStat(**row) for row in rows.iterator()], batch_size=1000
+        )
+    return len(created)
+
+
+def facility_visit_counts(facility_id, today=None):
+    """
+    Today's and this month's visitor counts for a facility, read from the rollup.
+    """
+    today = today or timezone.localdate()
+    counts = VisitorDailyStat.objects.filter(
+        facility_id=facility_id,
+        date__gte=today.replace(day=1),
+        date__lte=today,
+    ).aggregate(
+        today=Sum('count', filter=Q(date=today)),
+        month=Sum('count'),
+    )
+    return {
+        'visitors_today_count': counts['today'] or 0,
+        'visitors_this_month_count': counts['month'] or 0,
+    }
+
+
+def company_visit_counts(facility_id, today=None):
+    """
+    Today's and this month's visitor counts for every active company of a
+    facility, companies without visitors included, in one grouped query
+    over the rollup.
+    """
+    today = today or timezone.localdate()
+    companies = (
+        Company.objects.filter(facility_id=facility_id, is_archive=False)
+        .annotate(month_stats=FilteredRelation(
+            'visitor_daily_stats',
+            condition=Q(visitor_daily_stats__date__gte=today.replace(day=1), visitor_daily_stats__date__lte=today),
+        ))
+        .values('id', 'name')
+        .annotate(
+            today=Sum('month_stats__count', filter=Q(month_stats__date=today)),
+            month=Sum('month_stats__count'),
+        )
+        .order_by('name', 'id')
+    )
+    return [
+        {
+            'company_id': company['id'],
+            'company_name': company['name'],
+            'visitors_today_count': company['today'] or 0,
+            'visitors_this_month_count': company['month'] or 0,
+        }
+        for company in companies
+    ]
@@ -1,3 +1,1046 @@
-from django.test import TestCase
+import base64
+import io
+import os
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.template import TemplateDoesNotExist, engines
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from sib_api_v3_sdk.models import CreateSmtpEmail
+
+from admin_panel.models import Company, Facility, PurposeOfVisit
+from authentication.models import CustomRole, CustomUser
+from spatiumvms.middleware import ImmutableMediaCacheMiddleware
+from spatiumvms.utils.brevo_utils import MAX_MESSAGE_VERSIONS, BrevoTransport
+from spatiumvms.utils.email_templates import EMAIL_TEMPLATES, EmailTemplateRegistry
+from vms import preregistration
+from vms.analytics import compute_facility_analytics
+from vms.events import FacilityEventBroker, issue_stream_token
+from vms.models import EmailOutbox, Visitor, VisitorDailyStat, VisitorPreRegistration
+from vms.outbox import claim_batch, drain_outbox, enqueue_email, group_by_body, record_result
+from vms.passes import InvalidPass, RevocationCache, issue_pass, pass_for_visitor, verify_pass
+from vms.qr import QR_DIRECTORY, get_or_create_qr, render_qr
+from vms.representations import VisitorRepresentation
+from vms.serializers import VisitorSerializer, enqueue_check_in_emails
+from vms.images import create_visitor_image_derivatives
+from vms.identity_card.assets import BadgeAssetLoader
+from vms.identity_card.badges import badge_cache_key, build_badge_svg, render_badges
+from vms.identity_card.rendering import BadgeRenderPool, RenderPoolSaturated, RenderTimeout
+from vms.identity_card.store import BadgeStore
+from vms.stats import rebuild_daily_stats, record_check_ins
 
 # Create your tests here.
+
+
+class VisitorListQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        facility = Facility.objects.create(name='Facility')
+        company = Company.objects.create(name='Company', facility=facility, spoc_email='spoc@example.com', spoc_phone_number='9000000001')
+        purpose = PurposeOfVisit.objects.create(name='Meeting')
+        cls.user = CustomUser.objects.create(email='admin@example.com', phone_number='9000000000', facility=facility, is_superuser=True)
+        Visitor.objects.bulk_create([
+            Visitor(name=f'Visitor {i}', email=f'visitor{i}@example.com', phone_number=f'{9100000000 + i}',
+                    company=company, user=cls.user, purpose_of_visit=purpose)
+            for i in range(60)
+        ])
+
+    def list_query_count(self, query):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/v1/vms/visitor/?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(row['purpose_of_visit_name'] == 'Meeting' for row in response.data['results']))
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.assertEqual(self.list_query_count('page_size=5'), self.list_query_count('page_size=50'))
+
+    def test_page_number_query_count_does_not_grow_with_page_size(self):
+        self.assertEqual(
+            self.list_query_count('pagination=page&page_size=5'),
+            self.list_query_count('pagination=page&page_size=50'),
+        )
+
+    def list_page(self, url):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cursor_walk_over_equal_timestamps_has_no_duplicates_or_gaps(self):
+        Visitor.objects.update(created_at=timezone.now())
+
+        seen = []
+        url = '/api/v1/vms/visitor/?page_size=7'
+        while url:
+            page = self.list_page(url)
+            self.assertNotIn('count', page)
+            seen += [row['id'] for row in page['results']]
+            url = page['next']
+
+        self.assertEqual(seen, list(Visitor.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_page_size_is_clamped(self):
+        Visitor.objects.bulk_create([
+            Visitor(name=f'Extra {i}', email=f'extra{i}@example.com', phone_number=f'{9200000000 + i}', user=self.user)
+            for i in range(450)
+        ])
+        self.assertEqual(len(self.list_page('/api/v1/vms/visitor/?page_size=1000')['results']), 500)
+
+    def test_page_number_pagination_keeps_its_shape(self):
+        page = self.list_page('/api/v1/vms/visitor/?pagination=page&page_size=10&page=2')
+        self.assertEqual(set(page), {'count', 'next', 'previous', 'results'})
+        self.assertEqual(page['count'], 60)
+        self.assertEqual(len(page['results']), 10)
+        self.assertIn('page=3', page['next'])
+
+
+class VisitorRepresentationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        facility = Facility.objects.create(name='Facility')
+        company = Company.objects.create(name='Company', facility=facility, spoc_email='spoc@example.com', spoc_phone_number='9000000001')
+        purpose = PurposeOfVisit.objects.create(name='Meeting')
+        user = CustomUser.objects.create(email='host@example.com', phone_number='9000000000', first_name='Host', last_name='User')
+        Visitor.objects.create(name='With relations', email='a@example.com', phone_number='9100000000', company=company, user=user,
+                               purpose_of_visit=purpose, from_company='Acme', image='visitors/a b.jpg', image_thumbnail='visitors/a b_thumb.jpg')
+        Visitor.objects.create(name='Without relations', email='b@example.com', phone_number='9100000001')
+
+    def test_matches_serializer_json(self):
+        request = Request(APIRequestFactory().get('/api/v1/vms/visitor/'))
+        visitors = Visitor.objects.order_by('pk')
+
+        expected = JSONRenderer().render(VisitorSerializer(visitors, many=True, context={'request': request}).data)
+        actual = JSONRenderer().render(VisitorRepresentation(request).represent(visitors.values(*VisitorRepresentation.columns)))
+        self.assertEqual(actual, expected)
+
+
+class VisitorIndexTests(TestCase):
+    """
+    The hot visitor queries must be answered from the composite indexes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        facility = Facility.objects.create(name='Facility')
+        cls.company = Company.objects.create(name='Company', facility=facility, spoc_email='spoc@example.com', spoc_phone_number='9000000001')
+        cls.facility_id = facility.id
+        Visitor.objects.bulk_create([
+            Visitor(name=f'Visitor {i}', email=f'visitor{i}@example.com', company=cls.company, facility=facility)
+            for i in range(50)
+        ])
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are cheaper to scan, make the planner show its index choice
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_facility_list_uses_facility_index(self):
+        queryset = Visitor.objects.filter(facility_id=self.facility_id).order_by('-created_at', '-id')[:30]
+        self.assertUsesIndex(queryset, 'visitor_facility_created_idx')
+
+    def test_facility_day_range_uses_facility_index(self):
+        today = timezone.localdate()
+        start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
+        queryset = Visitor.objects.filter(facility_id=self.facility_id, created_at__gte=start, created_at__lt=start + timedelta(days=1))
+        self.assertUsesIndex(queryset, 'visitor_facility_created_idx')
+
+    def test_company_range_uses_company_index(self):
+        start = timezone.now() - timedelta(days=30)
+        queryset = Visitor.objects.filter(company_id=self.company.id, created_at__gte=start).order_by('-created_at')
+        self.assertUsesIndex(queryset, 'visitor_company_created_idx')
+
+    def test_save_fills_facility_from_company(self):
+        visitor = Visitor.objects.create(name='Walk in', email='walkin@example.com', company=self.company)
+        self.assertEqual(visitor.facility_id, self.facility_id)
+
+
+class VisitorDailyStatTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        facility = Facility.objects.create(name='Facility')
+        cls.company = Company.objects.create(name='Company', facility=facility, spoc_email='spoc@example.com', spoc_phone_number='9000000001')
+        cls.purpose = PurposeOfVisit.objects.create(name='Meeting')
+        cls.user = CustomUser.objects.create(email='desk@example.com', phone_number='9000000000', facility=facility, is_superuser=True)
+
+    def test_check_in_counts_match_rebuild(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for i in range(3):
+            response = client.post('/api/v1/vms/visitor/', {
+                'name': f'Visitor {i}', 'email': f'visitor{i}@example.com', 'phone_number': f'{9100000000 + i}',
+                'company_id': self.company.id, 'user_id': self.user.id, 'purpose_of_visit_id': self.purpose.id,
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+
+        live = list(VisitorDailyStat.objects.values_list('facility_id', 'company_id', 'date', 'count'))
+        self.assertEqual(live, [(self.company.facility_id, self.company.id, timezone.localdate(), 3)])
+
+        rebuild_daily_stats()
+        self.assertEqual(list(VisitorDailyStat.objects.values_list('facility_id', 'company_id', 'date', 'count')), live)
+
+        response = client.get('/api/v1/vms/vms-dashboard/')
+        self.assertEqual(response.data, {'visitors_today_count': 3, 'visitors_this_month_count': 3})
+
+    def test_company_counts_in_one_query(self):
+        today = timezone.localdate()
+        other = Company.objects.create(name='Other', facility=self.company.facility, spoc_email='other@example.com', spoc_phone_number='9000000002')
+        idle = Company.objects.create(name='Idle', facility=self.company.facility, spoc_email='idle@example.com', spoc_phone_number='9000000003')
+        VisitorDailyStat.objects.create(facility=self.company.facility, company=self.company, date=today, count=2)
+        VisitorDailyStat.objects.create(facility=self.company.facility, company=other, date=today, count=1)
+        if today.day > 1:
+            VisitorDailyStat.objects.create(facility=self.company.facility, company=other, date=today - timedelta(days=1), count=4)
+        # Last month's visitors aren't counted
+        VisitorDailyStat.objects.create(facility=self.company.facility, company=self.company, date=today.replace(day=1) - timedelta(days=1), count=7)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/vms/company-visitor-counts/')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([
+            (row['company_id'], row['visitors_today_count'], row['visitors_this_month_count']) for row in response.data['companies']
+        ], [
+            (self.company.id, 2, 2), (idle.id, 0, 0), (other.id, 1, 5 if today.day > 1 else 1),
+        ])
+
+    def test_company_visitor_count_uses_local_day(self):
+        today_start = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+        for created_at in (today_start, today_start - timedelta(seconds=1)):
+            visitor = Visitor.objects.create(name='Visitor', email='visitor@example.com', phone_number='9100000000', company=self.company, user=self.user, purpose_of_visit=self.purpose)
+            Visitor.objects.filter(pk=visitor.pk).update(created_at=created_at)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/vms/company-visitor/', {'company_id': str(self.company.id)})
+        self.assertEqual(response.data, {'visitors_count': 1})
+
+
+class VisitorPreRegistrationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        facility = Facility.objects.create(name='Facility')
+        cls.company = Company.objects.create(name='Company', facility=facility, spoc_email='spoc@example.com', spoc_phone_number='9000000001')
+        cls.purpose = PurposeOfVisit.objects.create(name='Audit')
+        cls.user = CustomUser.objects.create(email='desk@example.com', phone_number='9000000000', first_name='Desk', facility=facility, is_superuser=True)
+
+    def pre_register(self, visitors):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/api/v1/vms/pre-registration/', {
+                'company_id': self.company.id, 'expected_on': timezone.localdate().isoformat(),
+                'purpose_of_visit_id': self.purpose.id, 'visitors': visitors,
+            }, format='json')
+        return response, queries
+
+    def test_guest_list_is_validated_and_inserted_set_wise(self):
+        _, few = self.pre_register([{'name': 'Guest', 'email': 'guest@example.com', 'phone_number': '9100000000'}])
+        response, many = self.pre_register(
+            [{'name': f'Guest {i}', 'email': f'guest{i}@example.com', 'phone_number': f'{9100000001 + i}'} for i in range(50)] + [
+                {'name': 'Again', 'email': 'guest@example.com', 'phone_number': '9199999999'},
+                {'name': 'Twice', 'email': 'guest3@example.com', 'phone_number': '9199999998'},
+                {'name': '', 'email': 'nobody', 'phone_number': '12'},
+            ]
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['success_count'], 50)
+        self.assertEqual(response.data['failures'], [
+            f"Row 51: Email 'guest@example.com' is already pre-registered for {timezone.localdate()}.",
+            "Row 52: Email 'guest3@example.com' is listed more than once.",
+            "Row 53: Name is required.",
+        ])
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(EmailOutbox.objects.count(), 51)
+
+    def test_host_must_work_at_the_company(self):
+        other_company = Company.objects.create(name='Other', facility=Facility.objects.create(name='Other facility'),
+                                               spoc_email='other@example.com', spoc_phone_number='9000000002')
+        employee = CustomUser.objects.create(email='employee@example.com', phone_number='9000000003', company=self.company)
+        outsider = CustomUser.objects.create(email='outsider@example.com', phone_number='9000000004', company=other_company)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for host, status_code in ((outsider, 400), (employee, 201)):
+            response = client.post('/api/v1/vms/pre-registration/', {
+                'company_id': self.company.id, 'expected_on': timezone.localdate().isoformat(), 'user_id': host.id,
+                'purpose_of_visit_id': self.purpose.id, 'visitors': [{'name': 'Guest', 'email': f'guest{host.id}@example.com', 'phone_number': '9100000000'}],
+            }, format='json')
+            self.assertEqual(response.status_code, status_code)
+        self.assertEqual(VisitorPreRegistration.objects.get().user_id, employee.id)
+
+    def test_check_in_after_the_purpose_was_deleted(self):
+        self.pre_register([{'name': 'Guest', 'email': 'guest@example.com', 'phone_number': '9100000000'}])
+        PurposeOfVisit.objects.filter(id=self.purpose.id).delete()
+
+        visitor, created = preregistration.check_in(VisitorPreRegistration.objects.get().id)
+        self.assertTrue(created)
+        self.assertIsNone(visitor.purpose_of_visit_id)
+        self.assertEqual(EmailOutbox.objects.count(), 3)
+
+    def test_check_in_from_invite_code(self):
+        self.pre_register([{'name': 'Guest', 'email': 'guest@example.com', 'phone_number': '9100000000'}])
+        code = VisitorPreRegistration.objects.get().code
+
+        self.assertEqual(APIClient().get('/api/v1/vms/pre-registration-pass/', {'code': code})['Content-Type'], 'image/png')
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/v1/vms/pre-registration-check-in/', {
+            'code': f'https://vms.example.com/api/v1/vms/pre-registration-check-in/?code={code}',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user_name'], 'Desk ')
+        self.assertEqual(VisitorPreRegistration.objects.get().visitor_id, response.data['id'])
+        self.assertEqual(VisitorDailyStat.objects.get().count, 1)
+
+        response = client.post('/api/v1/vms/pre-registration-check-in/', {'code': code}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Visitor.objects.count(), 1)
+
+
+class BadgeAssetTests(TestCase):
+
+    def test_logo_is_read_from_the_configured_file(self):
+        with tempfile.NamedTemporaryFile(suffix='.png') as fh:
+            fh.write(b'logo')
+            fh.flush()
+            loader = BadgeAssetLoader()
+            with override_settings(IDENTITY_CARD_LOGO_PATH=fh.name), \
+                    mock.patch('vms.identity_card.assets.requests.get') as get:
+                logo = loader.logo()
+        self.assertTrue(loader.has_logo)
+        self.assertEqual(logo, base64.b64encode(b'logo'))
+        get.assert_not_called()
+
+    def test_replacing_the_logo_changes_the_badge_key(self):
+        visitor = {'id': 1, 'modified_at': timezone.now()}
+        keys = set()
+        for content in (b'old logo', b'new logo'):
+            with tempfile.NamedTemporaryFile(suffix='.png') as fh:
+                fh.write(content)
+                fh.flush()
+                with override_settings(IDENTITY_CARD_LOGO_PATH=fh.name):
+                    _, logo_digest = BadgeAssetLoader().logo_with_digest()
+            keys.add(badge_cache_key(visitor, logo_digest))
+        keys.add(badge_cache_key(visitor, None))
+        self.assertEqual(len(keys), 3)
+
+    @override_settings(IDENTITY_CARD_LOGO_PATH='', IDENTITY_CARD_LOGO_URL='')
+    def test_unconfigured_logo_falls_back_to_the_placeholder(self):
+        loader = BadgeAssetLoader()
+        with mock.patch('vms.identity_card.assets.requests.get') as get, \
+                self.assertLogs('app', 'ERROR') as logs:
+            logo = loader.logo()
+        self.assertFalse(loader.has_logo)
+        self.assertEqual(logo, loader.placeholder())
+        self.assertIn('not configured', logs.output[0])
+        get.assert_not_called()
+
+
+class BadgeRenderPoolTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.visitor = Visitor.objects.create(name='Visitor', email='visitor@example.com', phone_number='9100000000')
+
+    def make_pool(self, max_pending, timeout=5):
+        pool = BadgeRenderPool(workers=1, max_pending=max_pending, timeout=timeout)
+        self.addCleanup(lambda: pool._executor and pool._executor.shutdown(wait=True, cancel_futures=True))
+        return pool
+
+    def test_full_queue_is_rejected_with_503(self):
+        pool = self.make_pool(max_pending=2)
+        futures = [pool.submit_task(time.sleep, 1) for _ in range(2)]
+        with self.assertRaises(RenderPoolSaturated):
+            pool.submit_task(time.sleep, 0)
+
+        with mock.patch('vms.views.badge_render_pool', pool):
+            response = APIClient().get('/api/v1/vms/identity-card/', {'visitor_id': self.visitor.id})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(settings.IDENTITY_CARD_RENDER_RETRY_AFTER))
+
+        for future in futures:
+            future.result()
+
+    def test_timed_out_render_releases_its_slot_when_it_ends(self):
+        pool = self.make_pool(max_pending=1, timeout=0.1)
+        future = pool.submit_task(time.sleep, 1)
+        with self.assertRaises(RenderTimeout):
+            pool.result(future)
+
+        # Still running in the pool process, so it still holds the slot
+        with self.assertRaises(RenderPoolSaturated):
+            pool.submit_task(time.sleep, 0)
+
+        # Freed once the render really finishes
+        self.assertIsNone(pool.result(pool.submit_task(time.sleep, 0, wait=5), timeout=5))
+
+
+class IdentityCardBatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        facility = Facility.objects.create(name='Facility')
+        cls.user = CustomUser.objects.create(email='desk@example.com', phone_number='9000000000', facility=facility, is_superuser=True)
+        cls.visitor = Visitor.objects.create(name='Visitor', email='visitor@example.com', phone_number='9100000000', facility=facility)
+
+    def export(self, data):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.post('/api/v1/vms/identity-card-batch/', data, format='json')
+
+    def test_visitor_ids_must_be_ids(self):
+        for visitor_ids in (['abc'], [{'id': 1}], 'abc'):
+            self.assertEqual(self.export({'visitor_ids': visitor_ids}).status_code, 400)
+
+    def test_pool_failures_are_reported_before_streaming(self):
+        with mock.patch('vms.views.render_badges', return_value=[b'png']), \
+                mock.patch('vms.views.render_badge_pages', side_effect=BrokenProcessPool):
+            response = self.export({'visitor_ids': [self.visitor.id]})
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.streaming)
+
+        with mock.patch('vms.views.badge_render_pool.render', side_effect=BrokenProcessPool):
+            response = APIClient().get('/api/v1/vms/identity-card/', {'visitor_id': self.visitor.id})
+        self.assertEqual(response.status_code, 503)
+
+    def test_visitor_id_must_be_an_id(self):
+        for params in ({'visitor_id': 'abc'}, {}):
+            self.assertEqual(APIClient().get('/api/v1/vms/identity-card/', params).status_code, 400)
+
+    def test_placeholder_badge_is_not_cached(self):
+        # The logo finishes loading while the placeholder badge renders
+        with mock.patch('vms.views.badge_assets.logo_with_digest', return_value=(b'placeholder', None)), \
+                mock.patch.object(BadgeAssetLoader, 'has_logo', new_callable=mock.PropertyMock, return_value=True), \
+                mock.patch('vms.identity_card.badges.badge_store.put') as put, \
+                mock.patch('vms.views.build_badge_svg', return_value='<svg/>'), \
+                mock.patch('vms.views.badge_render_pool.render', return_value=b'png'):
+            response = APIClient().get('/api/v1/vms/identity-card/', {'visitor_id': self.visitor.id})
+        self.assertEqual(response.status_code, 200)
+        put.assert_not_called()
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('no-store', response['Cache-Control'])
+
+
+class VisitorPassTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        front_desk = CustomRole.objects.create(id=3, name='Front desk')
+        cls.facility = Facility.objects.create(name='Facility')
+        other_facility = Facility.objects.create(name='Other facility')
+        cls.desk = CustomUser.objects.create(email='desk@example.com', phone_number='9000000000', facility=cls.facility, role=front_desk)
+        cls.other_desk = CustomUser.objects.create(email='other@example.com', phone_number='9000000001', facility=other_facility, role=front_desk)
+        cls.visitor = Visitor.objects.create(name='Visitor', email='visitor@example.com', phone_number='9100000000', facility=cls.facility)
+
+    def scan(self, token, user=None):
+        client = APIClient()
+        client.force_authenticate(user or self.desk)
+        return client.post('/api/v1/vms/pass-scan/', {'token': token}, format='json')
+
+    def issue(self):
+        return pass_for_visitor(self.visitor.id, self.facility.id, self.visitor.created_at)
+
+    def test_tampered_tokens_are_rejected(self):
+        data = bytearray(base64.urlsafe_b64decode(self.issue() + '=='))
+        data[1] ^= 0x01
+        flipped = base64.urlsafe_b64encode(bytes(data)).rstrip(b'=').decode()
+        truncated = base64.urlsafe_b64encode(bytes(data[:-4])).rstrip(b'=').decode()
+
+        for token, reason in ((flipped, 'bad_signature'), (truncated, 'malformed')):
+            with self.assertRaises(InvalidPass) as raised:
+                verify_pass(token)
+            self.assertEqual(raised.exception.reason, reason)
+        self.assertEqual(self.scan(flipped).data, {'valid': False, 'reason': 'bad_signature'})
+
+    def test_token_is_only_valid_inside_its_window(self):
+        valid_from = timezone.now()
+        valid_until = valid_from + timedelta(hours=1)
+        token = issue_pass(self.visitor.id, self.facility.id, valid_from, valid_until)
+
+        self.assertEqual(verify_pass(token, now=valid_from.timestamp() + 60).visitor_id, self.visitor.id)
+        for now, reason in ((valid_from.timestamp() - 60, 'not_yet_valid'), (valid_until.timestamp() + 60, 'expired')):
+            with self.assertRaises(InvalidPass) as raised:
+                verify_pass(token, now=now)
+            self.assertEqual(raised.exception.reason, reason)
+
+    def test_pass_is_rejected_at_another_facility(self):
+        token = self.issue()
+        self.assertEqual(self.scan(token).status_code, 200)
+
+        response = self.scan(token, user=self.other_desk)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['reason'], 'wrong_facility')
+
+    def test_revocation_on_another_worker_applies_after_reload(self):
+        token = self.issue()
+        with mock.patch('vms.views.revocation_cache', RevocationCache(ttl=0.5)):
+            self.assertEqual(self.scan(token).status_code, 200)
+
+            # Revoked elsewhere, this worker's cache hasn't reloaded yet
+            Visitor.objects.filter(id=self.visitor.id).update(pass_revoked_at=timezone.now())
+            self.assertEqual(self.scan(token).status_code, 200)
+
+            time.sleep(0.6)
+            response = self.scan(token)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['reason'], 'revoked')
+
+    def test_identity_card_qr_carries_a_verifiable_pass(self):
+        client = APIClient()
+        client.force_authenticate(self.desk)
+        with mock.patch('vms.views.get_or_create_qr', return_value='qrcodes/qrcode.png') as get_or_create_qr:
+            response = client.post('/api/v1/vms/qr-code/', {'visitor_id': self.visitor.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        payload = get_or_create_qr.call_args.args[1]
+        token = parse_qs(urlparse(payload).query)['pass'][0]
+        self.assertEqual(verify_pass(token).visitor_id, self.visitor.id)
+
+        response = self.scan(payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['visitor_id'], self.visitor.id)
+
+
+class EmailOutboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        facility = Facility.objects.create(name='Facility')
+        company = Company.objects.create(name='Company', facility=facility, spoc_email='spoc@example.com', spoc_phone_number='9000000001')
+        purpose = PurposeOfVisit.objects.create(name='Audit')
+        user = CustomUser.objects.create(email='host@example.com', phone_number='9000000000', facility=facility)
+        cls.pre_registration = VisitorPreRegistration.objects.create(
+            name='Guest', email='guest@example.com', phone_number='9100000000', company=company, facility=facility,
+            user=user, purpose_of_visit=purpose, expected_on=timezone.localdate(),
+        )
+
+    def test_rolled_back_check_in_queues_nothing(self):
+        def enqueue_then_fail(visitor):
+            enqueue_check_in_emails(visitor)
+            self.assertEqual(EmailOutbox.objects.count(), 2)
+            raise RuntimeError('check-in failed')
+
+        with mock.patch('vms.preregistration.enqueue_check_in_emails', side_effect=enqueue_then_fail), \
+                self.assertRaises(RuntimeError):
+            preregistration.check_in(self.pre_registration.id)
+        self.assertFalse(EmailOutbox.objects.exists())
+        self.assertFalse(Visitor.objects.exists())
+
+        preregistration.check_in(self.pre_registration.id)
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+
+    def test_expired_lease_is_claimed_again(self):
+        message = enqueue_email('Subject', 'Body', ['guest@example.com'])
+        self.assertEqual([m.id for m in claim_batch(10)], [message.id])
+        self.assertEqual(claim_batch(10), [])
+
+        lease_over = timezone.now() + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE + 1)
+        with mock.patch('vms.outbox.timezone.now', return_value=lease_over):
+            self.assertEqual([m.id for m in claim_batch(10)], [message.id])
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_BACKOFF_BASE=30, EMAIL_OUTBOX_BACKOFF_MAX=3600)
+    def test_failures_back_off_then_give_up(self):
+        message = enqueue_email('Subject', 'Body', ['guest@example.com'])
+
+        with mock.patch('vms.outbox.random.uniform', return_value=1):
+            for attempt, delay in ((1, 30), (2, 60)):
+                before = timezone.now()
+                record_result(message, False, 'Brevo is down')
+                message.refresh_from_db()
+                self.assertEqual((message.status, message.attempts), (EmailOutbox.PENDING, attempt))
+                self.assertAlmostEqual((message.next_attempt_at - before).total_seconds(), delay, delta=1)
+
+            record_result(message, False, 'Brevo is down')
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.last_error), (EmailOutbox.FAILED, 3, 'Brevo is down'))
+
+
+class VisitorAnalyticsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = Facility.objects.create(name='Facility')
+        other_facility = Facility.objects.create(name='Other facility')
+        cls.company = Company.objects.create(name='Company', facility=cls.facility, spoc_email='spoc@example.com', spoc_phone_number='9000000001')
+        other_company = Company.objects.create(name='Other company', facility=cls.facility, spoc_email='other@example.com', spoc_phone_number='9000000002')
+        cls.purpose = PurposeOfVisit.objects.create(name='Audit')
+        interview = PurposeOfVisit.objects.create(name='Interview')
+        cls.user = CustomUser.objects.create(email='admin@example.com', phone_number='9000000000', facility=cls.facility, is_superuser=True)
+
+        visits = [
+            (cls.facility, cls.company, cls.purpose, datetime(2026, 3, 15, 9, 10)),
+            (cls.facility, other_company, cls.purpose, datetime(2026, 3, 15, 9, 50)),
+            (cls.facility, cls.company, interview, datetime(2026, 3, 15, 14, 0)),
+            # Still March 2 in UTC, only bucketed in TIME_ZONE is it on the 3rd
+            (cls.facility, cls.company, interview, datetime(2026, 3, 3, 2, 0)),
+            # Outside the month, after "today", and at another facility
+            (cls.facility, cls.company, cls.purpose, datetime(2026, 2, 28, 12, 0)),
+            (cls.facility, cls.company, cls.purpose, datetime(2026, 3, 16, 8, 0)),
+            (other_facility, cls.company, cls.purpose, datetime(2026, 3, 15, 9, 0)),
+        ]
+        for i, (facility, company, purpose, created_at) in enumerate(visits):
+            visitor = Visitor.objects.create(name=f'Visitor {i}', email=f'visitor{i}@example.com', phone_number=f'{9100000000 + i}',
+                                             facility=facility, company=company, purpose_of_visit=purpose, user=cls.user)
+            Visitor.objects.filter(id=visitor.id).update(created_at=timezone.make_aware(created_at))
+        cls.other_company, cls.interview = other_company, interview
+
+    def setUp(self):
+        cache.clear()
+
+    def test_buckets_match_a_hand_count(self):
+        data = compute_facility_analytics(self.facility.id, date(2026, 3, 15))
+
+        hourly = {row['hour']: row['count'] for row in data['hourly_today'] if row['count']}
+        self.assertEqual(hourly, {9: 2, 14: 1})
+        daily = {row['date']: row['count'] for row in data['daily_this_month'] if row['count']}
+        self.assertEqual(daily, {'2026-03-03': 1, '2026-03-15': 3})
+        self.assertEqual(len(data['daily_this_month']), 15)
+        self.assertEqual(
+            {row['purpose_of_visit_id']: row['count'] for row in data['by_purpose_this_month']},
+            {self.purpose.id: 2, self.interview.id: 2},
+        )
+        self.assertEqual(
+            {row['company_id']: row['count'] for row in data['by_company_this_month']},
+            {self.company.id: 3, self.other_company.id: 1},
+        )
+
+    def test_check_in_refreshes_cached_analytics(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def checked_in_today():
+            response = client.get('/api/v1/vms/visitor-analytics/', {'facility_id': self.facility.id})
+            self.assertEqual(response.status_code, 200)
+            return sum(row['count'] for row in response.data['hourly_today'])
+
+        before = checked_in_today()
+        self.assertEqual(checked_in_today(), before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            visitor = Visitor.objects.create(name='New', email='new@example.com', phone_number='9199999999', facility=self.facility,
+                                             company=self.company, purpose_of_visit=self.purpose, user=self.user)
+            record_check_ins([visitor])
+
+        self.assertEqual(checked_in_today(), before + 1)
+
+
+class VisitorEventTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = Facility.objects.create(name='Facility')
+        cls.user = CustomUser.objects.create(email='admin@example.com', phone_number='9000000000', facility=cls.facility, is_superuser=True)
+
+    def test_broker_delivers_events_and_stops_polling_without_subscribers(self):
+        broker = FacilityEventBroker(poll_interval=0.2)
+        subscription = broker.subscribe(self.facility.id)
+        poller = broker._pollers[self.facility.id]
+
+        broker.publish(self.facility.id, [b'event: check_in\n\n'])
+        self.assertTrue(subscription.wait(1))
+        self.assertEqual(subscription.drain(), [b'event: check_in\n\n'])
+
+        broker.unsubscribe(subscription)
+        poller.join(2)
+        self.assertFalse(poller.is_alive())
+        self.assertNotIn(self.facility.id, broker._pollers)
+        self.assertFalse(broker.has_subscribers(self.facility.id))
+
+    def open_stream(self, token):
+        response = APIClient().get('/api/v1/vms/visitor-events/', {'token': token}, HTTP_ACCEPT='text/event-stream')
+        # Closing before reading leaves no subscription behind
+        response.close()
+        return response
+
+    def test_stream_opens_with_a_signed_token(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/v1/vms/visitor-events-token/', {'facility_id': self.facility.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['expires_in'], settings.VMS_EVENTS_TOKEN_MAX_AGE)
+
+        response = self.open_stream(response.data['token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+    def test_stream_rejects_bad_expired_or_missing_tokens(self):
+        token = issue_stream_token(self.user.id, self.facility.id)
+        self.assertEqual(self.open_stream(token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB')).status_code, 403)
+
+        with mock.patch('django.core.signing.time.time', return_value=time.time() - settings.VMS_EVENTS_TOKEN_MAX_AGE - 5):
+            expired = issue_stream_token(self.user.id, self.facility.id)
+        self.assertEqual(self.open_stream(expired).status_code, 403)
+
+        self.assertEqual(APIClient().get('/api/v1/vms/visitor-events/', HTTP_ACCEPT='text/event-stream').status_code, 401)
+
+
+class BadgeStoreTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.store = BadgeStore(self.root, max_bytes=350)
+
+    def files(self):
+        return sorted(name for _, _, names in os.walk(self.root) for name in names)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        keys = [BadgeStore.make_key(i, timezone.now(), 1) for i in range(4)]
+        for age, key in zip((300, 200, 100), keys):
+            self.store.put(key, b'x' * 100)
+            os.utime(self.store.path_for(key), (time.time() - age, time.time() - age))
+
+        # Reading the oldest entry makes the second one the least recently used
+        self.assertEqual(self.store.get(keys[0]), b'x' * 100)
+        self.store.put(keys[3], b'x' * 100)
+
+        self.assertIsNone(self.store.get(keys[1]))
+        self.assertEqual([self.store.get(key) is not None for key in (keys[0], keys[2], keys[3])], [True, True, True])
+
+    def test_failed_write_leaves_nothing_behind(self):
+        key = BadgeStore.make_key(1, timezone.now(), 1)
+        with mock.patch('vms.identity_card.store.os.replace', side_effect=OSError('disk full')), \
+                self.assertLogs('app', 'ERROR'):
+            self.store.put(key, b'png')
+        self.assertIsNone(self.store.get(key))
+        self.assertEqual(self.files(), [])
+
+        self.store.put(key, b'png')
+        self.assertEqual(self.files(), [key + '.png'])
+
+    def test_edited_visitor_is_a_miss(self):
+        modified_at = timezone.now()
+        self.store.put(BadgeStore.make_key(1, modified_at, 1), b'png')
+
+        self.assertEqual(self.store.get(BadgeStore.make_key(1, modified_at, 1)), b'png')
+        self.assertIsNone(self.store.get(BadgeStore.make_key(1, modified_at + timedelta(seconds=1), 1)))
+        self.assertIsNone(self.store.get(BadgeStore.make_key(1, modified_at, 2)))
+
+
+class VisitorImageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        facility = Facility.objects.create(name='Facility')
+        cls.company = Company.objects.create(name='Company', facility=facility, spoc_email='spoc@example.com', spoc_phone_number='9000000001')
+        cls.purpose = PurposeOfVisit.objects.create(name='Audit')
+        cls.user = CustomUser.objects.create(email='desk@example.com', phone_number='9000000000', facility=facility, is_superuser=True)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def camera_photo(self):
+        # Landscape pixels that the camera marks as rotated, so the photo is portrait upright
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera maker'
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 800), 'red').save(buffer, format='JPEG', exif=exif)
+        buffer.name = 'photo.jpg'
+        buffer.seek(0)
+        return buffer
+
+    def test_check_in_photo_gets_upright_exif_free_derivatives(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/v1/vms/visitor/', {
+            'name': 'Visitor', 'email': 'visitor@example.com', 'phone_number': '9100000000', 'image': self.camera_photo(),
+            'company_id': self.company.id, 'user_id': self.user.id, 'purpose_of_visit_id': self.purpose.id,
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        # Made off the request path
+        visitor = Visitor.objects.get()
+        self.assertFalse(visitor.image_badge)
+        call_command('create_visitor_image_derivatives', '--once', stdout=io.StringIO())
+
+        visitor.refresh_from_db()
+        for field, size in ((visitor.image_badge, (212, 318)), (visitor.image_thumbnail, (64, 96))):
+            with field.open('rb') as fh:
+                image = Image.open(fh)
+                self.assertEqual(image.size, size)
+                self.assertEqual(dict(image.getexif()), {})
+
+    def test_storage_errors_are_logged(self):
+        visitor = Visitor.objects.create(name='Visitor', email='visitor@example.com', phone_number='9100000000')
+        visitor.image.save('photo.jpg', ContentFile(self.camera_photo().read()))
+
+        with mock.patch('django.core.files.storage.FileSystemStorage.save', side_effect=OSError('disk full')), \
+                self.assertLogs('app', 'ERROR'):
+            self.assertFalse(create_visitor_image_derivatives(visitor))
+        visitor.refresh_from_db()
+        self.assertFalse(visitor.image_badge)
+
+
+class BadgeTemplateTests(TestCase):
+
+    def badge_texts(self, **fields):
+        visitor = {
+            'id': 1, 'name': 'Visitor', 'image': '', 'image_badge': '', 'phone_number': '9100000000',
+            'created_at': timezone.now(), 'modified_at': timezone.now(), 'purpose_of_visit__name': 'Audit',
+            'company__name': 'Company', 'user__first_name': 'Host', 'user__last_name': 'Name', **fields,
+        }
+        svg = ET.fromstring(build_badge_svg(visitor, b'bG9nbw=='))
+        return [element.text for element in svg.iter('{http://www.w3.org/2000/svg}text')]
+
+    def test_markup_in_text_is_escaped(self):
+        texts = self.badge_texts(name='<script>alert(1)</script>', company__name='Smith & <Sons>')
+        self.assertIn('<script>alert(1)</script>', texts)
+        self.assertIn('Smith & <Sons>', texts)
+
+    def test_characters_xml_cannot_carry_are_dropped(self):
+        texts = self.badge_texts(name='a\x01b\x00c\ufffe', company__name='Tab\tkept \U0001F600')
+        self.assertIn('abc', texts)
+        self.assertIn('Tab\tkept \U0001F600', texts)
+
+
+class FakeRenderPool:
+    workers = 1
+
+    def __init__(self, hang=()):
+        self.hang = set(hang)
+        self.rendered = []
+
+    def submit(self, svg, wait=None):
+        future = Future()
+        if svg not in self.hang:
+            self.rendered.append(svg)
+            future.set_result(b'png ' + svg)
+        return future
+
+    def result(self, future, timeout=None):
+        if not future.done():
+            raise RenderTimeout()
+        return future.result()
+
+
+class BatchRenderTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for target, value in (
+            ('vms.identity_card.badges.badge_store', BadgeStore(directory.name, max_bytes=10 ** 6)),
+            ('vms.identity_card.badges.badge_assets.logo_with_digest', mock.Mock(return_value=(b'logo', 'digest'))),
+            ('vms.identity_card.badges.build_badge_svg', lambda visitor, logo: str(visitor['id']).encode()),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.visitors = [{'id': i, 'modified_at': timezone.now()} for i in range(5)]
+
+    def render(self, pool):
+        with mock.patch('vms.identity_card.badges.badge_render_pool', pool):
+            return render_badges(self.visitors, 10)
+
+    def test_finished_badges_are_kept_when_a_render_times_out(self):
+        with self.assertRaises(RenderTimeout):
+            self.render(FakeRenderPool(hang={b'2'}))
+
+        pool = FakeRenderPool()
+        self.assertEqual(self.render(pool), [b'png %d' % i for i in range(5)])
+        self.assertEqual(pool.rendered, [b'2', b'4'])
+
+    @override_settings(IDENTITY_CARD_RENDER_SECONDS=5)
+    def test_large_batch_makes_progress_across_retries(self):
+        # One worker, 10 seconds, 5 seconds a render: two badges per request
+        pools = []
+        for _ in range(2):
+            pools.append(FakeRenderPool())
+            with self.assertRaises(RenderPoolSaturated):
+                self.render(pools[-1])
+        pools.append(FakeRenderPool())
+        self.assertEqual(self.render(pools[-1]), [b'png %d' % i for i in range(5)])
+        self.assertEqual([pool.rendered for pool in pools], [[b'0', b'1'], [b'2', b'3'], [b'4']])
+
+
+class HttpCachingTests(TestCase):
+
+    def test_identity_card_answers_304_to_its_validators(self):
+        visitor = Visitor.objects.create(name='Visitor', email='visitor@example.com', phone_number='9100000000')
+        url = '/api/v1/vms/identity-card/'
+        with mock.patch('vms.views.badge_assets.logo_with_digest', return_value=(b'logo', 'digest')), \
+                mock.patch('vms.views.store_badge'), \
+                mock.patch('vms.views.build_badge_svg', return_value=b'<svg/>'), \
+                mock.patch('vms.views.badge_render_pool.render', return_value=b'png') as render:
+            response = APIClient().get(url, {'visitor_id': visitor.id})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('no-cache', response['Cache-Control'])
+
+            for headers in ({'HTTP_IF_NONE_MATCH': response['ETag']}, {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']}):
+                not_modified = APIClient().get(url, {'visitor_id': visitor.id}, **headers)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.content, b'')
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+
+            # Editing the visitor changes the validators
+            visitor.save()
+            self.assertEqual(APIClient().get(url, {'visitor_id': visitor.id}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(render.call_count, 2)
+
+    def test_only_content_hashed_media_is_immutable(self):
+        middleware = ImmutableMediaCacheMiddleware(lambda request: HttpResponse(b'png'))
+        factory = RequestFactory()
+
+        response = middleware(factory.get('/media/qrcodes/qrcode_12_0123456789abcdef.png'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+        for path in ('/media/qrcodes/qrcode_12.png', '/media/visitors/photo_badge.jpg', '/api/v1/vms/qrcodes/qrcode_12_0123456789abcdef.png'):
+            self.assertFalse(middleware(factory.get(path)).has_header('Cache-Control'), path)
+
+        missing = ImmutableMediaCacheMiddleware(lambda request: HttpResponse(status=404))
+        self.assertFalse(missing(factory.get('/media/qrcodes/qrcode_12_0123456789abcdef.png')).has_header('Cache-Control'))
+
+
+class QRCodeStorageTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def qr_files(self):
+        directory = os.path.join(self.root, QR_DIRECTORY)
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def test_same_payload_is_written_once(self):
+        with mock.patch('vms.qr.render_qr', wraps=render_qr) as render:
+            names = {get_or_create_qr(7, 'https://vms.example.com/?pass=abc') for _ in range(3)}
+        self.assertEqual(len(names), 1)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(self.qr_files(), [os.path.basename(names.pop())])
+
+        get_or_create_qr(7, 'https://vms.example.com/?pass=def')
+        self.assertEqual(len(self.qr_files()), 2)
+
+    def test_prune_keeps_only_current_visits(self):
+        current = Visitor.objects.create(name='Today', email='today@example.com', phone_number='9100000000')
+        expired = Visitor.objects.create(name='Earlier', email='earlier@example.com', phone_number='9100000001')
+        Visitor.objects.filter(id=expired.id).update(created_at=timezone.now() - timedelta(days=3))
+
+        keep = os.path.basename(get_or_create_qr(current.id, 'current'))
+        get_or_create_qr(expired.id, 'expired')
+        get_or_create_qr(expired.id + 100, 'visitor deleted')
+        for name in (f'qrcode_{expired.id}.png', 'notes.txt'):
+            default_storage.save(f'{QR_DIRECTORY}/{name}', ContentFile(b'x'))
+
+        out = io.StringIO()
+        call_command('prune_qrcodes', '--dry-run', stdout=out)
+        self.assertIn('Would delete 3', out.getvalue())
+        self.assertEqual(len(self.qr_files()), 5)
+
+        call_command('prune_qrcodes', stdout=io.StringIO())
+        self.assertEqual(self.qr_files(), sorted([keep, 'notes.txt']))
+
+
+class BrevoTransportTests(TestCase):
+
+    def test_outbox_sends_one_call_per_body(self):
+        for i in range(3):
+            enqueue_email(f'Visitor {i} is waiting', 'waiting body', [f'host{i}@example.com'])
+        enqueue_email('Your identity card', 'card body', ['visitor@example.com'])
+
+        with mock.patch('vms.outbox.brevo_transport') as transport:
+            transport.send.return_value = transport.send_versions.return_value = (True, '')
+            self.assertEqual(drain_outbox(batch_size=10, concurrency=2), 4)
+
+        transport.send_versions.assert_called_once_with('waiting body', [
+            (f'Visitor {i} is waiting', [f'host{i}@example.com']) for i in range(3)
+        ])
+        transport.send.assert_called_once_with('Your identity card', 'card body', ['visitor@example.com'])
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.SENT).count(), 4)
+
+    def test_groups_are_split_at_the_version_limit(self):
+        messages = [EmailOutbox(id=i, subject='s', body='same', to_emails=[]) for i in range(5)]
+        with mock.patch('vms.outbox.MAX_MESSAGE_VERSIONS', 2):
+            groups = group_by_body(messages)
+        self.assertEqual([[message.id for message in group] for group in groups], [[0, 1], [2, 3], [4]])
+
+    def test_versions_are_sent_as_one_request(self):
+        transport = BrevoTransport()
+        api = mock.Mock()
+        api.send_transac_email.return_value = CreateSmtpEmail(message_id='1')
+        with mock.patch.object(transport, '_get_api', return_value=api):
+            self.assertEqual(transport.send_versions('body', [('First', ['a@example.com']), ('Second', ['b@example.com', 'c@example.com'])])[0], True)
+            with self.assertRaises(ValueError):
+                transport.send_versions('body', [('s', ['a@example.com'])] * (MAX_MESSAGE_VERSIONS + 1))
+
+        email = api.send_transac_email.call_args.args[0]
+        self.assertEqual(email.html_content, 'body')
+        self.assertEqual(
+            [(version.subject, version.to) for version in email.message_versions],
+            [('First', [{'email': 'a@example.com'}]), ('Second', [{'email': 'b@example.com'}, {'email': 'c@example.com'}])],
+        )
+
+    def test_client_is_rebuilt_after_a_fork(self):
+        transport = BrevoTransport()
+        with mock.patch('spatiumvms.utils.brevo_utils.os.getpid', return_value=100):
+            parent = transport._get_api()
+            self.assertIs(transport._get_api(), parent)
+        with mock.patch('spatiumvms.utils.brevo_utils.os.getpid', return_value=101):
+            child = transport._get_api()
+        self.assertIsNot(child, parent)
+        self.assertIsNot(child.api_client, parent.api_client)
+
+
+class EmailTemplateTests(TestCase):
+
+    def test_templates_are_compiled_once(self):
+        registry = EmailTemplateRegistry(EMAIL_TEMPLATES)
+        engine = engines['django'].engine
+        with mock.patch.object(engine, 'get_template', wraps=engine.get_template) as get_template:
+            registry.warm_up()
+            for _ in range(2):
+                for name in EMAIL_TEMPLATES:
+                    self.assertTrue(registry.render(name, {'name': 'Guest'}))
+        self.assertEqual(sorted(call.args[0] for call in get_template.call_args_list), sorted(EMAIL_TEMPLATES))
+
+    def test_unknown_template_is_skipped_by_warm_up_and_raises_on_render(self):
+        registry = EmailTemplateRegistry(('Missing.html', 'Otp.html'))
+        with self.assertLogs('app', 'ERROR') as logs:
+            registry.warm_up()
+        self.assertIn('Missing.html', logs.output[0])
+        self.assertTrue(registry.render('Otp.html', {}))
+
+        with self.assertRaises(TemplateDoesNotExist):
+            registry.render('Missing.html', {})
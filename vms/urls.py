@@ -4,8 +4,18 @@ from .views import (
     VisitorView,
     QRCodeView,
     IdentityCardView,
+    IdentityCardBatchView,
+    PassScanView,
+    PassRevokeView,
+    VisitorAnalyticsView,
+    VisitorEventStreamView,
+    VisitorEventTokenView,
     VMSDashboardView,
-    CompanyVisitorView
+    CompanyVisitorView,
+    CompanyVisitorCountsView,
+    VisitorPreRegistrationView,
+    PreRegistrationCheckInView,
+    PreRegistrationPassView
 )
 
 router = routers.DefaultRouter()
@@ -14,5 +24,15 @@ router = routers.DefaultRouter()
 router.register("visitor", VisitorView, basename="visitor")
 router.register("qr-code", QRCodeView, basename="qr-code")
 router.register("identity-card", IdentityCardView, basename="identity-card")
+router.register("identity-card-batch", IdentityCardBatchView, basename="identity-card-batch")
+router.register("pass-scan", PassScanView, basename="pass-scan")
+router.register("pass-revoke", PassRevokeView, basename="pass-revoke")
+router.register("visitor-analytics", VisitorAnalyticsView, basename="visitor-analytics")
+router.register("visitor-events", VisitorEventStreamView, basename="visitor-events")
+router.register("visitor-events-token", VisitorEventTokenView, basename="visitor-events-token")
 router.register("vms-dashboard", VMSDashboardView, basename="vms-dashboard")
-router.register("company-visitor", CompanyVisitorView, basename="company-visitor")
\ No newline at end of file
+router.register("company-visitor", CompanyVisitorView, basename="company-visitor")
+router.register("company-visitor-counts", CompanyVisitorCountsView, basename="company-visitor-counts")
+router.register("pre-registration", VisitorPreRegistrationView, basename="pre-registration")
+router.register("pre-registration-check-in", PreRegistrationCheckInView, basename="pre-registration-check-in")
+router.register("pre-registration-pass", PreRegistrationPassView, basename="pre-registration-pass")
\ No newline at end of file
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+import pytz
+from django.utils import timezone
+
+# A pass never outlives the day of the visit
+VISIT_MAX_DURATION = timedelta(days=1)
+
+
+def visit_validity(created_at):
+    """
+    Returns ``(start, end)`` of a visit in local time: three hours from
+    check-in, cut off at 23:59:59 on the same day.
+    """
+    # Assuming created_at is already a datetime object in UTC
+    created_at_utc = created_at.replace(tzinfo=pytz.UTC)
+
+    # Convert the UTC time to the appropriate time zone (+0530)
+    local_timezone = pytz.timezone('Asia/Kolkata')
+    created_at_local = created_at_utc.astimezone(local_timezone)
+
+    # Add three hours
+    new_time_local = created_at_local + timedelta(hours=3)
+
+    # If the new time is on the next day, set the end date to the current day, 11:59 PM
+    if new_time_local.date() > created_at_local.date():
+        end_date = created_at_local.replace(hour=23, minute=59, second=59)
+    else:
+        end_date = new_time_local
+
+    return created_at_local, end_date
+
+
+def local_day_range(date):
+    """
+    Returns ``[start, end)`` of a local calendar day as aware datetimes, for
+    ``created_at__gte`` / ``created_at__lt`` filters that can use an index.
+    """
+    start = timezone.make_aware(datetime.combine(date, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(date + timedelta(days=1), datetime.min.time()))
+    return start, end
@@ -1,27 +1,62 @@
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-import pytz
 import io
+import logging
+import os
+from urllib.parse import parse_qs, urlparse
 from django.conf import settings
-from django.http import HttpResponse
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.shortcuts import get_object_or_404, render
-import requests
 from rest_framework import status, viewsets
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
-from admin_panel.models import Company
+from admin_panel.models import Company, PurposeOfVisit
 from authentication.models import CustomUser
-from vms.models import Visitor
+from vms.models import Visitor, VisitorPreRegistration
 from vms.serializers import VisitorSerializer
-from django.db.models import Prefetch
-import qrcode
-import cairosvg
-import base64
-import os
+from vms.representations import VisitorRepresentation
+from spatiumvms.utils.representations import ValuesListMixin
+from vms.qr import QR_FORMATS, get_or_create_qr, identity_card_payload, render_qr
+from vms.analytics import facility_analytics
+from vms.stats import company_visit_counts, facility_visit_counts
+from vms.utils import local_day_range
+from vms.events import initial_events, issue_stream_token, read_stream_token, stream_events, stream_events_async
+from vms import preregistration
+from vms.passes import InvalidPass, pass_for_visitor, revocation_cache, verify_pass
+from vms.identity_card.assets import badge_assets
+from vms.identity_card.badges import (
+    BADGE_FIELDS,
+    badge_cache_key,
+    build_badge_svg,
+    render_badge_pages,
+    render_badges,
+    store_badge,
+    stream_badge_pdf,
+)
+from vms.identity_card.rendering import RenderPoolSaturated, RenderTimeout, badge_render_pool
+from vms.identity_card.store import badge_store
+
+logger = logging.getLogger("app")
 
 # Create your views here.
 
 
+def render_busy_response():
+    response = Response(
+        { "error": "Identity card service is busy, please retry." }, status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(settings.IDENTITY_CARD_RENDER_RETRY_AFTER)
+    return response
+
+
 class CustomPagination(PageNumberPagination):
 
     def get_page_size(self, request):
@@ -48,7 +83,26 @@ class CustomPagination(PageNumberPagination):
             'results': data
         })
 
-class VisitorView(viewsets.ModelViewSet):
+# Columns VisitorSerializer reads, the related names come from the same joined query.
+# Lists use VisitorRepresentation, this keeps the serializer path cheap too.
+VISITOR_LIST_FIELDS = (
+    'id', 'email', 'phone_number', 'name', 'from_company', 'image', 'image_thumbnail', 'created_at', 'modified_at',
+    'company', 'company__name', 'user', 'user__first_name', 'user__last_name', 'purpose_of_visit', 'purpose_of_visit__name',
+)
+
+
+class VisitorCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the visitor log. Every page seeks from the last
+    row seen, so the cost doesn't grow with how far back the page is and no
+    COUNT(*) is run.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class VisitorView(ValuesListMixin, viewsets.ModelViewSet):
 
     view_permissions = {
         'list': {'front_desk': True, 'admin' : True,'facility_manager': True},
@@ -56,30 +110,29 @@ class VisitorView(viewsets.ModelViewSet):
     }
 
     serializer_class=VisitorSerializer
-    pagination_class = CustomPagination
+    # Lists are built from .values() rows, same JSON as VisitorSerializer
+    list_representation = VisitorRepresentation
+    pagination_class = VisitorCursorPagination
+
+    @property
+    def paginator(self):
+        # ?pagination=page keeps the numbered pages with a total count
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'page':
+                self._paginator = CustomPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        # One joined query per page, whatever the page size
+        queryset = Visitor.objects.select_related('company', 'user', 'purpose_of_visit').only(*VISITOR_LIST_FIELDS)
 
-    def list(self, request):
-        
         is_superuser = self.request.user.is_superuser
-        if is_superuser:
-            queryset = Visitor.objects.prefetch_related(
-                Prefetch('company', queryset=Company.objects.only('name')),
-                Prefetch('user', queryset=CustomUser.objects.only('first_name', 'last_name'))
-            ).order_by('-pk')
-        else:
+        if not is_superuser:
             facility_id = self.request.user.facility_id
-            queryset = Visitor.objects.filter(company__facility=facility_id).prefetch_related(
-                Prefetch('company', queryset=Company.objects.only('name')),
-                Prefetch('user', queryset=CustomUser.objects.only('first_name', 'last_name'))
-            ).order_by('-pk')
-            
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            queryset = queryset.filter(facility_id=facility_id)
+        return queryset.order_by('-pk')
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -96,175 +149,305 @@ class QRCodeView(viewsets.ViewSet):
 
     def create(self, request, *args, **kwargs):
         visitor_id = request.data.get('visitor_id')
-        
-        # Create a QR code instance
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-
-        # Add the URL to the QR code
-        qr.add_data(settings.FRONT_DOMAIN+"/api/v1/vms/identity-card/?visitor_id="+visitor_id)
-        qr.make(fit=True)
+        image_format = request.data.get('image_format', 'png')
 
-        # Create an image from the QR code
-        img = qr.make_image(fill_color="black", back_color="white")
+        if not str(visitor_id or '').isdigit():
+            return Response({'error': 'A valid visitor_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if image_format not in QR_FORMATS:
+            return Response({'error': f"image_format must be one of {', '.join(QR_FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Define the path to save the image
-        image_path = os.path.join(settings.MEDIA_ROOT, 'qrcodes', f'qrcode_{visitor_id}.png')
+        visitor = Visitor.objects.filter(id=visitor_id).values('created_at', 'facility_id').first()
+        if not visitor:
+            return Response({'error': 'Visitor is not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Save the image to the local file system
-        img.save(image_path)
+        pass_token = pass_for_visitor(int(visitor_id), visitor['facility_id'], visitor['created_at'])
 
-        # Generate the URL for accessing the saved image
-        image_url = os.path.join(settings.MEDIA_URL, 'qrcodes', f'qrcode_{visitor_id}.png')
+        # Drawn in memory and written once per payload, repeat calls reuse the stored file
+        name = get_or_create_qr(visitor_id, identity_card_payload(visitor_id, pass_token), image_format)
 
         # Return the URL
-        return Response({'url': settings.FRONT_DOMAIN+ image_url})
+        return Response({'url': settings.FRONT_DOMAIN+ default_storage.url(name)})
     
 class IdentityCardView(viewsets.ViewSet):
     view_permissions = {
         'list': {'anon': True},
     }
 
+    def badge_response(self, png_data, visitor_id):
+        response = HttpResponse(png_data, content_type='image/png')
+        response['Content-Disposition'] = 'attachment; filename="visitor_'+visitor_id+'.png"'
+        return response
+
+    def set_validators(self, response, cache_key, last_modified):
+        response['ETag'] = quote_etag(cache_key)
+        response['Last-Modified'] = http_date(last_modified)
+        # The card carries personal details, let clients keep it but revalidate on every view
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     def list(self, request, *args, **kwargs):
 
 
         # Retrieve the visitor_id from the request query parameters
         visitor_id = request.query_params.get('visitor_id')
+        if not str(visitor_id or '').isdigit():
+            return Response({'error': 'A valid visitor_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        visitor = Visitor.objects.select_related('company').prefetch_related(
-                    Prefetch('user', queryset=CustomUser.objects.only('first_name', 'last_name'))
-                ).filter(id=visitor_id).values('name', 'image', 'phone_number', 'created_at', 'purpose_of_visit__name', 'company__name', 'user__first_name', 'user__last_name').first()
+        visitor = Visitor.objects.filter(id=visitor_id).values(*BADGE_FIELDS).first()
         
         if not visitor:
             return Response(
                 { "error": "Visitor is not found." }, status=status.HTTP_404_NOT_FOUND
             )
 
+        # A visitor's badge only changes with the visitor row, the template or the logo, which makes the cache key a strong validator
+        logo, logo_digest = badge_assets.logo_with_digest()
+        cache_key = badge_cache_key(visitor, logo_digest)
+        last_modified = max(visitor['modified_at'].timestamp(), badge_assets.logo_modified_at)
+
+        not_modified = get_conditional_response(request, etag=quote_etag(cache_key), last_modified=int(last_modified))
+        if not_modified is not None:
+            return self.set_validators(not_modified, cache_key, last_modified)
+
+        # Serve repeat downloads from disk
+        png_data = badge_store.get(cache_key)
+        if png_data is not None:
+            return self.set_validators(self.badge_response(png_data, visitor_id), cache_key, last_modified)
+
+        svg_content = build_badge_svg(visitor, logo)
+        has_logo = logo_digest is not None
+
+        try:
+            # Convert SVG to PNG off the web worker
+            png_data = badge_render_pool.render(svg_content)
+            store_badge(cache_key, png_data, has_logo)
+
+            # Return the PNG image as a response
+            response = self.badge_response(png_data, visitor_id)
+            if not has_logo:
+                # Replaced as soon as the logo loads, clients shouldn't keep the placeholder badge
+                patch_cache_control(response, no_store=True)
+                return response
+            return self.set_validators(response, cache_key, last_modified)
+        except (RenderPoolSaturated, RenderTimeout, BrokenProcessPool):
+            return render_busy_response()
+        except Exception:
+            # Log any errors that occur during the conversion
+            logger.exception(f"identity card render failed for visitor {visitor_id}")
+            return Response(
+                { "error": "Failed to convert SVG to PNG." }, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class IdentityCardBatchView(viewsets.ViewSet):
+
+    view_permissions = {
+        'create': {'front_desk': True, 'admin': True},
+    }
+
+    def create(self, request, *args, **kwargs):
+        visitor_ids = request.data.get('visitor_ids')
+        facility_id = request.data.get('facility_id')
+        date_from = request.data.get('date_from')
+        date_to = request.data.get('date_to')
+        layout = request.data.get('layout', 'pages')
+
+        if layout not in ('pages', 'sheet'):
+            return Response({'error': "layout must be 'pages' or 'sheet'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Visitor.objects.all()
+        if not request.user.is_superuser:
+            queryset = queryset.filter(facility_id=request.user.facility_id)
+
+        if visitor_ids:
+            try:
+                if not isinstance(visitor_ids, list):
+                    raise TypeError
+                visitor_ids = [int(visitor_id) for visitor_id in visitor_ids]
+            except (TypeError, ValueError):
+                return Response({'error': 'visitor_ids must be a list of visitor ids.'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(id__in=visitor_ids)
+        elif facility_id and date_from:
+            try:
+                start = datetime.strptime(date_from, '%Y-%m-%d').date()
+                end = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else start
+            except (TypeError, ValueError):
+                return Response({'error': 'Dates must be in YYYY-MM-DD format.'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(
+                facility_id=facility_id,
+                created_at__gte=timezone.make_aware(datetime.combine(start, datetime.min.time())),
+                created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), datetime.min.time())),
+            )
         else:
-            # Get the name from the visitor object
-            name = visitor['name']
-            phone_number = visitor['phone_number']
-            image = visitor['image']
-            purpose_of_visit = visitor['purpose_of_visit__name']
-            company_name = visitor['company__name']
-            created_at = visitor['created_at']
-            formatted_created_at = created_at.strftime("%d %b %Y")
-            user_name = f"{visitor['user__first_name']} {visitor['user__last_name']}"
-
-            # Assuming created_at is already a datetime object in UTC
-            created_at_utc = visitor['created_at'].replace(tzinfo=pytz.UTC)
-
-            # Convert the UTC time to the appropriate time zone (+0530)
-            local_timezone = pytz.timezone('Asia/Kolkata')
-            created_at_local = created_at_utc.astimezone(local_timezone)
-
-            # Add three hours
-            new_time_local = created_at_local + timedelta(hours=3)
-
-            # If the new time is on the next day, set the end date to the current day, 11:59 PM
-            if new_time_local.date() > created_at_local.date():
-                end_date = created_at_local.replace(hour=23, minute=59, second=59)
-            else:
-                end_date = new_time_local
-
-            # Format the end date as "Hour:Minute AM/PM"
-            formatted_end_date = end_date.strftime('%I:%M %p')
-
-            # URL of the image
-            image_url = "https://spatiumoffices.com/wp-content/uploads/2024/03/spatium-logo-white.png"
-
-            # Fetch the image from the URL
-            image_response = requests.get(image_url)
-
-            # Fetch the image from the URL
-            profile_image_response = requests.get(settings.FRONT_DOMAIN+'/media/'+str(image))
-
-            # Check if the request was successful
-            if image_response.status_code == 200:
-                # Convert the image to base64
-                base64_image = base64.b64encode(image_response.content).decode()
-
-                base64_profile_image = base64.b64encode(profile_image_response.content).decode()
-
-                # Update the SVG content with the base64-encoded image data
-                svg_content = f"""<?xml version="1.0" encoding="utf-8"?>
-                                <!-- Generator: Adobe Illustrator 28.3.0, SVG Export Plug-In . SVG Version: 6.00 Build 0)  -->
-                                <svg version="1.1" id="Layer_1" xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" x="0px" y="0px"
-                                    viewBox="0 0 1125 1963" style="enable-background:new 0 0 1125 1963;" xml:space="preserve">
-                                <g>
-                                    
-                                        <linearGradient id="Rectangle_15_00000061439451003741594480000011590328598646312856_" gradientUnits="userSpaceOnUse" x1="0.793" y1="2438.2202" x2="0.793" y2="2435.219" gradientTransform="matrix(375 0 0 -654 265 1594596)">
-                                        <stop  offset="0" style="stop-color:#6E36C5"/>
-                                        <stop  offset="0.429" style="stop-color:#411F74"/>
-                                        <stop  offset="1" style="stop-color:#2F1754"/>
-                                    </linearGradient>
-                                    
-                                        <rect id="Rectangle_15" x="-0.34" y="0" style="fill:url(#Rectangle_15_00000061439451003741594480000011590328598646312856_);" width="1125.46" height="1962.81"/>
-                                    <g id="Rectangle_14" transform="translate(14 179)">
-                                        <path style="opacity:0.1;fill:#FFFFFF;" d="M69.69,358.22h954.39c23.21,0,42.02,18.81,42.02,42.02v1293.53
-                                            c0,23.21-18.81,42.02-42.02,42.02H69.69c-23.21,0-42.02-18.81-42.02-42.02V400.24C27.67,377.03,46.48,358.22,69.69,358.22z"/>
-                                        <path style="fill:none;stroke:#FFFFFF;" d="M69.69,359.72h954.39c22.38,0,40.52,18.14,40.52,40.52v1293.53
-                                            c0,22.38-18.14,40.52-40.52,40.52H69.69c-22.38,0-40.52-18.14-40.52-40.52V400.24C29.17,377.86,47.31,359.72,69.69,359.72z"/>
-                                    </g>
-                                    <g id="Rectangle_13" transform="translate(128 120)">
-                                        <path style="fill:#FFFFFF;" d="M282.82,240.15h300.12c14.92,0,27.01,12.09,27.01,27.01v300.12c0,14.92-12.09,27.01-27.01,27.01
-                                            H282.82c-14.92,0-27.01-12.09-27.01-27.01V267.16C255.81,252.24,267.91,240.15,282.82,240.15z"/>
-                                        <path style="fill:none;stroke:#FFFFFF;" d="M282.82,241.65h300.12c14.09,0,25.51,11.42,25.51,25.51v300.12
-                                            c0,14.09-11.42,25.51-25.51,25.51H282.82c-14.09,0-25.51-11.42-25.51-25.51V267.16C257.31,253.07,268.74,241.65,282.82,241.65z"/>
-                                    </g>
-                                    
-                                        <text transform="matrix(1 0 0 1 550 843.3472)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:78.0321px;">{name}</text>
-                                    
-                                        <text transform="matrix(1 0 0 1 550 939.3877)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-Medium'; font-size:54.0222px;">{phone_number}</text>
-                                    
-                                        <text transform="matrix(1 0 0 1 344.7998 1134.4683)" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:78.0321px;">Host details</text>
-                                    
-                                        <text transform="matrix(1 0 0 1 550 1236.5098)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-Medium'; font-size:60.0247px;">{company_name}</text>
-                                    
-                                        <text transform="matrix(1 0 0 1 550 1311.542)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-Medium'; font-size:60.0247px;">{user_name}</text>
-                                    
-                                        <text transform="matrix(1 0 0 1 550 1467.6064)" text-anchor="middle" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:78.0321px;">{purpose_of_visit}</text>
-                                    
-                                        <text transform="matrix(1 0 0 1 191.7358 1617.6689)" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:48.0198px;">Valid till: {formatted_end_date} | {formatted_created_at}</text>
-                                    
-                                        <text transform="matrix(1 0 0 1 281.7734 1851.7646)" style="fill:#FFFFFF; font-family:'IBMPlexSans-SemiBold'; font-size:138.0568px;">VISITOR</text>
-                                    <line id="Line_1" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1000.91" x2="1078.6" y2="1000.91"/>
-                                    <line id="Line_2" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1691.2" x2="1078.6" y2="1691.2"/>
-                                    <line id="Line_4" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1509.62" x2="1078.6" y2="1509.62"/>
-                                    <line id="Line_3" style="fill:none;stroke:#FFFFFF;" x1="43.17" y1="1379.07" x2="1078.6" y2="1379.07"/>
-                                    
-                                        <image style="overflow:visible;enable-background:new    ;" width="107" height="106" id="sample2" xlink:href="data:image/png;base64,{base64_profile_image}" transform="matrix(3.0012 0 0 3.0012 398.8195 378.1557)">
-                                    </image>
-
-                                    <image style="overflow:visible;enable-background:new ;" width="173" height="65" id="sample" xlink:href="data:image/png;base64,{base64_image}" transform="matrix(3.0012 0 0 3.0012 302.78 87.0358)">
-                                    </image>
-                                </g>
-                                </svg>
-                                """
-
-                try:
-                    # Convert SVG to PNG
-                    png_data = cairosvg.svg2png(bytestring=svg_content.encode('utf-8'))
-
-                    # Return the PNG image as a response
-                    response = HttpResponse(png_data, content_type='image/png')
-                    response['Content-Disposition'] = 'attachment; filename="visitor_'+visitor_id+'.png"'
-                    return response
-                except Exception as e:
-                    # Log any errors that occur during the conversion
-                    print("Error during SVG to PNG conversion:", e)
-                    return Response(
-                        { "error": "Failed to convert SVG to PNG." }, status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-            else:
-                # If the request fails, return an error response
-                return Response(
-                    { "error": "Failed to fetch image." }, status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+            return Response({'error': 'Provide visitor_ids, or facility_id with date_from.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        visitors = list(queryset.order_by('created_at', 'id').values(*BADGE_FIELDS)[:settings.IDENTITY_CARD_BATCH_MAX_SIZE + 1])
+        if not visitors:
+            return Response({'error': 'No visitors found.'}, status=status.HTTP_404_NOT_FOUND)
+        if len(visitors) > settings.IDENTITY_CARD_BATCH_MAX_SIZE:
+            return Response({'error': f'At most {settings.IDENTITY_CARD_BATCH_MAX_SIZE} identity cards can be exported at once.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Everything that can fail runs before the response starts, once it is streaming the status can't change
+        try:
+            png_list = render_badges(visitors, settings.IDENTITY_CARD_BATCH_TIMEOUT)
+            pages = render_badge_pages(png_list, layout, settings.IDENTITY_CARD_RENDER_TIMEOUT)
+        except (RenderPoolSaturated, RenderTimeout, BrokenProcessPool):
+            return render_busy_response()
+
+        response = StreamingHttpResponse(stream_badge_pdf(pages), content_type='application/pdf')
+        response['Content-Disposition'] = 'attachment; filename="identity_cards.pdf"'
+        return response
+
+
+class PassScanView(viewsets.ViewSet):
+
+    view_permissions = {
+        'create': {'front_desk': True, 'admin': True},
+    }
+
+    def create(self, request, *args, **kwargs):
+        token = str(request.data.get('token') or '')
+        # Scanners may send the whole QR payload instead of just the pass
+        if '?' in token:
+            token = parse_qs(urlparse(token).query).get('pass', [''])[0]
+        if not token:
+            return Response({'error': 'token is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            visitor_pass = verify_pass(token)
+        except InvalidPass as e:
+            return Response({'valid': False, 'reason': e.reason}, status=status.HTTP_403_FORBIDDEN)
+
+        if not request.user.is_superuser and request.user.facility_id != visitor_pass.facility_id:
+            return Response({'valid': False, 'reason': 'wrong_facility'}, status=status.HTTP_403_FORBIDDEN)
+
+        if revocation_cache.is_revoked(visitor_pass.visitor_id):
+            return Response({'valid': False, 'reason': 'revoked'}, status=status.HTTP_403_FORBIDDEN)
+
+        return Response({
+            'valid': True,
+            'visitor_id': visitor_pass.visitor_id,
+            'facility_id': visitor_pass.facility_id,
+            'valid_until': datetime.fromtimestamp(visitor_pass.valid_until, tz=timezone.get_current_timezone()).isoformat(),
+        })
+
+
+class PassRevokeView(viewsets.ViewSet):
+
+    view_permissions = {
+        'create': {'front_desk': True, 'admin': True},
+    }
+
+    def create(self, request, *args, **kwargs):
+        visitor_id = request.data.get('visitor_id')
+        if not str(visitor_id or '').isdigit():
+            return Response({'error': 'A valid visitor_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Visitor.objects.filter(id=visitor_id)
+        if not request.user.is_superuser:
+            queryset = queryset.filter(facility_id=request.user.facility_id)
+
+        # update() leaves modified_at alone, so the cached identity card stays valid
+        if not queryset.update(pass_revoked_at=timezone.now()):
+            return Response({'error': 'Visitor is not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Other workers pick it up on their next revocation refresh
+        revocation_cache.add(int(visitor_id))
+        return Response({'message': 'Pass revoked.'})
+
+
+class VisitorAnalyticsView(viewsets.ViewSet):
+
+    view_permissions = {
+        'list': {'admin': True, 'front_desk': True, 'facility_manager': True},
+    }
+
+    def list(self, request, *args, **kwargs):
+        facility_id = request.user.facility_id
+        if request.user.is_superuser and request.query_params.get('facility_id'):
+            facility_id = request.query_params.get('facility_id')
+
+        if not str(facility_id or '').isdigit():
+            return Response({'error': 'A valid facility_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(facility_analytics(int(facility_id)))
+
+
+class VisitorEventTokenView(viewsets.ViewSet):
+    """
+    Short-lived token for opening the event stream from a browser, where
+    EventSource can't send the Authorization header:
+    ``new EventSource('/api/v1/vms/visitor-events/?token=' + token)``.
+    The token is only checked when the stream opens, fetch a new one
+    whenever the EventSource reports an error and is closed.
+    """
+
+    view_permissions = {
+        'create': {'admin': True, 'front_desk': True},
+    }
+
+    def create(self, request, *args, **kwargs):
+        facility_id = request.user.facility_id
+        if request.user.is_superuser and request.data.get('facility_id'):
+            facility_id = request.data.get('facility_id')
+
+        if not str(facility_id or '').isdigit():
+            return Response({'error': 'A valid facility_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'token': issue_stream_token(request.user.id, int(facility_id)),
+            'expires_in': settings.VMS_EVENTS_TOKEN_MAX_AGE,
+        })
+
+
+class VisitorEventStreamView(viewsets.ViewSet):
+    """
+    Server-sent events for the dashboards: a `check_in` event per new
+    visitor at the facility and a `counters` event with the dashboard
+    counts after each batch. Streams are served as coroutines under ASGI
+    and as greenlets under the gevent workers.
+
+    Opened with the Authorization header, or with a ``?token=`` from
+    VisitorEventTokenView by browsers using EventSource.
+    """
+
+    view_permissions = {
+        'list': {'admin': True, 'front_desk': True, 'anon': True},
+    }
+
+    def perform_content_negotiation(self, request, force=False):
+        # EventSource only accepts text/event-stream, errors are still sent as JSON
+        return super().perform_content_negotiation(request, force=True)
+
+    def list(self, request, *args, **kwargs):
+        token = request.query_params.get('token')
+        if token:
+            try:
+                facility_id = read_stream_token(token)
+            except signing.BadSignature:
+                return Response({'error': 'Invalid or expired token.'}, status=status.HTTP_403_FORBIDDEN)
+        elif request.user.is_anonymous:
+            return Response({'error': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+        else:
+            facility_id = request.user.facility_id
+            if request.user.is_superuser and request.query_params.get('facility_id'):
+                facility_id = request.query_params.get('facility_id')
+
+        if not str(facility_id or '').isdigit():
+            return Response({'error': 'A valid facility_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        facility_id = int(facility_id)
+        initial = initial_events(facility_id, request.headers.get('Last-Event-ID'))
+        if isinstance(request._request, ASGIRequest):
+            events = stream_events_async(facility_id, initial)
+        else:
+            events = stream_events(facility_id, initial)
+
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stops nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 
 class VMSDashboardView(viewsets.ModelViewSet):
@@ -277,31 +460,8 @@ class VMSDashboardView(viewsets.ModelViewSet):
         
         facility_id = self.request.user.facility_id
 
-        company_ids = Company.objects.filter(facility_id=facility_id).values_list('id', flat=True)
-        
-        # Get the current month and day
-        current_month = datetime.now().month
-        current_day = datetime.now().day
-        
-        # Count visitors for the current day
-        visitors_today_count = Visitor.objects.filter(
-            company_id__in=company_ids,
-            created_at__year=datetime.now().year,
-            created_at__month=current_month,
-            created_at__day=current_day
-        ).count()
-        
-        # Count visitors for the current month
-        visitors_this_month_count = Visitor.objects.filter(
-            company_id__in=company_ids,
-            created_at__year=datetime.now().year,
-            created_at__month=current_month
-        ).count()
-        
-        return Response({
-            'visitors_today_count': visitors_today_count,
-            'visitors_this_month_count': visitors_this_month_count
-        })
+        # Read from the daily counters, dates are local to the facility
+        return Response(facility_visit_counts(facility_id))
     
 class CompanyVisitorView(viewsets.ModelViewSet):
 
@@ -311,22 +471,194 @@ class CompanyVisitorView(viewsets.ModelViewSet):
 
     def list(self, request):
         
-        
-        company_id = request.query_params.get('company_id')
+        # One company id or several, comma separated
+        company_ids = [company_id for company_id in request.query_params.get('company_id', '').split(',') if company_id.strip()]
+        if not company_ids or not all(company_id.strip().isdigit() for company_id in company_ids):
+            return Response({'error': 'A valid company_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        
-        # Get the current month and day
-        current_month = datetime.now().month
-        current_day = datetime.now().day
-        
-        # Count visitors for the current day
+        # Count visitors for the current local day
+        day_start, day_end = local_day_range(timezone.localdate())
         visitors_count = Visitor.objects.filter(
-            company_id__in=company_id,
-            created_at__year=datetime.now().year,
-            created_at__month=current_month,
-            created_at__day=current_day
+            company_id__in=[int(company_id) for company_id in company_ids],
+            created_at__gte=day_start,
+            created_at__lt=day_end,
         ).count()
 
         return Response({
             'visitors_count': visitors_count
-        })
\ No newline at end of file
+        })
+
+
+class CompanyVisitorCountsView(viewsets.ViewSet):
+
+    view_permissions = {
+        'list': {'admin': True, 'front_desk': True},
+    }
+
+    def list(self, request, *args, **kwargs):
+        facility_id = request.user.facility_id
+        if request.user.is_superuser and request.query_params.get('facility_id'):
+            facility_id = request.query_params.get('facility_id')
+
+        if not str(facility_id or '').isdigit():
+            return Response({'error': 'A valid facility_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Every tenant of the facility in one query, instead of a company-visitor call each
+        return Response({
+            'date': timezone.localdate().isoformat(),
+            'companies': company_visit_counts(int(facility_id)),
+        })
+
+
+def pre_registration_scope(user, queryset):
+    # SPOCs see their own company's guests, desk and facility staff their facility's
+    if user.is_superuser:
+        return queryset
+    if user.role_id == 4:
+        return queryset.filter(company_id=user.company_id)
+    return queryset.filter(facility_id=user.facility_id)
+
+
+class VisitorPreRegistrationView(viewsets.ViewSet):
+
+    view_permissions = {
+        'create': {'admin': True, 'spoc': True, 'front_desk': True, 'facility_manager': True},
+        'list': {'admin': True, 'spoc': True, 'front_desk': True, 'facility_manager': True},
+    }
+
+    def create(self, request, *args, **kwargs):
+        company_id = request.data.get('company_id')
+        purpose_of_visit_id = request.data.get('purpose_of_visit_id')
+        user_id = request.data.get('user_id') or request.user.id
+
+        try:
+            expected_on = datetime.strptime(str(request.data.get('expected_on')), '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'error': 'expected_on must be a date as YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        if expected_on < timezone.localdate():
+            return Response({'error': 'expected_on cannot be in the past.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        companies = Company.objects.filter(is_archive=False)
+        if not request.user.is_superuser:
+            if request.user.role_id == 4:
+                companies = companies.filter(id=request.user.company_id)
+            else:
+                companies = companies.filter(facility_id=request.user.facility_id)
+        company = companies.filter(id=company_id if str(company_id or '').isdigit() else None).first()
+        if company is None:
+            return Response({'error': 'Company is not found.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The host works at the company, or is the person pre-registering
+        hosts = CustomUser.objects.filter(Q(company_id=company.id) | Q(id=request.user.id), is_archive=False)
+        host = hosts.filter(id=user_id if str(user_id).isdigit() else None).first()
+        if host is None:
+            return Response({'error': 'Host is not found.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not PurposeOfVisit.objects.filter(id=purpose_of_visit_id if str(purpose_of_visit_id or '').isdigit() else None).exists():
+            return Response({'error': 'Purpose of visit is not found.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        file = request.FILES.get('file')
+        if file is not None:
+            if os.path.splitext(file.name)[1].lower() != '.csv':
+                return Response({'error': 'Invalid file format'}, status=status.HTTP_400_BAD_REQUEST)
+            rows, error = preregistration.read_csv(file)
+        else:
+            rows, error = preregistration.read_json(request.data.get('visitors'))
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(rows.index) > settings.VISITOR_PRE_REGISTRATION_MAX_ROWS:
+            return Response(
+                {'error': f'At most {settings.VISITOR_PRE_REGISTRATION_MAX_ROWS} visitors can be pre-registered at once.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        valid_rows, failures = preregistration.validate_rows(rows, company.id, expected_on)
+        pre_registrations = preregistration.pre_register(
+            valid_rows, company, expected_on, host, int(purpose_of_visit_id), request.user,
+        )
+
+        return Response({
+            "message": "Pre-registration completed.",
+            "success_count": len(pre_registrations),
+            "failure_count": len(failures),
+            "failures": failures,
+        }, status=status.HTTP_201_CREATED)
+
+    def list(self, request, *args, **kwargs):
+        # Desk lookup of today's expected guests by name, email, phone number or code
+        try:
+            expected_on = datetime.strptime(request.query_params['date'], '%Y-%m-%d').date()
+        except KeyError:
+            expected_on = timezone.localdate()
+        except ValueError:
+            return Response({'error': 'date must be a date as YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = pre_registration_scope(request.user, VisitorPreRegistration.objects.filter(expected_on=expected_on))
+        search = request.query_params.get('search', '').strip()
+        if search:
+            queryset = queryset.filter(
+                Q(phone_number=search) | Q(code=search) | Q(email__iexact=search) | Q(name__icontains=search)
+            )
+
+        rows = queryset.order_by('name', 'id').values(
+            'id', 'name', 'email', 'phone_number', 'from_company', 'company_id', 'company__name', 'user_id',
+            'purpose_of_visit_id', 'expected_on', 'code', 'visitor_id',
+        )[:settings.VISITOR_PRE_REGISTRATION_LOOKUP_LIMIT]
+        results = []
+        for row in rows:
+            row['company_name'] = row.pop('company__name')
+            row['checked_in'] = row['visitor_id'] is not None
+            results.append(row)
+        return Response(results)
+
+
+class PreRegistrationCheckInView(viewsets.ViewSet):
+
+    view_permissions = {
+        'create': {'admin': True, 'front_desk': True, 'facility_manager': True},
+    }
+
+    def create(self, request, *args, **kwargs):
+        code = str(request.data.get('code') or '')
+        # Scanners send the whole QR payload
+        if '?' in code:
+            code = parse_qs(urlparse(code).query).get('code', [''])[0]
+        if not code:
+            return Response({'error': 'code is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        pre_registration = pre_registration_scope(request.user, VisitorPreRegistration.objects.filter(code=code)).values(
+            'id', 'expected_on',
+        ).first()
+        if pre_registration is None:
+            return Response({'error': 'Pre-registration is not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if pre_registration['expected_on'] != timezone.localdate():
+            return Response(
+                {'error': f"The visitor is expected on {pre_registration['expected_on'].isoformat()}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        visitor, created = preregistration.check_in(pre_registration['id'])
+        data = VisitorSerializer(visitor, context={'request': request}).data
+        if not created:
+            return Response({'error': 'The visitor has already checked in.', 'visitor': data}, status=status.HTTP_409_CONFLICT)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class PreRegistrationPassView(viewsets.ViewSet):
+
+    view_permissions = {
+        'list': {'anon': True},
+    }
+
+    def list(self, request, *args, **kwargs):
+        # The QR image in the invite email, the code itself is the credential
+        code = request.query_params.get('code', '')
+        if not code or not VisitorPreRegistration.objects.filter(
+            code=code, expected_on__gte=timezone.localdate(), visitor__isnull=True,
+        ).exists():
+            return Response({'error': 'Pre-registration is not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        response = HttpResponse(render_qr(preregistration.pass_payload(code)), content_type='image/png')
+        patch_cache_control(response, private=True, max_age=86400)
+        return response